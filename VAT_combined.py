@@ -17,6 +17,7 @@ Parameters are:
 import rvt.vis
 import rvt.blend
 import rvt.default
+import copy
 import os
 import multiprocessing as mp
 
@@ -115,6 +116,37 @@ def combined_VAT(input_dir_path, output_dir_path, general_opacity, vat_combinati
             print(result.get())
 
 
+def add_horizon_images(combinations, defaults, dem_arr, dem_resolution, no_data=None):
+    """Computes Sky-view factor and Positive openness for all combinations (each with its own default svf_r_max and
+    svf_noise) in one horizon search and returns copies of combinations with them added as images to layers. Input
+    combinations are not changed, so they can be reused for next DEM."""
+    combinations = [_copy_combination(combination) for combination in combinations]
+    if len(set((default.svf_n_dir, default.ve_factor) for default in defaults)) != 1:
+        return combinations  # different number of directions or vertical exaggeration, layers are computed separately
+    list_dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=dem_resolution, compute_svf=True,
+                                                 compute_opns=True, svf_n_dir=defaults[0].svf_n_dir,
+                                                 svf_r_max=[default.svf_r_max for default in defaults],
+                                                 svf_noise=[default.svf_noise for default in defaults],
+                                                 ve_factor=defaults[0].ve_factor, no_data=no_data,
+                                                 engine=defaults[0].engine)
+    for combination, dict_svf_opns in zip(combinations, list_dict_svf_opns):
+        for layer in combination.layers:
+            if layer.vis is None or layer.image is not None or layer.image_path is not None:
+                continue
+            if layer.vis.lower() == "sky-view factor":
+                layer.image = dict_svf_opns["svf"]
+            elif layer.vis.lower() == "openness - positive":
+                layer.image = dict_svf_opns["opns"]
+    return combinations
+
+
+def _copy_combination(combination):
+    """Returns copy of combination (rvt.blend.BlenderCombination) with copied layers, arrays are not copied."""
+    combination_copy = copy.copy(combination)
+    combination_copy.layers = [copy.copy(layer) for layer in combination.layers]
+    return combination_copy
+
+
 # function which is multiprocessing
 def compute_save_VAT_combined(general_combination, flat_combination, general_default, flat_default,
                               input_dem_path, out_comb_vat_path,
@@ -122,6 +154,14 @@ def compute_save_VAT_combined(general_combination, flat_combination, general_def
                               save_VAT_flat, out_comb_vat_flat_path):
     dict_arr_res_nd = rvt.default.get_raster_arr(raster_path=input_dem_path)
 
+    # SVF and openness for VAT general and VAT flat (different search radius) from one horizon search
+    # (on copies of combinations, images of this DEM are not kept in input combinations)
+    general_combination, flat_combination = add_horizon_images(
+        combinations=[general_combination, flat_combination], defaults=[general_default, flat_default],
+        dem_arr=dict_arr_res_nd["array"], dem_resolution=dict_arr_res_nd["resolution"][0],
+        no_data=dict_arr_res_nd["no_data"]
+    )
+
     # create and blend VAT general
     general_combination.add_dem_arr(dem_arr=dict_arr_res_nd["array"],
                                     dem_resolution=dict_arr_res_nd["resolution"][0])
@@ -0,0 +1,22 @@
+"""
+Relief Visualization Toolbox – Benchmarks
+
+Repeatable benchmarks of visualizations (rvt.vis), saving visualizations (rvt.default.DefaultValues.save_*), tile by
+tile processing (rvt.tile) and blending (rvt.blend) on synthetic DEMs (benchmarks.synthetic_dem). Records wall time,
+peak memory (RSS) and throughput (pixels per second) as JSON lines, results of two runs can be compared to catch
+regressions. Run ``python -m benchmarks --help`` from repository root.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
@@ -0,0 +1,88 @@
+"""
+Relief Visualization Toolbox – Benchmarks command line
+
+Usage (from repository root):
+    python -m benchmarks list
+    python -m benchmarks run --sizes 512 2048 --groups vis tile --cases svf mstp local_dominance --out results.jsonl
+    python -m benchmarks compare baseline.jsonl results.jsonl
+    python -m benchmarks dem --size 4096 --void-fraction 0.2 synthetic_dem.tif
+
+Compare exits with status 1 if any case is slower than baseline by more than threshold (regression).
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import argparse
+import sys
+
+from benchmarks import suite
+from benchmarks import synthetic_dem
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="RVT benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="List benchmark cases.")
+
+    run_parser = subparsers.add_parser("run", help="Run benchmark cases and append results (JSON lines).")
+    run_parser.add_argument("--out", default="rvt_benchmarks.jsonl", help="Results file.")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(suite.DEFAULT_SIZES),
+                            help="Sizes of synthetic DEMs (pixels), available: {}.".format(
+                                ", ".join(str(size) for size in synthetic_dem.SIZES)))
+    run_parser.add_argument("--groups", nargs="+", choices=("vis", "default", "tile", "blend"),
+                            help="Groups of cases (default all).")
+    run_parser.add_argument("--cases", nargs="+", help="Run only cases whose name contains any of these.")
+    run_parser.add_argument("--void-fraction", type=float, default=0., help="Fraction of no_data pixels of DEMs.")
+    run_parser.add_argument("--repeat", type=int, default=suite.DEFAULT_REPEAT, help="Repeats of each case.")
+    run_parser.add_argument("--work-dir", help="Directory of synthetic DEMs and outputs.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare results with baseline results.")
+    compare_parser.add_argument("baseline", help="Baseline results file.")
+    compare_parser.add_argument("current", help="Current results file.")
+    compare_parser.add_argument("--threshold", type=float, default=suite.REGRESSION_THRESHOLD,
+                                help="Relative slowdown reported as regression.")
+
+    dem_parser = subparsers.add_parser("dem", help="Save synthetic DEM.")
+    dem_parser.add_argument("out", help="Output GeoTIFF.")
+    dem_parser.add_argument("--size", type=int, default=2048)
+    dem_parser.add_argument("--resolution", type=float, default=1.)
+    dem_parser.add_argument("--void-fraction", type=float, default=0.)
+    dem_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(args)
+    if args.command == "list":
+        for case in suite.get_cases():
+            print(case.name)
+    elif args.command == "run":
+        cases = suite.select_cases(suite.get_cases(), names=args.cases, groups=args.groups)
+        results = suite.run_benchmarks(cases, out_path=args.out, sizes=args.sizes, void_fraction=args.void_fraction,
+                                       repeat=args.repeat, work_dir=args.work_dir)
+        return int(any(result["error"] is not None for result in results))
+    elif args.command == "compare":
+        comparison = suite.compare_results(args.baseline, args.current, threshold=args.threshold)
+        for row in comparison:
+            print("{:<40} {:>6} {:>10.3f} s {:>10.3f} s {:>7.2f}x {}".format(
+                row["case"], row["size"], row["baseline_time"], row["current_time"], row["ratio"],
+                "REGRESSION" if row["regression"] else ""))
+        return int(any(row["regression"] for row in comparison))
+    elif args.command == "dem":
+        synthetic_dem.save_synthetic_dem(args.out, args.size, resolution=args.resolution,
+                                         void_fraction=args.void_fraction, seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+Relief Visualization Toolbox – Benchmark suite
+
+Benchmark cases and their measurement. Each case (BenchmarkCase) runs in its own (spawned) process, so its peak
+memory (RSS) is not affected by other cases. Case is repeated and minimal and median wall time are recorded together
+with peak RSS and throughput (DEM pixels per second). Results are written as JSON lines (first line describes
+environment: versions, CPU, float data type), results of two runs can be compared with compare_results.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import concurrent.futures
+import datetime
+import gc
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import rvt.blend
+import rvt.cache
+import rvt.default
+import rvt.engine
+import rvt.tile
+import rvt.vis
+from benchmarks import synthetic_dem
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BLENDER_COMBINATIONS_PATH = Path(__file__).resolve().parents[1] / "settings" / "default_blender_combinations.json"
+# sizes and repeats of default run, larger sizes (up to synthetic_dem.SIZES[-1]) are selected explicitly
+DEFAULT_SIZES = (512, 1024, 2048)
+DEFAULT_REPEAT = 3
+# relative increase of wall time which is reported as regression
+REGRESSION_THRESHOLD = 0.1
+
+
+class BenchmarkCase:
+    """
+    Benchmark case. Function is called in benchmark process as function(dem_path=..., work_dir=..., **parameters)
+    and returns (prepare, run), run(*prepare()) is timed (prepare isn't, e.g. it copies DEM array which is changed by
+    run or removes outputs of previous repeat).
+
+    Attributes
+    ----------
+    name : str
+        Unique name of case, group is its prefix (e.g. "vis.sky_view_factor[numba]").
+    group : str
+        "vis" (rvt.vis functions), "default" (DefaultValues.save_*), "tile" (rvt.tile modes) or "blend".
+    function : Callable
+        Module level function (it is pickled to benchmark process).
+    parameters : dict
+        Parameters of function.
+    """
+
+    def __init__(self, name, group, function, parameters=None):
+        self.name = name
+        self.group = group
+        self.function = function
+        self.parameters = {} if parameters is None else parameters
+
+    def __repr__(self):
+        return "BenchmarkCase({})".format(self.name)
+
+
+def _read_dem(dem_path):
+    dem_dict = rvt.default.get_raster_arr(dem_path, data_type=rvt.engine.get_float_dtype())
+    return dem_dict["array"], dem_dict["resolution"][0], dem_dict["no_data"]
+
+
+def _vis_case(dem_path, work_dir, function_name, **parameters):
+    """rvt.vis function on DEM array in memory, resolution and no_data are taken from DEM."""
+    dem_arr, resolution, no_data = _read_dem(dem_path)
+    function = getattr(rvt.vis, function_name)
+    function_parameters = inspect.signature(function).parameters
+    for resolution_name in ("resolution", "resolution_x", "resolution_y"):
+        if resolution_name in function_parameters:
+            parameters[resolution_name] = resolution
+    parameters["no_data"] = no_data
+    return (lambda: (dem_arr.copy(),)), (lambda dem: function(dem=dem, **parameters))
+
+
+# save method of DefaultValues, its parameters and kernel (rvt.engine) of each visualization
+_SAVE_METHODS = {
+    "slope": ("save_slope", {}, None),
+    "hillshade": ("save_hillshade", {}, None),
+    "multi_hillshade": ("save_multi_hillshade", {}, None),
+    "slrm": ("save_slrm", {}, None),
+    "sky_view_factor": ("save_sky_view_factor", {"save_svf": True, "save_asvf": True, "save_opns": True},
+                        "horizon_slope"),
+    "neg_opns": ("save_neg_opns", {}, "horizon_slope"),
+    "sky_illumination": ("save_sky_illumination", {}, None),
+    "local_dominance": ("save_local_dominance", {}, "local_dominance"),
+    "msrm": ("save_msrm", {}, None),
+    "mstp": ("save_mstp", {}, None),
+}
+
+
+def _prepare_out_dir(out_dir):
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    rvt.default.clear_raster_cache()
+    return ()
+
+
+def _default_case(dem_path, work_dir, visualization, engine="numpy"):
+    """DefaultValues.save_* of visualization (float and 8bit) from DEM file, with default parameters."""
+    default = rvt.default.DefaultValues()
+    default.overwrite = 1
+    default.engine = engine
+    method_name, method_parameters, _ = _SAVE_METHODS[visualization]
+    out_dir = os.path.join(work_dir, "default_{}_{}".format(visualization, engine))
+    save_method = getattr(default, method_name)
+    return (lambda: _prepare_out_dir(out_dir)), (lambda: save_method(dem_path, custom_dir=out_dir, save_float=True,
+                                                                     save_8bit=True, **method_parameters))
+
+
+def _tile_case(dem_path, work_dir, visualization, mode, tile_size=1024):
+    """rvt.tile.save_rvt_visualization_tile_by_tile of visualization (RVTVisualization value) in mode: "fixed"
+    (tile_size), "streaming", "cog" (fixed tile size) or "auto" (tile size from cost model)."""
+    default = rvt.default.DefaultValues()
+    default.overwrite = 1
+    default.tile_size = "auto" if mode == "auto" else (tile_size, tile_size)
+    default.tile_streaming = mode == "streaming"
+    default.cog = mode == "cog"
+    rvt_visualization = rvt.default.RVTVisualization(visualization)
+    out_dir = Path(work_dir) / "tile_{}_{}".format(visualization, mode)
+    return (lambda: _prepare_out_dir(out_dir)), (lambda: rvt.tile.save_rvt_visualization_tile_by_tile(
+        rvt_visualization=rvt_visualization, rvt_default=default, dem_path=Path(dem_path), output_dir_path=out_dir,
+        save_float=True, save_8bit=True))
+
+
+def _blend_case(dem_path, work_dir, combination_name=None):
+    """Render of blender combination (from settings/default_blender_combinations.json) on DEM array in memory,
+    visualizations are computed. If combination_name is None all combinations are rendered (shared visualizations
+    are computed once)."""
+    dem_arr, resolution, no_data = _read_dem(dem_path)
+    dem_arr[dem_arr == no_data] = np.nan
+    default = rvt.default.DefaultValues()
+    combinations = rvt.blend.BlenderCombinations()
+    combinations.read_from_file(BLENDER_COMBINATIONS_PATH.as_posix())
+    if combination_name is None:
+        return (lambda: (dem_arr.copy(),)), (lambda dem: combinations.render_all_combinations(
+            dem_arr=dem, dem_resolution=resolution, default=default))
+    combination = combinations.select_combination_by_name(combination_name)
+
+    def render(dem):
+        combination.add_dem_arr(dem_arr=dem, dem_resolution=resolution)
+        return combination.render_all_images(default=default)
+
+    return (lambda: (dem_arr.copy(),)), render
+
+
+def get_cases():
+    """Returns list of all benchmark cases (BenchmarkCase)."""
+    cases = []
+    # visualizations, kernels are computed with each available engine
+    vis_functions = [
+        ("slope_aspect", None, {}),
+        ("hillshade", None, {}),
+        ("multi_hillshade", None, {}),
+        ("slrm", None, {}),
+        ("sky_view_factor", "horizon_slope", {"compute_svf": True}),
+        ("sky_view_factor", "horizon_slope", {"compute_svf": True, "compute_asvf": True, "compute_opns": True,
+                                              "compute_neg_opns": True}),
+        ("sky_illumination", None, {}),
+        ("shadow_horizon", None, {}),
+        ("local_dominance", "local_dominance", {}),
+        ("msrm", None, {"feature_min": 0, "feature_max": 20, "scaling_factor": 2}),  # DefaultValues parameters
+        ("mstp", None, {}),
+    ]
+    for function_name, kernel_name, parameters in vis_functions:
+        name = "vis." + function_name
+        if function_name == "sky_view_factor":
+            name += "_all" if parameters.get("compute_opns") else ""
+        if kernel_name is None:
+            cases.append(BenchmarkCase(name, "vis", _vis_case, dict(parameters, function_name=function_name)))
+            continue
+        for engine in rvt.engine.available_engines(kernel_name):
+            cases.append(BenchmarkCase("{}[{}]".format(name, engine), "vis", _vis_case,
+                                       dict(parameters, function_name=function_name, engine=engine)))
+    # saving visualizations (read, compute, 8bit, write)
+    for visualization, (_, _, kernel_name) in _SAVE_METHODS.items():
+        if kernel_name is None:
+            cases.append(BenchmarkCase("default." + visualization, "default", _default_case,
+                                       {"visualization": visualization}))
+            continue
+        for engine in rvt.engine.available_engines(kernel_name):
+            cases.append(BenchmarkCase("default.{}[{}]".format(visualization, engine), "default", _default_case,
+                                       {"visualization": visualization, "engine": engine}))
+    # tile by tile processing, cheap (I/O bound) and expensive visualization
+    for visualization in ("slp", "svf"):
+        for mode in ("fixed", "streaming", "cog", "auto"):
+            cases.append(BenchmarkCase("tile.{}.{}".format(visualization, mode), "tile", _tile_case,
+                                       {"visualization": visualization, "mode": mode}))
+    # blending
+    combinations = rvt.blend.BlenderCombinations()
+    combinations.read_from_file(BLENDER_COMBINATIONS_PATH.as_posix())
+    for combination in combinations.combinations:
+        if not combination.layers:  # combination of combinations (e.g. VAT combined), rendered by script
+            continue
+        combination_name = combination.name
+        cases.append(BenchmarkCase("blend." + combination_name, "blend", _blend_case,
+                                   {"combination_name": combination_name}))
+    cases.append(BenchmarkCase("blend.all_combinations", "blend", _blend_case))
+    return cases
+
+
+def select_cases(cases, names=None, groups=None):
+    """Returns cases which are in groups and whose name contains any of names (all if names or groups is None)."""
+    return [case for case in cases
+            if (groups is None or case.group in groups) and (names is None or any(name in case.name for name in names))]
+
+
+def _current_rss():
+    """Current resident set size (RSS) of process in bytes, None if it can't be measured."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss():
+    """Peak resident set size (RSS) of process in bytes, None if it can't be measured."""
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_rss if sys.platform == "darwin" else peak_rss * 1024  # bytes on macOS, kilobytes on Linux
+    if psutil is not None:
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)  # Windows
+    return None
+
+
+def _run_case(case, dem_path, work_dir, repeat, float_dtype):
+    """Runs case in benchmark process, returns (wall times, RSS after preparation, peak RSS)."""
+    rvt.engine.set_float_dtype(float_dtype)
+    os.makedirs(work_dir, exist_ok=True)
+    prepare, run = case.function(dem_path=dem_path, work_dir=work_dir, **case.parameters)
+    wall_times = []
+    setup_rss = None
+    for _ in range(repeat):
+        args = prepare()
+        gc.collect()
+        if setup_rss is None:
+            setup_rss = _current_rss()
+        start_time = time.perf_counter()
+        run(*args)
+        wall_times.append(time.perf_counter() - start_time)
+        del args
+    return wall_times, setup_rss, _peak_rss()
+
+
+def get_environment():
+    """Returns dictionary describing environment of benchmark run (versions, machine, float data type), results are
+    comparable between runs in the same environment."""
+    environment = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "rvt_version": rvt.cache.RVT_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "float_dtype": rvt.engine.get_float_dtype().name,
+        "engines": sorted({engine for kernel_name in ("horizon_slope", "local_dominance")
+                           for engine in rvt.engine.available_engines(kernel_name)}),
+    }
+    try:
+        environment["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        environment["git_commit"] = None
+    return environment
+
+
+def run_benchmarks(cases, out_path, sizes=DEFAULT_SIZES, void_fraction=0., repeat=DEFAULT_REPEAT, work_dir=None,
+                   verbose=True):
+    """
+    Runs benchmark cases on synthetic DEMs of sizes and appends results to out_path (JSON lines). Each case runs in
+    its own spawned process, failed cases are recorded with error.
+
+    Parameters
+    ----------
+    cases : list(BenchmarkCase)
+        Benchmark cases (see get_cases, select_cases).
+    out_path : str
+        Path of results file (JSON lines), results are appended.
+    sizes : list(int)
+        Sizes (pixels in each direction) of synthetic DEMs.
+    void_fraction : float
+        Fraction (0-1) of no_data pixels of synthetic DEMs.
+    repeat : int
+        Number of repeats of each case.
+    work_dir : str
+        Directory of synthetic DEMs (generated once and reused between runs) and outputs, if None directory
+        ".rvt_benchmarks" in home directory.
+    verbose : bool
+        If True results are printed.
+
+    Returns
+    -------
+    results : list(dict)
+        Results of cases.
+    """
+    if work_dir is None:
+        work_dir = os.path.join(os.path.expanduser("~"), ".rvt_benchmarks")
+    environment = get_environment()
+    mp_context = multiprocessing.get_context("spawn")
+    results = []
+    with open(out_path, "a") as out_file:
+        out_file.write(json.dumps(dict(environment, type="environment")) + "\n")
+        for size in sizes:
+            dem_path = synthetic_dem.get_synthetic_dem_path(os.path.join(work_dir, "dems"), size,
+                                                            void_fraction=void_fraction)
+            for case in cases:
+                result = {"type": "result", "case": case.name, "group": case.group, "size": size,
+                          "void_fraction": void_fraction, "repeat": repeat, "date": environment["date"],
+                          "git_commit": environment["git_commit"], "error": None}
+                with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+                    future = executor.submit(_run_case, case, dem_path, os.path.join(work_dir, "out"), repeat,
+                                             environment["float_dtype"])
+                    try:
+                        wall_times, setup_rss, peak_rss = future.result()
+                    except Exception as e:  # error in case or benchmark process crashed (e.g. out of memory)
+                        result["error"] = "{}: {}".format(type(e).__name__, e)
+                if result["error"] is None:
+                    wall_time_median = statistics.median(wall_times)
+                    result.update({
+                        "wall_time_min": min(wall_times),
+                        "wall_time_median": wall_time_median,
+                        "wall_times": wall_times,
+                        "pixels_per_s": size * size / wall_time_median,
+                        "peak_rss": peak_rss,
+                        "peak_rss_increase": None if peak_rss is None or setup_rss is None else peak_rss - setup_rss
+                    })
+                out_file.write(json.dumps(result) + "\n")
+                out_file.flush()
+                results.append(result)
+                if verbose:
+                    print(format_result(result))
+    return results
+
+
+def format_result(result):
+    """Returns one line summary of result."""
+    if result["error"] is not None:
+        return "{:<40} {:>6} ERROR {}".format(result["case"], result["size"], result["error"])
+    peak_rss = "-" if result["peak_rss"] is None else "{:.0f} MB".format(result["peak_rss"] / 1024 ** 2)
+    return "{:<40} {:>6} {:>10.3f} s {:>12.3g} px/s {:>10}".format(
+        result["case"], result["size"], result["wall_time_min"], result["pixels_per_s"], peak_rss)
+
+
+def read_results(results_path):
+    """Reads results (JSON lines) and returns dictionary {(case, size, void_fraction): result}, if case was run
+    multiple times the last result is used."""
+    results = {}
+    with open(results_path) as results_file:
+        for line in results_file:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if result.get("type") == "result" and result["error"] is None:
+                results[(result["case"], result["size"], result["void_fraction"])] = result
+    return results
+
+
+def compare_results(baseline_path, current_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares minimal wall times of cases (the same case, size and void fraction) of two benchmark results.
+
+    Parameters
+    ----------
+    baseline_path : str
+        Path of baseline results (JSON lines).
+    current_path : str
+        Path of current results (JSON lines).
+    threshold : float
+        Relative increase of wall time which is regression (0.1 is 10 % slower).
+
+    Returns
+    -------
+    comparison : list(dict)
+        For each case in both results: case, size, void_fraction, baseline_time, current_time, ratio (current /
+        baseline), baseline_peak_rss, current_peak_rss and regression (True if ratio > 1 + threshold).
+    """
+    baseline_results = read_results(baseline_path)
+    current_results = read_results(current_path)
+    comparison = []
+    for key, current_result in current_results.items():
+        if key not in baseline_results:
+            continue
+        baseline_result = baseline_results[key]
+        ratio = current_result["wall_time_min"] / baseline_result["wall_time_min"]
+        comparison.append({
+            "case": key[0],
+            "size": key[1],
+            "void_fraction": key[2],
+            "baseline_time": baseline_result["wall_time_min"],
+            "current_time": current_result["wall_time_min"],
+            "ratio": ratio,
+            "baseline_peak_rss": baseline_result["peak_rss"],
+            "current_peak_rss": current_result["peak_rss"],
+            "regression": ratio > 1 + threshold
+        })
+    return comparison
@@ -0,0 +1,248 @@
+"""
+Relief Visualization Toolbox – Synthetic DEM
+
+Generates synthetic DEMs for benchmarks: fractal terrain (spectral synthesis), archaeological-scale features (barrows,
+ring ditches, pits, banks and hollow ways) and no_data voids (survey gaps, water bodies). DEMs are generated from seed,
+so the same parameters always give the same DEM.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import os
+
+import numpy as np
+import scipy.fft
+import scipy.ndimage
+from osgeo import gdal
+
+# DEM sizes (pixels in each direction) of benchmarks
+SIZES = (512, 1024, 2048, 4096, 8192, 16384)
+NO_DATA = -9999.
+# number of rows of spectrum multiplied at once (limits memory of frequency array)
+_SPECTRUM_BLOCK_ROWS = 1024
+
+
+def fractal_terrain(rows, cols, hurst=0.8, relief=150., seed=0):
+    """
+    Returns fractal (fractional Brownian motion) terrain, generated with spectral synthesis: white noise is filtered
+    with power law spectrum (amplitude ~ frequency ** -(hurst + 1)). Terrain is periodic (seamless at edges).
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows.
+    cols : int
+        Number of columns.
+    hurst : float
+        Hurst exponent (0-1), larger is smoother terrain.
+    relief : float
+        Difference between the highest and the lowest elevation.
+    seed : int
+        Seed of random generator.
+
+    Returns
+    -------
+    terrain : numpy.ndarray
+        2D float32 array of elevations between 0 and relief.
+    """
+    rng = np.random.default_rng(seed)
+    spectrum = scipy.fft.rfft2(rng.standard_normal((rows, cols), dtype=np.float32), workers=-1)  # complex64
+    spectrum[0, 0] = 0  # mean
+    freq_y = scipy.fft.fftfreq(rows).astype(np.float32)[:, np.newaxis]
+    freq_x_2 = scipy.fft.rfftfreq(cols).astype(np.float32)[np.newaxis, :] ** 2
+    for row_start in range(0, rows, _SPECTRUM_BLOCK_ROWS):
+        block_freq_2 = freq_y[row_start:row_start + _SPECTRUM_BLOCK_ROWS] ** 2 + freq_x_2
+        with np.errstate(divide="ignore"):  # zero frequency, its spectrum is 0
+            block_freq_2 **= -(hurst + 1) / 2
+        block_freq_2[~np.isfinite(block_freq_2)] = 0
+        spectrum[row_start:row_start + _SPECTRUM_BLOCK_ROWS] *= block_freq_2
+    terrain = scipy.fft.irfft2(spectrum, s=(rows, cols), workers=-1)
+    del spectrum
+    terrain -= terrain.min()
+    terrain *= relief / terrain.max()
+    return terrain.astype(np.float32, copy=False)
+
+
+def _add_radial_feature(dem, row, col, radius, profile):
+    """Adds feature profile(r) (r is distance from center divided by radius, feature is 0 at r >= 1) centered at
+    row, col (pixels) to dem."""
+    r_start = max(int(row - radius), 0)
+    r_end = min(int(row + radius) + 2, dem.shape[0])
+    c_start = max(int(col - radius), 0)
+    c_end = min(int(col + radius) + 2, dem.shape[1])
+    if r_start >= r_end or c_start >= c_end:
+        return
+    yy, xx = np.ogrid[r_start:r_end, c_start:c_end]
+    r = np.sqrt((yy - row) ** 2 + (xx - col) ** 2) / radius
+    dem[r_start:r_end, c_start:c_end] += np.where(r < 1, profile(np.minimum(r, 1)), 0).astype(dem.dtype)
+
+
+def _add_linear_feature(dem, row, col, length, angle, half_width, height):
+    """Adds linear feature (bank if height > 0, ditch or hollow way if height < 0) with cosine cross section, from
+    row, col (pixels) in direction angle (radians) to dem."""
+    row_end = row + length * np.sin(angle)
+    col_end = col + length * np.cos(angle)
+    r_start = max(int(min(row, row_end) - half_width), 0)
+    r_end = min(int(max(row, row_end) + half_width) + 2, dem.shape[0])
+    c_start = max(int(min(col, col_end) - half_width), 0)
+    c_end = min(int(max(col, col_end) + half_width) + 2, dem.shape[1])
+    if r_start >= r_end or c_start >= c_end:
+        return
+    yy, xx = np.ogrid[r_start:r_end, c_start:c_end]
+    # distance to segment
+    along = np.clip((yy - row) * np.sin(angle) + (xx - col) * np.cos(angle), 0, length)
+    distance = np.sqrt((yy - row - along * np.sin(angle)) ** 2 + (xx - col - along * np.cos(angle)) ** 2)
+    feature = np.where(distance < half_width, height * 0.5 * (1 + np.cos(np.pi * distance / half_width)), 0)
+    dem[r_start:r_end, c_start:c_end] += feature.astype(dem.dtype)
+
+
+def add_archaeological_features(dem, resolution=1., density=30., seed=0):
+    """
+    Adds archaeological-scale features to dem (in place): barrows (mounds 4-15 m radius, 0.5-2.5 m high), ring
+    ditches (5-20 m radius, 0.3-1 m deep), pits (1-3 m radius, 0.5-1.5 m deep) and linear features (banks, ditches
+    and hollow ways 50-300 m long). These are the features visualizations are tuned to show.
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        2D array of elevations, changed in place.
+    resolution : float
+        DEM resolution (pixel size) in meters.
+    density : float
+        Number of features of each type per square kilometer (linear features have a fifth of it).
+    seed : int
+        Seed of random generator.
+
+    Returns
+    -------
+    dem : numpy.ndarray
+        The same dem with features.
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = dem.shape
+    area_km2 = rows * cols * resolution ** 2 / 1e6
+    nr_features = rng.poisson(density * area_km2, size=3)
+    for _ in range(nr_features[0]):  # barrows
+        height = rng.uniform(0.5, 2.5)
+        _add_radial_feature(dem, rng.uniform(0, rows), rng.uniform(0, cols), rng.uniform(4, 15) / resolution,
+                            lambda r: height * (1 - r ** 2))
+    for _ in range(nr_features[1]):  # ring ditches
+        depth = rng.uniform(0.3, 1)
+        width = rng.uniform(0.1, 0.25)  # relative to radius
+        _add_radial_feature(dem, rng.uniform(0, rows), rng.uniform(0, cols), rng.uniform(5, 20) / resolution,
+                            lambda r: -depth * np.clip(1 - np.abs(r - (1 - width)) / width, 0, 1))
+    for _ in range(nr_features[2]):  # pits
+        depth = rng.uniform(0.5, 1.5)
+        _add_radial_feature(dem, rng.uniform(0, rows), rng.uniform(0, cols), rng.uniform(1, 3) / resolution,
+                            lambda r: -depth * np.cos(r * np.pi / 2) ** 2)
+    for _ in range(rng.poisson(density / 5 * area_km2)):  # banks, ditches and hollow ways
+        _add_linear_feature(dem, rng.uniform(0, rows), rng.uniform(0, cols), rng.uniform(50, 300) / resolution,
+                            rng.uniform(0, 2 * np.pi), rng.uniform(1, 3) / resolution,
+                            rng.choice([-1, 1]) * rng.uniform(0.3, 1.5))
+    return dem
+
+
+def add_voids(dem, void_fraction, no_data=NO_DATA, seed=0):
+    """
+    Sets void_fraction of dem pixels to no_data (in place). Voids are large connected areas (e.g. water bodies,
+    survey gaps), taken from low resolution fractal field, so whole tiles can be no_data.
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        2D array of elevations, changed in place.
+    void_fraction : float
+        Fraction (0-1) of no_data pixels.
+    no_data : float
+        Value of no_data pixels.
+    seed : int
+        Seed of random generator.
+
+    Returns
+    -------
+    dem : numpy.ndarray
+        The same dem with voids.
+    """
+    if void_fraction <= 0:
+        return dem
+    rows, cols = dem.shape
+    factor = 16
+    field = fractal_terrain(-(-rows // factor), -(-cols // factor), hurst=0.5, relief=1., seed=seed + 1)
+    field = scipy.ndimage.zoom(field, factor, order=1)[:rows, :cols]
+    dem[field < np.quantile(field, void_fraction)] = no_data
+    return dem
+
+
+def synthetic_dem(size, resolution=1., void_fraction=0., no_data=NO_DATA, features=True, seed=0):
+    """
+    Returns synthetic DEM: fractal terrain (150 m relief above 300 m) with archaeological features and voids.
+
+    Parameters
+    ----------
+    size : int or tuple(int, int)
+        Number of pixels in each direction or (rows, cols).
+    resolution : float
+        DEM resolution (pixel size) in meters.
+    void_fraction : float
+        Fraction (0-1) of no_data pixels.
+    no_data : float
+        Value of no_data pixels.
+    features : bool
+        If True archaeological features are added (see add_archaeological_features).
+    seed : int
+        Seed of random generator.
+
+    Returns
+    -------
+    dem : numpy.ndarray
+        2D float32 array.
+    """
+    rows, cols = (size, size) if np.isscalar(size) else size
+    # relief of the whole DEM is independent of its size in pixels, but terrain is rougher at higher resolution
+    dem = fractal_terrain(rows, cols, relief=150. * max(rows, cols) * resolution / 4096, seed=seed)
+    dem += 300
+    if features:
+        add_archaeological_features(dem, resolution=resolution, seed=seed)
+    add_voids(dem, void_fraction, no_data=no_data, seed=seed)
+    return dem
+
+
+def save_synthetic_dem(out_dem_path, size, resolution=1., void_fraction=0., no_data=NO_DATA, features=True, seed=0):
+    """Generates synthetic DEM (see synthetic_dem) and saves it to out_dem_path (tiled GeoTIFF)."""
+    dem = synthetic_dem(size, resolution=resolution, void_fraction=void_fraction, no_data=no_data,
+                        features=features, seed=seed)
+    gtiff_driver = gdal.GetDriverByName("GTiff")
+    out_ds = gtiff_driver.Create(out_dem_path, xsize=dem.shape[1], ysize=dem.shape[0], bands=1,
+                                 eType=gdal.GDT_Float32, options=["TILED=YES", "BIGTIFF=IF_NEEDED"])
+    out_ds.SetGeoTransform((500000., resolution, 0., 100000. + dem.shape[0] * resolution, 0., -resolution))
+    band = out_ds.GetRasterBand(1)
+    band.SetNoDataValue(no_data)
+    band.WriteArray(dem)
+    out_ds.FlushCache()
+    out_ds = None
+    return out_dem_path
+
+
+def get_synthetic_dem_path(dem_dir, size, resolution=1., void_fraction=0., seed=0):
+    """Returns path of synthetic DEM with given parameters in dem_dir, DEM is generated (save_synthetic_dem) only if
+    it doesn't exist yet."""
+    os.makedirs(dem_dir, exist_ok=True)
+    dem_path = os.path.join(dem_dir, "synthetic_dem_{}_res{:g}_void{:g}_seed{}.tif".format(
+        size, resolution, void_fraction, seed))
+    if not os.path.isfile(dem_path):
+        tmp_dem_path = dem_path[:-4] + "_tmp.tif"
+        save_synthetic_dem(tmp_dem_path, size, resolution=resolution, void_fraction=void_fraction, seed=seed)
+        os.replace(tmp_dem_path, dem_path)
+    return dem_path
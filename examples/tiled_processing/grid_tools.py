@@ -10,10 +10,13 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import rasterio
+from affine import Affine
 from rasterio.features import shapes
 from shapely.geometry import box
 from shapely.geometry import shape
 
+import rvt.default
+
 
 def bounding_grid(raster_file, tile_size_pix, tag=False, grid_type="GDF", save_gdf=None):
     """Creates bounding grid based on the extents of VRT file.
@@ -147,23 +150,14 @@ def filter_by_outline(in_grid, outline_file, save_gpkg=False, save_path=None):
     return out_grid
 
 
-def poly_from_valid(tif_pth, save_gpkg=False):
-    # Read raster data
+def poly_from_valid(tif_pth, save_gpkg=False, max_size=4096):
+    # Coarse mask of valid data (1 valid, 0 nodata), read from mask band / overviews instead of whole raster, coarse
+    # pixel is valid if any pixel in it is valid (outline is only used to filter grid cells)
+    footprint = rvt.default.get_valid_footprint(tif_pth, max_size=max_size)
+    raster = footprint["array"].astype(np.uint8)
+    transform = Affine.from_gdal(*footprint["geo_transform"])
     with rasterio.open(tif_pth) as src:
-        raster = src.read()
-        nodata = src.nodata
         crs = src.crs
-        transform = src.transform
-
-    # Set nodaata to 0 and valid data to 1
-    if nodata is None:
-        raster[:] = 1
-    elif np.isnan(nodata):
-        raster[~np.isnan(raster)] = 1
-        raster[np.isnan(raster)] = 0
-    else:
-        raster[raster != nodata] = 1
-        raster[raster == nodata] = 0
 
     # Outputs a list of (polygon, value) tuples
     output = list(shapes(raster, transform=transform))
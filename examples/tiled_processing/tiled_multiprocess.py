@@ -20,7 +20,9 @@ from rasterio.windows import from_bounds
 
 import grid_tools as gt
 import rvt.blend
+import rvt.cost
 import rvt.default
+import rvt.progress
 import rvt.vis
 from rvt.blend_func import normalize_image
 
@@ -34,15 +36,10 @@ def run_main(list_tifs, vis_types, blend_types):
 
         print("Start --- " + in_file.as_posix())
 
-        # (2) Check if larger than 4000 px
+        # (2) Tile size from cost model of required visualizations (None if image fits into memory of one process)
         with rasterio.open(input_vrt) as src:
-            if src.shape > (6000, 6000):
-                # If at least 1 dim is larger than 6000 pixels
-                tile_size = 4000
-            elif src.shape > (4000, 4000):
-                tile_size = 2000
-            else:
-                tile_size = None
+            y_size, x_size = src.shape
+        tile_size = get_tile_size(x_size, y_size, vis_types, blend_types)
 
         if tile_size:
             # (3) To filter we need polygon covering valid data
@@ -75,6 +72,53 @@ def run_main(list_tifs, vis_types, blend_types):
         )
 
 
+def get_tile_size(x_size, y_size, vis_types, blend_types):
+    """Largest (square) tile size for which all required visualizations fit into memory of one process
+    (rvt.cost.auto_tile_size), None if the whole image fits."""
+    # Same number of processes as in tiled_blending
+    nr_processes = os.cpu_count() - 2
+    if nr_processes < 1:
+        nr_processes = 1
+    available_memory = rvt.cost.get_available_memory()
+    if available_memory is None:
+        return None
+    memory_budget = rvt.cost.MEMORY_FRACTION * available_memory / nr_processes
+
+    default_1 = rvt.default.DefaultValues()
+    default_1.read_default_from_file(Path(__file__).resolve().parent / "default_1.json")
+    default_2 = rvt.default.DefaultValues()
+    default_2.read_default_from_file(Path(__file__).resolve().parent / "default_2.json")
+    visualizations = {
+        "slp": rvt.default.RVTVisualization.SLOPE,
+        "hs": rvt.default.RVTVisualization.HILLSHADE,
+        "slrm": rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL,
+        "svf": rvt.default.RVTVisualization.SKY_VIEW_FACTOR,
+        "opns": rvt.default.RVTVisualization.POSITIVE_OPENNESS,
+        "neg_opns": rvt.default.RVTVisualization.NEGATIVE_OPENNESS,
+        "ld": rvt.default.RVTVisualization.LOCAL_DOMINANCE,
+        "mstp": rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION
+    }
+
+    tile_size = max(x_size, y_size)
+    for key, required in get_required_arrays(vis_types, blend_types).items():
+        if not required:
+            continue
+        vis, default_nr = key.rsplit("_", 1)
+        tile_size_x, tile_size_y, _ = rvt.cost.auto_tile_size(
+            rvt_visualization=visualizations[vis],
+            rvt_default=default_1 if default_nr == "1" else default_2,
+            x_size=x_size,
+            y_size=y_size,
+            memory_budget=memory_budget,
+            max_jobs=1
+        )
+        tile_size = min(tile_size, max(tile_size_x, tile_size_y))  # tile sizes are clipped to image size
+
+    if tile_size >= max(x_size, y_size):
+        return None
+    return tile_size
+
+
 def tiled_blending(vis_types, blend_types, input_vrt_path, tiles_list):
     t0 = time.time()
 
@@ -100,18 +144,20 @@ def tiled_blending(vis_types, blend_types, input_vrt_path, tiles_list):
         #
         # ----------------------------------
         input_process_list = [(src_tif_path, ll_path, vis_types, blend_types, i) for i in tiles_list]
+        # Prints tile index, throughput and ETA (replace print_progress with own callback for progress bar)
+        progress = rvt.progress.Progress(nr_tiles=len(tiles_list), callback=rvt.progress.print_progress)
         with mp.Pool(nr_processes) as p:
             realist = [p.apply_async(compute_save_blends, r) for r in input_process_list]
             for i, result in enumerate(realist):
                 pool_out = result.get()
                 results.append(pool_out)
-                print(f"Finished tile {i + 1} of {len(tiles_list)}")
+                progress.tile_done()
 
         # # SINGLE-PROCESS FOR DEBUG
         # for i, one_tile in enumerate(tiles_list):
         #     result = compute_save_blends(src_tif_path, ll_path, vis_types, blend_types, one_tile)
         #     results.append(result)
-        #     print(f"Finished tile {i + 1} of {len(tiles_list)}")
+        #     progress.tile_done()
 
         # Collect all paths into a list for each visualisation to be merged
         result_dict = defaultdict(list)
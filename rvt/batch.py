@@ -0,0 +1,271 @@
+"""
+Relief Visualization Toolbox – Batch Processing
+
+Contains functions to compute and save visualizations (DefaultValues.save_visualizations) of many DEMs in parallel
+processes with memory budget. Memory of each DEM (job) is estimated from raster size and enabled visualizations, jobs
+are started (largest first) only when they fit into the memory budget, jobs that don't fit are computed tile by tile.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import concurrent.futures
+import copy
+import os
+import time
+import warnings
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+import rvt.cost
+import rvt.default
+
+# DefaultValues compute attribute of visualization
+_VISUALIZATION_COMPUTE_ATTRIBUTE = {
+    rvt.default.RVTVisualization.SLOPE: "slp_compute",
+    rvt.default.RVTVisualization.HILLSHADE: "hs_compute",
+    rvt.default.RVTVisualization.MULTI_HILLSHADE: "mhs_compute",
+    rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL: "slrm_compute",
+    rvt.default.RVTVisualization.SKY_VIEW_FACTOR: "svf_compute",
+    rvt.default.RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR: "asvf_compute",
+    rvt.default.RVTVisualization.POSITIVE_OPENNESS: "pos_opns_compute",
+    rvt.default.RVTVisualization.NEGATIVE_OPENNESS: "neg_opns_compute",
+    rvt.default.RVTVisualization.SKY_ILLUMINATION: "sim_compute",
+    rvt.default.RVTVisualization.LOCAL_DOMINANCE: "ld_compute",
+    rvt.default.RVTVisualization.MULTI_SCALE_RELIEF_MODEL: "msrm_compute",
+    rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION: "mstp_compute",
+}
+
+# smallest tile size (x and y) jobs that don't fit into memory budget are split into
+MIN_TILE_SIZE = 256
+
+
+class BatchJob:
+    """
+    Single DEM of batch processing (computed with DefaultValues.save_visualizations).
+
+    Attributes
+    ----------
+    dem_path : Path
+        Path to DEM.
+    output_dir_path : Path
+        Directory where visualizations are saved.
+    rvt_default : rvt.default.DefaultValues
+        Parameters of visualizations (copy of batch DefaultValues, tile attributes are changed if job is tiled).
+    nbytes : int
+        Estimated peak memory of job in bytes.
+    tiled : bool
+        If job is computed tile by tile (it doesn't fit into memory budget as a whole).
+    compute_time : float
+        Time (in seconds) of computing and saving visualizations, None if job wasn't computed (yet).
+    error : str
+        Error message if job failed, else None.
+    """
+
+    def __init__(self, dem_path, output_dir_path, rvt_default, nbytes, tiled=False):
+        self.dem_path = dem_path
+        self.output_dir_path = output_dir_path
+        self.rvt_default = rvt_default
+        self.nbytes = nbytes
+        self.tiled = tiled
+        self.compute_time = None
+        self.error = None
+
+    def __repr__(self):
+        return "BatchJob(dem_path={}, nbytes={}, tiled={}, compute_time={}, error={})".format(
+            self.dem_path, self.nbytes, self.tiled, self.compute_time, self.error)
+
+
+def enabled_visualizations(rvt_default: "rvt.default.DefaultValues") -> List["rvt.default.RVTVisualization"]:
+    """Returns list of visualizations which are computed by rvt_default.save_visualizations."""
+    return [visualization for visualization, compute_attribute in _VISUALIZATION_COMPUTE_ATTRIBUTE.items()
+            if getattr(rvt_default, compute_attribute)]
+
+
+def estimate_job_nbytes(
+        rvt_default: "rvt.default.DefaultValues", x_size: int, y_size: int, tiled: bool = False
+) -> int:
+    """Returns estimated peak memory (in bytes) of rvt_default.save_visualizations on DEM of size x_size * y_size.
+    Visualizations are computed one after another, so estimate is maximum of enabled visualizations. If tiled,
+    estimate is for single tile (rvt_default.tile_size) with overlap."""
+    if tiled:
+        x_size = min(x_size, rvt_default.tile_size[0])
+        y_size = min(y_size, rvt_default.tile_size[1])
+    return max([rvt.cost.estimate_visualization_nbytes(rvt_visualization=visualization, rvt_default=rvt_default,
+                                                       shape=(y_size, x_size))
+                for visualization in enabled_visualizations(rvt_default)], default=0)
+
+
+def create_job(
+        dem_path: Path,
+        rvt_default: "rvt.default.DefaultValues",
+        output_dir_path: Optional[Path] = None,
+        memory_budget: Optional[int] = None,
+        max_jobs: Optional[int] = None
+) -> BatchJob:
+    """Creates BatchJob of dem_path. If job (whole DEM) doesn't fit into memory_budget it is computed tile by tile,
+    tile size is halved (not below MIN_TILE_SIZE) until tile fits into memory_budget. If rvt_default.tile_size is
+    "auto", tile size is chosen (rvt.cost.auto_tile_size) within job memory and max_jobs parallel jobs."""
+    if output_dir_path is None:
+        output_dir_path = dem_path.parent
+    dem_metadata = rvt.default.get_raster_metadata(raster_path=dem_path.as_posix())
+    x_size = dem_metadata["x_size"]
+    y_size = dem_metadata["y_size"]
+    rvt_default = copy.copy(rvt_default)
+    if rvt_default.tile_size == "auto":
+        nbytes = estimate_job_nbytes(rvt_default=rvt_default, x_size=x_size, y_size=y_size)
+        tiled = memory_budget is not None and nbytes > memory_budget
+        if tiled:
+            nbytes = memory_budget
+        if rvt_default.tile_memory_limit is not None:
+            nbytes = min(nbytes, rvt_default.tile_memory_limit)
+        rvt_default.tile_memory_limit = nbytes
+        if max_jobs is not None:
+            rvt_default.tile_max_jobs = max_jobs if rvt_default.tile_max_jobs is None else \
+                min(max_jobs, rvt_default.tile_max_jobs)
+        return BatchJob(dem_path=dem_path, output_dir_path=output_dir_path, rvt_default=rvt_default, nbytes=nbytes,
+                        tiled=tiled)
+    tiled = x_size * y_size > rvt_default.tile_size_limit
+    nbytes = estimate_job_nbytes(rvt_default=rvt_default, x_size=x_size, y_size=y_size, tiled=tiled)
+    if memory_budget is not None and nbytes > memory_budget:
+        tiled = True
+        rvt_default.tile_size_limit = 0  # always tile by tile
+        nbytes = estimate_job_nbytes(rvt_default=rvt_default, x_size=x_size, y_size=y_size, tiled=True)
+        while nbytes > memory_budget and min(rvt_default.tile_size) // 2 >= MIN_TILE_SIZE:
+            rvt_default.tile_size = (rvt_default.tile_size[0] // 2, rvt_default.tile_size[1] // 2)
+            nbytes = estimate_job_nbytes(rvt_default=rvt_default, x_size=x_size, y_size=y_size, tiled=True)
+    return BatchJob(dem_path=dem_path, output_dir_path=output_dir_path, rvt_default=rvt_default, nbytes=nbytes,
+                    tiled=tiled)
+
+
+def _run_job(job: BatchJob) -> Tuple[float, Optional[str]]:
+    """Computes and saves visualizations of job, returns compute time (in seconds) and error message (None if job
+    succeeded). Runs in worker process."""
+    start_time = time.time()
+    error = None
+    try:
+        os.makedirs(job.output_dir_path, exist_ok=True)
+        job.rvt_default.save_visualizations(dem_path=job.dem_path.as_posix(),
+                                            custom_dir=job.output_dir_path.as_posix())
+    except Exception as exception:
+        error = "{}: {}".format(type(exception).__name__, exception)
+    return time.time() - start_time, error
+
+
+def save_visualizations_batch(
+        dem_paths: List[Union[str, Path]],
+        rvt_default: "rvt.default.DefaultValues",
+        output_dir_path: Optional[Union[str, Path]] = None,
+        memory_budget: Optional[int] = None,
+        nr_processes: Optional[int] = None,
+        verbose: bool = False
+) -> List[BatchJob]:
+    """
+    Computes and saves visualizations (rvt_default.save_visualizations) of DEMs in parallel processes. Jobs are
+    started largest (estimated memory) first, a job is started only when it fits into free memory budget (memory
+    budget minus estimates of running jobs). Jobs which don't fit into memory budget on their own are computed tile by
+    tile (and run alone if even a tile doesn't fit).
+
+    Parameters
+    ----------
+    dem_paths : list(str or Path)
+        Paths to DEMs.
+    rvt_default : rvt.default.DefaultValues
+        Parameters of visualizations and which visualizations are computed and saved.
+    output_dir_path : str or Path
+        Directory to save visualizations. If None visualizations are saved in directory of each DEM.
+    memory_budget : int
+        Memory (in bytes) for all running jobs. If None, 80 % of available memory is used (not limited if available
+        memory can't be determined).
+    nr_processes : int
+        Maximal number of parallel processes. If None, number of CPUs is used. If 1, jobs are computed in this process.
+    verbose : bool
+        If True, prints compute time of each DEM.
+
+    Returns
+    -------
+    jobs : list(BatchJob)
+        Jobs (in order of dem_paths) with estimated memory, compute time and error message.
+    """
+    if nr_processes is None:
+        nr_processes = os.cpu_count() or 1
+    if nr_processes < 1:
+        raise Exception("rvt.batch.save_visualizations_batch: nr_processes has to be at least 1!")
+    if memory_budget is None:
+        available_memory = rvt.cost.get_available_memory()
+        if available_memory is not None:
+            memory_budget = int(0.8 * available_memory)
+    if output_dir_path is not None:
+        output_dir_path = Path(output_dir_path)
+
+    jobs = [create_job(dem_path=Path(dem_path), rvt_default=rvt_default, output_dir_path=output_dir_path,
+                       memory_budget=memory_budget, max_jobs=max((os.cpu_count() or 1) // nr_processes, 1))
+            for dem_path in dem_paths]
+    pending_jobs = sorted(jobs, key=lambda pending_job: pending_job.nbytes, reverse=True)  # largest first
+
+    def finish_job(finished_job, compute_time, error):
+        finished_job.compute_time = compute_time
+        finished_job.error = error
+        if error is not None:
+            warnings.warn("rvt.batch.save_visualizations_batch: {} failed ({})!".format(finished_job.dem_path, error))
+        elif verbose:
+            print("{} computed and saved in {:.2f} s{}".format(finished_job.dem_path, compute_time,
+                                                               " (tile by tile)" if finished_job.tiled else ""))
+
+    if nr_processes == 1:
+        for job in pending_jobs:
+            finish_job(job, *_run_job(job))
+        return jobs
+
+    free_memory = np.inf if memory_budget is None else memory_budget
+    running_jobs = {}  # {future: job}
+    # close data sets opened while creating jobs, so worker processes don't inherit them (and files aren't locked)
+    rvt.default.clear_raster_cache()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(nr_processes, max(len(jobs), 1))) as executor:
+        while pending_jobs or running_jobs:
+            # admit largest jobs that fit into free memory, job larger than budget runs alone
+            while pending_jobs and len(running_jobs) < nr_processes:
+                job = next((pending_job for pending_job in pending_jobs if pending_job.nbytes <= free_memory), None)
+                if job is None:
+                    if running_jobs:
+                        break
+                    job = pending_jobs[0]
+                pending_jobs.remove(job)
+                free_memory -= job.nbytes
+                running_jobs[executor.submit(_run_job, job)] = job
+            done_futures, _ = concurrent.futures.wait(running_jobs, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done_futures:
+                job = running_jobs.pop(future)
+                free_memory += job.nbytes
+                finish_job(job, *future.result())
+    return jobs
+
+
+def save_visualizations_dir(
+        input_dir_path: Union[str, Path],
+        rvt_default: "rvt.default.DefaultValues",
+        output_dir_path: Optional[Union[str, Path]] = None,
+        memory_budget: Optional[int] = None,
+        nr_processes: Optional[int] = None,
+        verbose: bool = False
+) -> List[BatchJob]:
+    """Computes and saves visualizations of all GeoTIFF DEMs (.tif, .tiff) in input_dir_path, see
+    save_visualizations_batch."""
+    input_dir_path = Path(input_dir_path)
+    dem_paths = sorted(path for path in input_dir_path.iterdir()
+                       if path.is_file() and path.suffix.lower() in (".tif", ".tiff"))
+    return save_visualizations_batch(dem_paths=dem_paths, rvt_default=rvt_default, output_dir_path=output_dir_path,
+                                     memory_budget=memory_budget, nr_processes=nr_processes, verbose=verbose)
@@ -20,6 +20,7 @@ Copyright:
 
 # TODO: more testing, find and fix bugs if they exists
 
+import copy
 import datetime
 import json
 import os
@@ -28,6 +29,7 @@ import warnings
 import numpy as np
 
 import rvt.default
+import rvt.progress
 import rvt.vis
 from rvt.blend_func import *
 
@@ -331,15 +333,20 @@ class BlenderCombination:
             layer.check_data()
 
     def render_all_images(self, default=None, save_visualizations=False, save_render_path=None, save_float=True,
-                          save_8bit=False, no_data=None):
+                          save_8bit=False, no_data=None, visualizations=None, progress_callback=None):
         """Render all layers and returns blended image. If specific layer (BlenderLayer) in layers has image
         (is not None), method uses this image, if image is None and layer has image_path method reads image from
         path. If both image and image_path are None method calculates visualization. If save_visualization is True
         method needs dem_path and saves each visualization (if it doesn't exists) in directory of dem_path,
         else (save_visualization=False) method needs dem_arr, dem_resolution and calculates each visualization
-        simultaneously (in memory). Be careful save_visualisation applies only if specific BlenderLayer
-        image and image_path are None. Parameter no_data changes all pixels with this values to np.nan,
-        if save_visualizations is Ture it is not needed."""
+        simultaneously (in memory), visualizations that share computation (sky-view factor, anisotropic sky-view
+        factor, positive and negative openness) are computed together (see create_execution_plan). Be careful
+        save_visualisation applies only if specific BlenderLayer image and image_path are None. Parameter no_data
+        changes all pixels with this values to np.nan, if save_visualizations is Ture it is not needed. Parameter
+        visualizations is dictionary of already computed visualizations (output of compute_execution_plan), used
+        when save_visualizations is False. If progress_callback is not None, it is called after each layer (and after
+        saving render) with progress info (see rvt.progress.Progress.tile_done, tiles are layers and window is None),
+        bytes read are bytes of images read from files."""
 
         # Preform checks
         self.check_data()
@@ -368,6 +375,18 @@ class BlenderCombination:
         # If default (rvt.default.DefaultValues class) is not defined, use predefined values
         if default is None:
             default = rvt.default.DefaultValues()
+        elif default.cache is not None and save_visualizations:
+            # saved visualizations could be computed with other parameters, with cache they are always rewritten
+            # (from cache if DEM and parameters didn't change)
+            default = copy.copy(default)
+            default.overwrite = 1
+
+        # Progress of layers (and saving render)
+        progress = rvt.progress.Progress(
+            nr_tiles=sum(layer.vis is not None for layer in self.layers) + int(save_render_path is not None),
+            callback=progress_callback,
+            name=self.name
+        )
 
         # Rendering across all layers - form last to first layer
         rendered_image = None
@@ -416,168 +435,107 @@ class BlenderCombination:
                     max_norm,
                     normalization
                 )
+            elif not save_visualizations:
+                # image computed from DEM (in memory), visualizations shared by layers are computed once
+                if visualizations is None or visualization.lower() not in visualizations:
+                    visualizations = compute_execution_plan(
+                        execution_plan=create_execution_plan(combinations=[self]),
+                        dem_arr=self.dem_arr,
+                        dem_resolution=self.dem_resolution,
+                        default=default,
+                        no_data=no_data
+                    )
+                image = visualizations[visualization.lower()]
+                norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
             else:
-                # calculate image from DEM
+                # calculate image from DEM and save it
                 if self.layers[i_img].vis.lower() == "slope gradient":
-                    if save_visualizations:
-                        default.save_slope(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
-                                           save_8bit=False)
-                        image_path = default.get_slope_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_slope(dem_arr=self.dem_arr, resolution_x=self.dem_resolution,
-                                                  resolution_y=self.dem_resolution, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_slope(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
+                                       save_8bit=False)
+                    image_path = default.get_slope_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "hillshade":
-                    if save_visualizations:
-                        default.save_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                               save_float=True, save_8bit=False)
-                        image_path = default.get_hillshade_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_hillshade(dem_arr=self.dem_arr, resolution_x=self.dem_resolution,
-                                                      resolution_y=self.dem_resolution, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                           save_float=True, save_8bit=False)
+                    image_path = default.get_hillshade_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "shadow":
-                    if save_visualizations:
-                        default.save_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                               save_float=True, save_8bit=False, save_shadow=True)
-                        image_path = default.get_shadow_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_shadow(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                   no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
-
+                    default.save_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                           save_float=True, save_8bit=False, save_shadow=True)
+                    image_path = default.get_shadow_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "multiple directions hillshade":
-                    if save_visualizations:
-                        default.save_multi_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                                     save_float=False, save_8bit=True)
-                        image_path = default.get_multi_hillshade_path(self.dem_path, bit8=True)
-                        norm_image = normalize_image("", rvt.default.get_raster_arr(image_path)["array"],
-                                                     0, 255, normalization)
-                        norm_image = normalize_image(visualization, norm_image,
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        red_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                         resolution_y=self.dem_resolution,
-                                                         sun_elevation=default.mhs_sun_el, sun_azimuth=315,
-                                                         no_data=no_data)
-                        green_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                           resolution_y=self.dem_resolution,
-                                                           sun_elevation=default.mhs_sun_el, sun_azimuth=22.5,
-                                                           no_data=no_data)
-                        blue_band_arr = rvt.vis.hillshade(dem=self.dem_arr, resolution_x=self.dem_resolution,
-                                                          resolution_y=self.dem_resolution,
-                                                          sun_elevation=default.mhs_sun_el, sun_azimuth=90,
-                                                          no_data=no_data)
-                        image = np.array([red_band_arr, green_band_arr, blue_band_arr])
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_multi_hillshade(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                                 save_float=False, save_8bit=True)
+                    image_path = default.get_multi_hillshade_path(self.dem_path, bit8=True)
+                    norm_image = normalize_image("", rvt.default.get_raster_arr(image_path)["array"],
+                                                 0, 255, normalization)
+                    norm_image = normalize_image(visualization, norm_image,
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "simple local relief model":
-                    if save_visualizations:
-                        default.save_slrm(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
-                                          save_8bit=False)
-                        image_path = default.get_slrm_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_slrm(dem_arr=self.dem_arr, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_slrm(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
+                                      save_8bit=False)
+                    image_path = default.get_slrm_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "sky-view factor":
-                    if save_visualizations:
-                        default.save_sky_view_factor(dem_path=self.dem_path, save_svf=True, save_asvf=False,
-                                                     save_opns=False, custom_dir=save_render_directory, save_float=True,
-                                                     save_8bit=False)
-                        image_path = default.get_svf_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_sky_view_factor(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                            compute_svf=True, compute_asvf=False,
-                                                            compute_opns=False, no_data=no_data)["svf"]
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_sky_view_factor(dem_path=self.dem_path, save_svf=True, save_asvf=False,
+                                                 save_opns=False, custom_dir=save_render_directory, save_float=True,
+                                                 save_8bit=False)
+                    image_path = default.get_svf_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "anisotropic sky-view factor":
-                    if save_visualizations:
-                        default.save_sky_view_factor(dem_path=self.dem_path, save_svf=False, save_asvf=True,
-                                                     save_opns=False, custom_dir=save_render_directory, save_float=True,
-                                                     save_8bit=False)
-                        image_path = default.get_asvf_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_sky_view_factor(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                            compute_svf=False, compute_asvf=True,
-                                                            compute_opns=False, no_data=no_data)["asvf"]
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_sky_view_factor(dem_path=self.dem_path, save_svf=False, save_asvf=True,
+                                                 save_opns=False, custom_dir=save_render_directory, save_float=True,
+                                                 save_8bit=False)
+                    image_path = default.get_asvf_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "openness - positive":
-                    if save_visualizations:
-                        default.save_sky_view_factor(dem_path=self.dem_path, save_svf=False, save_asvf=False,
-                                                     save_opns=True, custom_dir=save_render_directory, save_float=True,
-                                                     save_8bit=False)
-                        image_path = default.get_opns_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_sky_view_factor(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                            compute_svf=False, compute_asvf=False,
-                                                            compute_opns=True, no_data=no_data)["opns"]
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_sky_view_factor(dem_path=self.dem_path, save_svf=False, save_asvf=False,
+                                                 save_opns=True, custom_dir=save_render_directory, save_float=True,
+                                                 save_8bit=False)
+                    image_path = default.get_opns_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "openness - negative":
-                    if save_visualizations:
-                        default.save_neg_opns(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
-                                              save_8bit=False)
-                        image_path = default.get_neg_opns_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_neg_opns(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                     no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_neg_opns(dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True,
+                                          save_8bit=False)
+                    image_path = default.get_neg_opns_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "sky illumination":
-                    if save_visualizations:
-                        default.save_sky_illumination(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                                      save_float=True, save_8bit=False)
-                        image_path = default.get_sky_illumination_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_sky_illumination(dem_arr=self.dem_arr, resolution=self.dem_resolution,
-                                                             no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_sky_illumination(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                                  save_float=True, save_8bit=False)
+                    image_path = default.get_sky_illumination_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "local dominance":
-                    if save_visualizations:
-                        default.save_local_dominance(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                                     save_float=True, save_8bit=False)
-                        image_path = default.get_local_dominance_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_local_dominance(dem_arr=self.dem_arr, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_local_dominance(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                                 save_float=True, save_8bit=False)
+                    image_path = default.get_local_dominance_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "multi-scale relief model":
-                    if save_visualizations:
-                        default.save_msrm(dem_path=self.dem_path, custom_dir=save_render_directory,
-                                          save_float=True, save_8bit=False)
-                        image_path = default.get_msrm_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_msrm(dem_arr=self.dem_arr, resolution=self.dem_resolution, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_msrm(dem_path=self.dem_path, custom_dir=save_render_directory,
+                                      save_float=True, save_8bit=False)
+                    image_path = default.get_msrm_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
                 elif self.layers[i_img].vis.lower() == "multi-scale topographic position":
-                    if save_visualizations:
-                        default.save_mstp(
-                            dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True, save_8bit=False
-                        )
-                        image_path = default.get_mstp_path(self.dem_path)
-                        norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
-                                                     min_norm, max_norm, normalization)
-                    else:
-                        image = default.get_mstp(dem_arr=self.dem_arr, no_data=no_data)
-                        norm_image = normalize_image(visualization, image, min_norm, max_norm, normalization)
+                    default.save_mstp(
+                        dem_path=self.dem_path, custom_dir=save_render_directory, save_float=True, save_8bit=False
+                    )
+                    image_path = default.get_mstp_path(self.dem_path)
+                    norm_image = normalize_image(visualization, rvt.default.get_raster_arr(image_path)["array"],
+                                                 min_norm, max_norm, normalization)
+
+            if image is None:  # image read from image_path (given or saved visualization)
+                progress.add_read(norm_image.nbytes)
 
             # Apply colormap
             colormap = self.layers[i_img].colormap
@@ -593,6 +551,7 @@ class BlenderCombination:
                 # if current layer has visualization applied, but there has been no rendering
                 # of images yet, than current layer will be the initial value of rendered_image
                 rendered_image = norm_image
+                progress.tile_done()
                 continue
             else:
                 active = norm_image
@@ -614,16 +573,20 @@ class BlenderCombination:
 
                 if np.nanmin(rendered_image) < 0 or np.nanmax(rendered_image) > 1:
                     warnings.warn("rvt.blend.BlenderCombination.render_all_images: Rendered image scale distorted")
+            progress.tile_done()
 
         # Save image to file if path is present
         if save_render_path is not None:
             if save_float:
                 rvt.default.save_raster(src_raster_path=self.dem_path, out_raster_path=save_render_path,
                                         out_raster_arr=rendered_image)
+                progress.add_written(rendered_image.nbytes)
             if save_8bit:
                 rendered_image_8bit = rvt.vis.byte_scale(rendered_image, c_min=0, c_max=1)
                 rvt.default.save_raster(src_raster_path=self.dem_path, out_raster_path=save_render_8bit_path,
                                         out_raster_arr=rendered_image_8bit, e_type=1)
+                progress.add_written(rendered_image_8bit.nbytes)
+            progress.tile_done()
 
         return rendered_image  # returns float
 
@@ -783,6 +746,122 @@ def compare_2_combinations(combination1: BlenderCombination, combination2: Blend
     return True
 
 
+# Execution plan, visualization method (BlenderLayer.vis, lower case) : (node, node output key). Node is computed
+# once for all layers (and combinations) which need any of its outputs.
+VISUALIZATION_METHOD_NODES = {
+    "slope gradient": ("slope", None),
+    "hillshade": ("hillshade", None),
+    "shadow": ("shadow", None),
+    "multiple directions hillshade": ("multi_hillshade", None),
+    "simple local relief model": ("slrm", None),
+    "sky-view factor": ("horizon_search", "svf"),
+    "anisotropic sky-view factor": ("horizon_search", "asvf"),
+    "openness - positive": ("horizon_search", "opns"),
+    "openness - negative": ("horizon_search", "neg_opns"),
+    "sky illumination": ("sky_illumination", None),
+    "local dominance": ("local_dominance", None),
+    "multi-scale relief model": ("msrm", None),
+    "multi-scale topographic position": ("mstp", None),
+}
+
+
+def create_execution_plan(combinations):
+    """
+    Creates execution plan for computing visualizations of combinations (list of BlenderCombination) in memory.
+    Execution plan contains each unique visualization node once (e.g. sky-view factor and openness layers share one
+    horizon search), only layers without image and image_path are included.
+
+    Parameters
+    ----------
+    combinations : list(BlenderCombination)
+        Combinations which will be rendered from the same DEM with the same default (rvt.default.DefaultValues).
+
+    Returns
+    -------
+    execution_plan : dict
+        Dictionary {node: {visualization_method: node_output_key}}, see VISUALIZATION_METHOD_NODES.
+    """
+    execution_plan = {}
+    for combination in combinations:
+        for layer in combination.layers:
+            if layer.vis is None or layer.image is not None or layer.image_path is not None:
+                continue
+            visualization_method = layer.vis.lower()
+            if visualization_method not in VISUALIZATION_METHOD_NODES:
+                raise Exception("rvt.blend.create_execution_plan: Layer visualization method ({}) can't be computed,"
+                                " add its image or image_path!".format(layer.vis))
+            node, node_output_key = VISUALIZATION_METHOD_NODES[visualization_method]
+            execution_plan.setdefault(node, {})[visualization_method] = node_output_key
+    return execution_plan
+
+
+def compute_execution_plan(execution_plan, dem_arr, dem_resolution, default=None, no_data=None):
+    """
+    Computes each node of execution plan (create_execution_plan) once.
+
+    Parameters
+    ----------
+    execution_plan : dict
+        Execution plan from create_execution_plan.
+    dem_arr : numpy.ndarray
+        Input digital elevation model as 2D numpy array.
+    dem_resolution : float
+        DEM pixel size.
+    default : rvt.default.DefaultValues
+        Default values for visualization functions.
+    no_data : int or float
+        Value that represents no_data, all pixels with this value are changed to np.nan .
+
+    Returns
+    -------
+    visualizations : dict
+        Dictionary {visualization_method: visualization array} (render_all_images parameter visualizations).
+    """
+    if default is None:
+        default = rvt.default.DefaultValues()
+    visualizations = {}
+    for node, node_outputs in execution_plan.items():
+        if node == "slope":
+            node_out = default.get_slope(dem_arr=dem_arr, resolution_x=dem_resolution, resolution_y=dem_resolution,
+                                         no_data=no_data)
+        elif node == "hillshade":
+            node_out = default.get_hillshade(dem_arr=dem_arr, resolution_x=dem_resolution,
+                                             resolution_y=dem_resolution, no_data=no_data)
+        elif node == "shadow":
+            node_out = default.get_shadow(dem_arr=dem_arr, resolution=dem_resolution, no_data=no_data)
+        elif node == "multi_hillshade":
+            # RGB bands are hillshades from azimuths 315, 22.5 and 90
+            node_out = rvt.vis.hillshade_batch(dem=dem_arr, resolution_x=dem_resolution,
+                                               resolution_y=dem_resolution, sun_azimuth=(315, 22.5, 90),
+                                               sun_elevation=default.mhs_sun_el, no_data=no_data)
+        elif node == "slrm":
+            node_out = default.get_slrm(dem_arr=dem_arr, no_data=no_data)
+        elif node == "horizon_search":  # one horizon search for all sky-view factor family outputs
+            node_output_keys = set(node_outputs.values())
+            node_out = default.get_sky_view_factor(dem_arr=dem_arr, resolution=dem_resolution,
+                                                   compute_svf="svf" in node_output_keys,
+                                                   compute_asvf="asvf" in node_output_keys,
+                                                   compute_opns="opns" in node_output_keys,
+                                                   compute_neg_opns="neg_opns" in node_output_keys,
+                                                   no_data=no_data)
+        elif node == "sky_illumination":
+            node_out = default.get_sky_illumination(dem_arr=dem_arr, resolution=dem_resolution, no_data=no_data)
+        elif node == "local_dominance":
+            node_out = default.get_local_dominance(dem_arr=dem_arr, no_data=no_data)
+        elif node == "msrm":
+            node_out = default.get_msrm(dem_arr=dem_arr, resolution=dem_resolution, no_data=no_data)
+        elif node == "mstp":
+            node_out = default.get_mstp(dem_arr=dem_arr, no_data=no_data)
+        else:
+            raise Exception("rvt.blend.compute_execution_plan: Unknown execution plan node ({})!".format(node))
+        for visualization_method, node_output_key in node_outputs.items():
+            if node_output_key is None:
+                visualizations[visualization_method] = node_out
+            else:
+                visualizations[visualization_method] = node_out[node_output_key]
+    return visualizations
+
+
 class BlenderCombinations:
     """
     Class for storing combinations.
@@ -861,6 +940,23 @@ class BlenderCombinations:
             names_list.append(combination.name)
         return names_list
 
+    def render_all_combinations(self, dem_arr, dem_resolution, default=None, no_data=None):
+        """Renders all combinations from the same DEM (in memory) and returns list of blended images. Visualizations
+        which are used in more combinations (or layers) are computed only once (see create_execution_plan)."""
+        visualizations = compute_execution_plan(
+            execution_plan=create_execution_plan(combinations=self.combinations),
+            dem_arr=dem_arr,
+            dem_resolution=dem_resolution,
+            default=default,
+            no_data=no_data
+        )
+        rendered_images = []
+        for combination in self.combinations:
+            combination.add_dem_arr(dem_arr=dem_arr, dem_resolution=dem_resolution)
+            rendered_images.append(combination.render_all_images(default=default, save_visualizations=False,
+                                                                 no_data=no_data, visualizations=visualizations))
+        return rendered_images
+
 
 class TerrainSettings:
     """Terrain settings for GUI."""
@@ -1287,13 +1383,10 @@ def color_relief_image_map(dem, resolution, default: rvt.default.DefaultValues =
     if no_data is not None:
         dem[dem == no_data] = np.nan
 
-    opns_pos_arr = default.get_sky_view_factor(dem_arr=dem, resolution=resolution,
-                                               compute_svf=False, compute_asvf=False, compute_opns=True,
-                                               no_data=None)["opns"]
-    opns_neg_arr = default.get_sky_view_factor(dem_arr=-1 * dem, resolution=resolution,
-                                               compute_svf=False, compute_asvf=False, compute_opns=True,
-                                               no_data=None)["opns"]
-    opns_pos_neg_arr = opns_pos_arr - opns_neg_arr
+    dict_opns = default.get_sky_view_factor(dem_arr=dem, resolution=resolution,
+                                            compute_svf=False, compute_asvf=False, compute_opns=True,
+                                            compute_neg_opns=True, no_data=None)
+    opns_pos_neg_arr = dict_opns["opns"] - dict_opns["neg_opns"]
 
     slope_arr = rvt.vis.slope_aspect(
         dem=dem,
@@ -26,6 +26,11 @@ import numpy as np
 from matplotlib.cm import get_cmap
 from matplotlib.colors import LinearSegmentedColormap
 
+import rvt.engine
+
+# number of rows colormap is applied to at once (matplotlib computes RGBA in float64)
+COLOR_RAMP_CHUNK_ROWS = 512
+
 
 def gray_scale_to_color_ramp(gray_scale, colormap, min_colormap_cut=None, max_colormap_cut=None, alpha=False,
                              output_8bit=True):
@@ -54,6 +59,7 @@ def gray_scale_to_color_ramp(gray_scale, colormap, min_colormap_cut=None, max_co
     -------
     rgba_out : np.array (3D: red 0-255, green 0-255, blue 0-255)
             If alpha False: np.array (4D: red 0-255, green 0-255, blue 0-255, alpha 0-255)
+            If output_8bit is False values are 0-1 of rvt.engine.get_float_dtype().
     """
     cm = get_cmap(colormap)
 
@@ -71,13 +77,16 @@ def gray_scale_to_color_ramp(gray_scale, colormap, min_colormap_cut=None, max_co
                             " max_colormap_cut!")
         cm = truncate_colormap(cmap=cm, minval=min_colormap_cut, maxval=max_colormap_cut)
 
-    # Compute normalized RGBA
-    rgba_mtpl_out = cm(gray_scale)
+    # Compute RGBA (row chunks, to limit float64 RGBA matplotlib computes), if output_8bit 0-1 scale is changed to
+    # 0-255 and type to uint8 by matplotlib (bytes=True)
+    rgba_mtpl_out = np.empty(gray_scale.shape + (4,), dtype=np.uint8 if output_8bit else rvt.engine.get_float_dtype())
+    for i_row in range(0, gray_scale.shape[0], COLOR_RAMP_CHUNK_ROWS):
+        rows = slice(i_row, i_row + COLOR_RAMP_CHUNK_ROWS)
+        rgba_mtpl_out[rows] = cm(gray_scale[rows], bytes=output_8bit)
 
     if output_8bit:
         nan_mask = np.isnan(gray_scale)
         rgba_mtpl_out[nan_mask] = 0  # Change nan to 0
-        rgba_mtpl_out = np.uint8(rgba_mtpl_out * 255)  # 0-1 scale to 0-255 and change type to uint8
 
     # Move array axes to correct positions, i.e. (x, y, bands) to (bands, x, y)
     rgba_out = rgba_mtpl_out.transpose(2, 0, 1)
@@ -97,15 +106,19 @@ def truncate_colormap(cmap, minval=0.0, maxval=1.0, n=100):
 
 
 def normalize_lin(image, minimum, maximum):
-    # linear cut off
-    image[image > maximum] = maximum
-    image[image < minimum] = minimum
+    # python floats don't change (upcast) image dtype
+    minimum = float(minimum)
+    maximum = float(maximum)
+
+    # linear cut off (to new array, input image can be shared by layers and must not change)
+    image = np.clip(image, minimum, maximum)
 
     # stretch to 0.0 - 1.0 interval
-    image = (image - minimum) / (maximum - minimum)
+    image -= minimum
+    image /= maximum - minimum
     image[image > 1] = 1
     image[image < 0] = 0
-    return np.float32(image)
+    return image.astype(rvt.engine.get_float_dtype(), copy=False)
 
 
 def lin_cutoff_calc_from_perc(image, minimum, maximum):
@@ -163,7 +176,7 @@ def lum(img):
         r = img[0]
         g = img[1]
         b = img[2]
-        lum_img = np.float32((0.3 * r) + (0.59 * g) + (0.11 * b))
+        lum_img = ((0.3 * r) + (0.59 * g) + (0.11 * b)).astype(rvt.engine.get_float_dtype(), copy=False)
     else:
         lum_img = img
 
@@ -205,9 +218,10 @@ def channel_max(r: np.ndarray, g: np.ndarray, b: np.ndarray):
 def clip_color(c, min_c=None, max_c=None):
     lum_c = lum(c)
 
-    r = np.float32(c[0])
-    g = np.float32(c[1])
-    b = np.float32(c[2])
+    float_dtype = rvt.engine.get_float_dtype()
+    r = c[0].astype(float_dtype)
+    g = c[1].astype(float_dtype)
+    b = c[2].astype(float_dtype)
 
     if min_c is None and max_c is None:
         min_c = channel_min(r, g, b)
@@ -223,7 +237,7 @@ def clip_color(c, min_c=None, max_c=None):
     g = matrix_eq_max_gt_one(g, idx_max_c_gt_one, lum_c, max_c)
     b = matrix_eq_max_gt_one(b, idx_max_c_gt_one, lum_c, max_c)
 
-    c_out = np.zeros(c.shape)
+    c_out = np.zeros(c.shape, dtype=float_dtype)
     c_out[0, :, :] = r
     c_out[1, :, :] = g
     c_out[2, :, :] = b
@@ -275,7 +289,7 @@ def blend_luminosity(active, background, min_c=None, max_c=None):
     g = background[1] + luminosity
     b = background[2] + luminosity
 
-    c = np.zeros(background.shape)
+    c = np.zeros(background.shape, dtype=rvt.engine.get_float_dtype())
     c[0, :, :] = r
     c[1, :, :] = g
     c[2, :, :] = b
@@ -301,15 +315,15 @@ def blend_multi_dim_images(blend_mode, active, background):
     b_rgb = len(background.shape) == 3  # bool, is background rgb
     blended_image = None
     if a_rgb and b_rgb:
-        blended_image = np.zeros(background.shape)
+        blended_image = np.zeros(background.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             blended_image[i, :, :] = equation_blend(blend_mode, active[i, :, :], background[i, :, :])
     if a_rgb and not b_rgb:
-        blended_image = np.zeros(active.shape)
+        blended_image = np.zeros(active.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             blended_image[i, :, :] = equation_blend(blend_mode, active[i, :, :], background)
     if not a_rgb and b_rgb:
-        blended_image = np.zeros(background.shape)
+        blended_image = np.zeros(background.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             blended_image[i, :, :] = equation_blend(blend_mode, active, background[i, :, :])
     if not a_rgb and not b_rgb:
@@ -343,17 +357,17 @@ def render_images(active, background, opacity):
     # Apply opacity
     if a_rgb and b_rgb:
         # Both images 3 bands
-        render_image = np.zeros(background.shape)
+        render_image = np.zeros(background.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             render_image[i, :, :] = apply_opacity(active[i, :, :], background[i, :, :], opacity)
     elif a_rgb and not b_rgb:
         # Active image 3 bands
-        render_image = np.zeros(active.shape)
+        render_image = np.zeros(active.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             render_image[i, :, :] = apply_opacity(active[i, :, :], background, opacity)
     elif not a_rgb and b_rgb:
         # Background image 3 bands
-        render_image = np.zeros(background.shape)
+        render_image = np.zeros(background.shape, dtype=rvt.engine.get_float_dtype())
         for i in range(3):
             render_image[i, :, :] = apply_opacity(active, background[i, :, :], opacity)
     else:
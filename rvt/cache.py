@@ -0,0 +1,209 @@
+"""
+Relief Visualization Toolbox – Visualization Cache
+
+Contains persistent (on disk) cache of computed visualizations. Cached visualizations are addressed by content of the
+DEM, visualization and its parameters (and library version and source code), so changing any parameter, DEM or code
+never reuses stale results, and results can be reused between output directories and runs.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import rvt.engine
+
+try:
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        RVT_VERSION = version("rvt_py")
+    except PackageNotFoundError:
+        RVT_VERSION = "unknown"
+except ImportError:
+    RVT_VERSION = "unknown"
+
+# change when format of cached files changes
+CACHE_FORMAT_VERSION = 1
+# when cache exceeds max_nbytes, least recently used visualizations are removed until it is smaller than this fraction
+# of max_nbytes (cache directory is not scanned again for each stored visualization)
+_EVICT_FRACTION = 0.9
+# hash of rvt source code (see get_source_hash)
+_source_hash = None
+# key of array when cached visualization is array (not dictionary of arrays)
+_ARRAY_KEY = "array"
+
+
+class VisualizationCache:
+    """
+    Persistent cache of computed visualizations on local disk with size limit (least recently used are removed).
+
+    Each cached visualization is a directory (named by key) of .npy files, one for each array (visualization can be
+    array or dictionary of arrays). Keys are hashes of DEM content (values, shape, data type), resolution, no_data,
+    visualization name, all its parameters, float data type (rvt.engine.get_float_dtype()), library version and hash
+    of its source code (get_source_hash), so changed code (e.g. source checkout) doesn't reuse stale visualizations.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory where visualizations are stored.
+    max_nbytes : int
+        Maximal size of cache in bytes, least recently used visualizations are removed when it is exceeded. If None
+        size is not limited.
+    """
+
+    def __init__(self, cache_dir=None, max_nbytes=5 * 1024 ** 3):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".rvt_cache")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_nbytes = max_nbytes
+        self._nbytes = None  # running size of cache in bytes, None until cache directory is scanned
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, dem, visualization, parameters=None):
+        """
+        Returns key (hex string) of visualization of dem with parameters (dict of JSON serializable values, tuples and
+        numpy scalars are allowed).
+        """
+        dem = np.ascontiguousarray(dem)
+        key_hash = hashlib.blake2b(digest_size=20)
+        key_hash.update(json.dumps({
+            "format": CACHE_FORMAT_VERSION,
+            "rvt_version": RVT_VERSION,
+            "rvt_source": get_source_hash(),
+            "float_dtype": rvt.engine.get_float_dtype().name,
+            "visualization": str(visualization),
+            "parameters": {} if parameters is None else parameters,
+            "dem_shape": dem.shape,
+            "dem_dtype": dem.dtype.str
+        }, sort_keys=True, default=_json_default).encode("utf-8"))
+        key_hash.update(memoryview(dem).cast("B"))
+        return key_hash.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """Returns cached visualization (array or dictionary of arrays) of key or None if it is not cached."""
+        entry_path = self._entry_path(key)
+        try:
+            file_names = sorted(os.listdir(entry_path))
+            visualization = {os.path.splitext(file_name)[0]: np.load(os.path.join(entry_path, file_name))
+                             for file_name in file_names if file_name.endswith(".npy")}
+            os.utime(entry_path)  # last use, for LRU removal
+        except (OSError, ValueError):  # not cached or removed (by other process) while reading
+            return None
+        if not visualization:
+            return None
+        if list(visualization) == [_ARRAY_KEY]:
+            return visualization[_ARRAY_KEY]
+        return visualization
+
+    def put(self, key, visualization):
+        """Stores visualization (array or dictionary of arrays) under key and removes least recently used
+        visualizations if cache is larger than max_nbytes. Size of cache is kept as running total (updated from cache
+        directory when it is scanned), so directory is scanned only when cache is full."""
+        if not isinstance(visualization, dict):
+            visualization = {_ARRAY_KEY: visualization}
+        entry_path = self._entry_path(key)
+        # write into temporary directory and rename it, so other processes never read partial entry
+        tmp_entry_path = "{}.tmp{}".format(entry_path, os.getpid())
+        os.makedirs(tmp_entry_path, exist_ok=True)
+        entry_nbytes = 0
+        for array_name, array in visualization.items():
+            if array is None:
+                continue
+            array_path = os.path.join(tmp_entry_path, "{}.npy".format(array_name))
+            np.save(array_path, np.asarray(array))
+            entry_nbytes += os.path.getsize(array_path)
+        try:
+            os.replace(tmp_entry_path, entry_path)
+        except OSError:  # already stored (by other process)
+            shutil.rmtree(tmp_entry_path, ignore_errors=True)
+            entry_nbytes = 0
+        if self._nbytes is None:
+            self._nbytes = self.nbytes()
+        else:
+            self._nbytes += entry_nbytes
+        if self.max_nbytes is not None and self._nbytes > self.max_nbytes:
+            self.evict()
+
+    def nbytes(self):
+        """Size of cached visualizations in bytes (scans cache directory)."""
+        self._nbytes = sum(entry_nbytes for _, _, entry_nbytes in self._entries())
+        return self._nbytes
+
+    def _entries(self):
+        """List of (last use time, entry path, entry size in bytes) of cached visualizations."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or ".tmp" in entry.name:
+                continue
+            try:
+                entry_nbytes = sum(array_file.stat().st_size for array_file in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, entry.path, entry_nbytes))
+            except OSError:  # removed by other process
+                continue
+        return entries
+
+    def evict(self):
+        """If cache size is larger than max_nbytes, removes least recently used visualizations until cache size is at
+        most _EVICT_FRACTION of max_nbytes."""
+        if self.max_nbytes is None:
+            return
+        entries = sorted(self._entries())
+        cache_nbytes = sum(entry_nbytes for _, _, entry_nbytes in entries)
+        if cache_nbytes > self.max_nbytes:
+            for _, entry_path, entry_nbytes in entries:
+                if cache_nbytes <= _EVICT_FRACTION * self.max_nbytes:
+                    break
+                shutil.rmtree(entry_path, ignore_errors=True)
+                cache_nbytes -= entry_nbytes
+        self._nbytes = cache_nbytes
+
+    def clear(self):
+        """Removes all cached visualizations."""
+        for _, entry_path, _ in self._entries():
+            shutil.rmtree(entry_path, ignore_errors=True)
+        self._nbytes = 0
+
+
+def get_source_hash():
+    """Returns hash (hex string) of rvt source code (.py files of rvt package), computed once. It is part of cache
+    keys, because library version doesn't change with code when rvt is run from source checkout."""
+    global _source_hash
+    if _source_hash is None:
+        source_hash = hashlib.blake2b(digest_size=20)
+        rvt_dir = os.path.dirname(os.path.abspath(__file__))
+        for file_name in sorted(os.listdir(rvt_dir)):
+            if not file_name.endswith(".py"):
+                continue
+            source_hash.update(file_name.encode("utf-8"))
+            with open(os.path.join(rvt_dir, file_name), "rb") as source_file:
+                source_hash.update(source_file.read())
+        _source_hash = source_hash.hexdigest()
+    return _source_hash
+
+
+def _json_default(value):
+    """Converts numpy scalars, arrays and other values to JSON serializable values (for cache key)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,286 @@
+"""
+Relief Visualization Toolbox – Cost Model
+
+Contains cost model of visualizations: estimated peak memory (bytes) and relative compute (work) of computing
+visualization on DEM (tile) of given shape with given parameters, and automatic choice of tile size and number of
+parallel jobs (row bands of tile) from available memory and CPUs.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+import rvt.default
+import rvt.engine
+import rvt.tile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# tile sizes of automatic tiling are multiples of TILE_SIZE_STEP (except tiles covering the whole DEM)
+TILE_SIZE_STEP = 512
+# part of available memory used by automatic tiling if memory budget is not given
+MEMORY_FRACTION = 0.8
+
+
+def get_available_memory() -> Optional[int]:
+    """Returns memory (in bytes) available for new processes (without swapping) or None if it can't be determined."""
+    if psutil is not None:
+        return int(psutil.virtual_memory().available)
+    try:
+        with open("/proc/meminfo") as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024  # kB
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _nr_arrays(rvt_visualization: "rvt.default.RVTVisualization", rvt_default: "rvt.default.DefaultValues") -> int:
+    """Approximate number of float (DEM sized) arrays allocated at peak of visualization (input DEM and output not
+    included)."""
+    if rvt_visualization == rvt.default.RVTVisualization.SLOPE:
+        return 6
+    elif rvt_visualization in (rvt.default.RVTVisualization.HILLSHADE, rvt.default.RVTVisualization.SHADOW):
+        return 7
+    elif rvt_visualization in (rvt.default.RVTVisualization.MULTI_HILLSHADE,
+                               rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL,
+                               rvt.default.RVTVisualization.LOCAL_DOMINANCE):
+        return 6
+    elif rvt_visualization in (rvt.default.RVTVisualization.SKY_VIEW_FACTOR,
+                               rvt.default.RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR,
+                               rvt.default.RVTVisualization.POSITIVE_OPENNESS,
+                               rvt.default.RVTVisualization.NEGATIVE_OPENNESS,
+                               rvt.default.RVTVisualization.MULTI_SCALE_RELIEF_MODEL):
+        return 8
+    elif rvt_visualization == rvt.default.RVTVisualization.SKY_ILLUMINATION:
+        return 10
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
+        return 12  # float64 summed-area tables (and of squares) on padded DEM
+
+
+def _nr_out_bands(rvt_visualization: "rvt.default.RVTVisualization", rvt_default: "rvt.default.DefaultValues") -> int:
+    if rvt_visualization == rvt.default.RVTVisualization.MULTI_HILLSHADE:
+        return int(rvt_default.mhs_nr_dir)
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
+        return 3
+    return 1
+
+
+def _nr_scale_radii(scale: Tuple[int, int, int]) -> int:
+    """Number of radii of MSTP scale (minimum_radius, maximum_radius, step)."""
+    return len(range(int(scale[0]), int(scale[1]) + 1, int(scale[2])))
+
+
+def _work_per_pixel(rvt_visualization: "rvt.default.RVTVisualization",
+                    rvt_default: "rvt.default.DefaultValues") -> float:
+    """Relative compute per (padded) pixel, slope is 1."""
+    if rvt_visualization == rvt.default.RVTVisualization.SLOPE:
+        return 1.
+    elif rvt_visualization in (rvt.default.RVTVisualization.HILLSHADE, rvt.default.RVTVisualization.SHADOW):
+        return 1.5
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_HILLSHADE:
+        return 1. + 0.5 * int(rvt_default.mhs_nr_dir)
+    elif rvt_visualization == rvt.default.RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL:
+        return 2.
+    elif rvt_visualization in (rvt.default.RVTVisualization.SKY_VIEW_FACTOR,
+                               rvt.default.RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR,
+                               rvt.default.RVTVisualization.POSITIVE_OPENNESS,
+                               rvt.default.RVTVisualization.NEGATIVE_OPENNESS):
+        # horizon search, shifts (radial steps) in each direction
+        return 0.1 * int(rvt_default.svf_n_dir) * int(rvt_default.svf_r_max)
+    elif rvt_visualization == rvt.default.RVTVisualization.SKY_ILLUMINATION:
+        return 0.1 * int(rvt_default.sim_nr_dir) * int(rvt_default.sim_shadow_dist)
+    elif rvt_visualization == rvt.default.RVTVisualization.LOCAL_DOMINANCE:
+        nr_directions = 360 // max(int(rvt_default.ld_anglr_res), 1)
+        nr_radii = len(range(int(rvt_default.ld_min_rad), int(rvt_default.ld_max_rad) + 1,
+                             max(int(rvt_default.ld_rad_inc), 1)))
+        return 0.1 * nr_directions * nr_radii
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_RELIEF_MODEL:
+        # mean filters with summed-area tables
+        nr_scales = int(np.ceil(max(float(rvt_default.msrm_feature_max), 1.) **
+                                (1 / max(int(rvt_default.msrm_scaling_factor), 1)))) + 1
+        return 2. + 1. * nr_scales
+    elif rvt_visualization == rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION:
+        # deviation from mean elevation with shared summed-area tables
+        nr_radii = sum(_nr_scale_radii(scale) for scale in (rvt_default.mstp_local_scale,
+                                                             rvt_default.mstp_meso_scale,
+                                                             rvt_default.mstp_broad_scale))
+        return 4. + 1.5 * nr_radii
+
+
+def estimate_visualization_nbytes(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        shape: Tuple[int, int]
+) -> int:
+    """Returns estimated peak memory (in bytes) of computing and saving (float and 8bit) rvt_visualization of DEM
+    with shape (rows, columns), input DEM included. Visualizations which pad DEM (by their overlap) are estimated on
+    padded DEM."""
+    rows, cols = shape
+    overlap = rvt.tile._get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    padded_nr_pixels = (rows + 2 * overlap) * (cols + 2 * overlap)
+    nr_out_bands = _nr_out_bands(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    float_itemsize = rvt.engine.get_float_dtype().itemsize
+    nbytes = (_nr_arrays(rvt_visualization=rvt_visualization, rvt_default=rvt_default) * padded_nr_pixels +
+              (1 + nr_out_bands) * rows * cols) * float_itemsize  # scratch, dem, out
+    nbytes += nr_out_bands * rows * cols  # 8bit
+    if rvt_default.cog:
+        nbytes += nr_out_bands * rows * cols * float_itemsize  # in-memory copy before COG is written
+    return int(nbytes)
+
+
+def estimate_visualization_compute(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        shape: Tuple[int, int]
+) -> float:
+    """Returns relative compute (work) of rvt_visualization of DEM with shape (rows, columns), unit is slope of one
+    pixel. Only ratios of estimates (between visualizations, parameters and tile shapes) are meaningful."""
+    rows, cols = shape
+    overlap = rvt.tile._get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    return _work_per_pixel(rvt_visualization=rvt_visualization, rvt_default=rvt_default) * \
+        (rows + 2 * overlap) * (cols + 2 * overlap)
+
+
+def estimate_tile_cost(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        tile_shape: Tuple[int, int],
+        n_jobs: int = 1,
+        whole_dem: bool = False
+) -> Tuple[int, float]:
+    """
+    Estimates cost of computing rvt_visualization on tile in tile by tile processing, tile is read with overlap (halo)
+    and computed in n_jobs parallel row bands (rvt.vis.compute_in_row_bands).
+
+    Parameters
+    ----------
+    rvt_visualization : RVTVisualization
+        RVT visualization.
+    rvt_default : DefaultValues
+        Parameters of visualization.
+    tile_shape : tuple(rows, columns)
+        Shape of tile (without overlap).
+    n_jobs : int
+        Number of parallel jobs (row bands).
+    whole_dem : bool
+        If tile is the whole DEM (it is not read with overlap).
+
+    Returns
+    -------
+    nbytes : int
+        Estimated peak memory in bytes.
+    compute_time : float
+        Estimated relative compute time (compute of one row band, bands are computed in parallel).
+    """
+    rows, cols = tile_shape
+    overlap = rvt.tile._get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    if not whole_dem:
+        rows += 2 * overlap
+        cols += 2 * overlap
+    n_jobs = max(min(int(n_jobs), rows), 1)
+    if n_jobs == 1:
+        return (estimate_visualization_nbytes(rvt_visualization, rvt_default, (rows, cols)),
+                estimate_visualization_compute(rvt_visualization, rvt_default, (rows, cols)))
+    band_shape = (-(-rows // n_jobs) + 2 * min(overlap, rows), cols)
+    float_itemsize = rvt.engine.get_float_dtype().itemsize
+    nr_out_bands = _nr_out_bands(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
+    # tile, joined output and bands (each computed as DEM)
+    nbytes = (1 + nr_out_bands) * rows * cols * float_itemsize + \
+        n_jobs * estimate_visualization_nbytes(rvt_visualization, rvt_default, band_shape)
+    return int(nbytes), estimate_visualization_compute(rvt_visualization, rvt_default, band_shape)
+
+
+def auto_tile_size(
+        rvt_visualization: "rvt.default.RVTVisualization",
+        rvt_default: "rvt.default.DefaultValues",
+        x_size: int,
+        y_size: int,
+        memory_budget: Optional[int] = None,
+        max_jobs: Optional[int] = None
+) -> Tuple[int, int, int]:
+    """
+    Chooses tile size and number of parallel jobs (row bands of tile) for rvt_visualization of DEM with x_size columns
+    and y_size rows, so that estimated peak memory fits into memory_budget and estimated compute time per output pixel
+    (including overlap of tiles and row bands) is minimal. Among (almost) equally fast choices larger tiles are
+    preferred. If nothing fits, tile size with the smallest estimated memory and one job is returned. Visualizations
+    which depend on the whole DEM (shadow, sky illumination) are not split into row bands (one job).
+
+    Parameters
+    ----------
+    rvt_visualization : RVTVisualization
+        RVT visualization.
+    rvt_default : DefaultValues
+        Parameters of visualization.
+    x_size : int
+        Number of DEM columns.
+    y_size : int
+        Number of DEM rows.
+    memory_budget : int
+        Memory in bytes, if None MEMORY_FRACTION of available memory (not limited if it can't be determined).
+    max_jobs : int
+        Maximal number of parallel jobs, if None number of CPUs.
+
+    Returns
+    -------
+    tile_size_x : int
+        Number of tile columns (x_size if tile covers DEM in x direction).
+    tile_size_y : int
+        Number of tile rows (y_size if tile covers DEM in y direction).
+    n_jobs : int
+        Number of parallel jobs (row bands).
+    """
+    if memory_budget is None:
+        available_memory = get_available_memory()
+        memory_budget = np.inf if available_memory is None else MEMORY_FRACTION * available_memory
+    if max_jobs is None:
+        max_jobs = os.cpu_count() or 1
+    max_jobs = max(int(max_jobs), 1)
+    if rvt_visualization in rvt.default._WHOLE_DEM_VISUALIZATIONS:
+        max_jobs = 1
+
+    tile_sizes = list(range(TILE_SIZE_STEP, max(x_size, y_size), TILE_SIZE_STEP)) + [max(x_size, y_size)]
+    choices = []  # (compute time per pixel, tile_size_x, tile_size_y, n_jobs)
+    min_nbytes_choice = None  # (nbytes, tile_size_x, tile_size_y), if nothing fits into memory_budget
+    for tile_size in tile_sizes:
+        tile_size_x = min(tile_size, x_size)
+        tile_size_y = min(tile_size, y_size)
+        whole_dem = tile_size_x == x_size and tile_size_y == y_size
+        for n_jobs in range(1, max_jobs + 1):
+            nbytes, compute_time = estimate_tile_cost(rvt_visualization, rvt_default, (tile_size_y, tile_size_x),
+                                                      n_jobs=n_jobs, whole_dem=whole_dem)
+            if n_jobs == 1 and (min_nbytes_choice is None or nbytes < min_nbytes_choice[0]):
+                min_nbytes_choice = (nbytes, tile_size_x, tile_size_y)
+            if nbytes > memory_budget:
+                break  # more jobs need more memory
+            # tiles are computed one after another, row bands of tile in parallel
+            choices.append((compute_time / (tile_size_x * tile_size_y), tile_size_x, tile_size_y, n_jobs))
+    if not choices:
+        return min_nbytes_choice[1], min_nbytes_choice[2], 1
+    # largest tile (fewest jobs) among choices within 2 % of the fastest
+    min_time = min(choice[0] for choice in choices)
+    _, tile_size_x, tile_size_y, n_jobs = max((choice for choice in choices if choice[0] <= 1.02 * min_time),
+                                              key=lambda choice: (choice[1] * choice[2], -choice[3]))
+    return tile_size_x, tile_size_y, n_jobs
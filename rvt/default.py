@@ -20,16 +20,24 @@ Copyright:
     2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
 """
 
+import contextlib
+import functools
+import inspect
 import warnings
+from collections import OrderedDict
 from enum import Enum
 from pathlib import Path
 from typing import Optional, Tuple
 
 import rvt.vis
 import rvt.blend_func
+import rvt.cache
+import rvt.cost
+import rvt.engine
+import rvt.profiling
 import rvt.tile
 import os
-from osgeo import gdal
+from osgeo import gdal, gdal_array
 import numpy as np
 import json
 import datetime
@@ -52,6 +60,98 @@ class RVTVisualization(Enum):
     MULTI_SCALE_TOPOGRAPHIC_POSITION = "mstp"
 
 
+# visualizations which depend on the whole DEM, they can't be computed in parallel row bands
+# (rvt.vis.compute_in_row_bands): sky illumination is normalized by its maximum, horizon of sky illumination and
+# shadow is searched in DEM pyramid (aligned to DEM edges, search distance is not limited)
+_WHOLE_DEM_VISUALIZATIONS = (RVTVisualization.SHADOW, RVTVisualization.SKY_ILLUMINATION)
+
+# prefixes of DefaultValues attributes (parameters) visualization depends on
+_VISUALIZATION_PARAMETER_PREFIXES = {
+    RVTVisualization.SLOPE: ("slp_",),
+    RVTVisualization.HILLSHADE: ("hs_",),
+    RVTVisualization.SHADOW: ("hs_",),
+    RVTVisualization.MULTI_HILLSHADE: ("mhs_",),
+    RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL: ("slrm_",),
+    RVTVisualization.SKY_VIEW_FACTOR: ("svf_", "asvf_"),
+    RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR: ("svf_", "asvf_"),
+    RVTVisualization.POSITIVE_OPENNESS: ("svf_",),
+    RVTVisualization.NEGATIVE_OPENNESS: ("svf_",),
+    RVTVisualization.SKY_ILLUMINATION: ("sim_",),
+    RVTVisualization.LOCAL_DOMINANCE: ("ld_",),
+    RVTVisualization.MULTI_SCALE_RELIEF_MODEL: ("msrm_",),
+    RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION: ("mstp_",),
+}
+
+
+def _cached_visualization(visualization):
+    """Decorator of DefaultValues.get_* methods, if DefaultValues.cache is set, result is taken from cache (or
+    computed and stored in it). Key is DEM content, visualization, its parameters and method arguments. If profiling
+    is enabled (rvt.profiling) it is recorded as compute stage."""
+    def decorator(get_method):
+        method_signature = inspect.signature(get_method)
+
+        def get_cached(self, *args, **kwargs):
+            if self.cache is None:
+                return get_method(self, *args, **kwargs)
+            arguments = method_signature.bind(self, *args, **kwargs)
+            arguments.apply_defaults()
+            parameters = {name: value for name, value in arguments.arguments.items()
+                          if name not in ("self", "dem_arr", "buffer_pool")}
+            parameters.update(self.get_visualization_parameters(visualization))
+            key = self.cache.key(dem=arguments.arguments["dem_arr"], visualization=visualization.value,
+                                 parameters=parameters)
+            visualization_out = self.cache.get(key)
+            if visualization_out is None:
+                visualization_out = get_method(self, *args, **kwargs)
+                self.cache.put(key, visualization_out)
+            return visualization_out
+
+        @functools.wraps(get_method)
+        def wrapper(self, *args, **kwargs):
+            if rvt.profiling.get_profiler() is None:
+                return get_cached(self, *args, **kwargs)
+            dem_arr = kwargs["dem_arr"] if "dem_arr" in kwargs else args[0]
+            with rvt.profiling.stage("compute", nbytes=dem_arr.nbytes, npixels=dem_arr.size,
+                                     visualization=visualization.value):
+                return get_cached(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _profiled_save(visualization):
+    """Decorator of DefaultValues.save_* methods, if profiling is enabled (rvt.profiling) method is recorded as save
+    stage and stages inside it (read, compute, write, ...) are labeled with visualization. Cached raster data sets are
+    closed at the end (see _raster_cache_run)."""
+    def decorator(save_method):
+        @functools.wraps(save_method)
+        def wrapper(self, *args, **kwargs):
+            with _raster_cache_run():
+                if rvt.profiling.get_profiler() is None:
+                    return save_method(self, *args, **kwargs)
+                with rvt.profiling.labels(visualization=visualization.value, tile=None), rvt.profiling.stage("save"):
+                    return save_method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# number of running saving runs (see _raster_cache_run)
+_raster_cache_runs = 0
+
+
+@contextlib.contextmanager
+def _raster_cache_run():
+    """Context manager (or decorator) of saving run (DefaultValues.save_*, rvt.tile). At the end of the outermost run
+    cached data sets are closed (clear_raster_cache), nested runs (e.g. save_* in save_visualizations) share them."""
+    global _raster_cache_runs
+    _raster_cache_runs += 1
+    try:
+        yield
+    finally:
+        _raster_cache_runs -= 1
+        if _raster_cache_runs == 0:
+            clear_raster_cache()
+
+
 class DefaultValues:
     """
     Class which define layer for blending. BlenderLayer is basic element in BlenderCombination.layers list.
@@ -224,8 +324,28 @@ class DefaultValues:
         (cut-off units). Values min and max define stretch borders (in mode units).
     tile_size_limit : int
         If array size bigger than tile_size_limit it uses saving tile by tile (rvt.tile module).
-    tile_size : tuple(x_size, y_size)
-        Size of single tile when saving tile by tile.
+    tile_size : tuple(x_size, y_size) or str
+        Size of single tile when saving tile by tile. If "auto", tile size, number of parallel jobs (row bands of tile)
+        and whether DEM is saved tile by tile (tile_size_limit is ignored) are chosen for each visualization with cost
+        model (rvt.cost.auto_tile_size) from tile_memory_limit and CPUs.
+    tile_memory_limit : int
+        Memory in bytes for automatic tile size (tile_size="auto"), if None 80 % of available memory.
+    tile_max_jobs : int
+        Maximal number of parallel jobs for automatic tile size (tile_size="auto"), if None number of CPUs.
+    tile_streaming : bool
+        If True, tile by tile processing keeps DEM rows of current row of tiles (with overlap) in memory and reads only
+        new rows for next row of tiles, each DEM pixel is read once (see rvt.tile.save_visualization_tile_by_tile).
+    tile_progress_callback : Callable
+        If not None, tile by tile processing calls it after each tile with progress info (dict with tile index, window,
+        elapsed time, tiles per second, bytes read and written and ETA, see rvt.progress.Progress.tile_done).
+    engine : str
+        Engine of computation kernels (sky-view factor family, local dominance, DEM pyramid of sky illumination):
+        "numpy", "numba" or "auto" (see rvt.engine).
+    cog : bool
+        If True, visualizations are saved as Cloud Optimized GeoTIFF (COG) with internal overviews.
+    cache : rvt.cache.VisualizationCache
+        Persistent cache of computed visualizations (get_* methods, tile by tile processing and blending use it), if
+        None visualizations are always computed.
     """
 
     def __init__(self):
@@ -322,7 +442,45 @@ class DefaultValues:
         self.mstp_bytscl = ("value", 0.00, 1.00)
         # tile
         self.tile_size_limit = 10000 * 10000  # if arr size > tile_size limit, it uses tile module
-        self.tile_size = (4000, 4000)  # size of single tile when using tile module (x_size, y_size)
+        self.tile_size = (4000, 4000)  # size of single tile when using tile module (x_size, y_size) or "auto"
+        self.tile_memory_limit = None  # memory (bytes) of automatic tile size, None is 80 % of available memory
+        self.tile_max_jobs = None  # maximal number of parallel jobs of automatic tile size, None is number of CPUs
+        self.tile_streaming = False  # keep overlap rows in memory between rows of tiles, each DEM pixel read once
+        self.tile_progress_callback = None  # called with progress info after each tile, see rvt.progress
+        # engine
+        self.engine = "numpy"  # engine of computation kernels ("numpy", "numba", "auto"), see rvt.engine
+        # output
+        self.cog = False  # save visualizations as Cloud Optimized GeoTIFF with overviews
+        # cache
+        self.cache = None  # rvt.cache.VisualizationCache, reuse computed visualizations
+
+    def get_visualization_parameters(self, visualization: RVTVisualization):
+        """Returns dictionary of attributes (parameters) visualization depends on (without compute, save and bytscl
+        attributes, which don't change float result)."""
+        prefixes = _VISUALIZATION_PARAMETER_PREFIXES[visualization]
+        parameters = {"ve_factor": self.ve_factor}
+        for name, value in vars(self).items():
+            if name.startswith(prefixes) and not name.endswith(("_compute", "_save_float", "_save_8bit", "_bytscl")):
+                parameters[name] = value
+        return parameters
+
+    def get_tile_size(self, rvt_visualization: RVTVisualization, x_size: int, y_size: int) -> Tuple[int, int, int]:
+        """Returns tile size (tile_size_x, tile_size_y) and number of parallel jobs (row bands of tile) of saving
+        rvt_visualization of DEM (x_size columns, y_size rows) tile by tile. If self.tile_size is "auto" they are
+        chosen with cost model (rvt.cost.auto_tile_size)."""
+        if self.tile_size == "auto":
+            return rvt.cost.auto_tile_size(rvt_visualization=rvt_visualization, rvt_default=self, x_size=x_size,
+                                           y_size=y_size, memory_budget=self.tile_memory_limit,
+                                           max_jobs=self.tile_max_jobs)
+        return self.tile_size[0], self.tile_size[1], 1
+
+    def use_tiles(self, rvt_visualization: RVTVisualization, x_size: int, y_size: int) -> bool:
+        """Returns True if rvt_visualization of DEM (x_size columns, y_size rows) is saved tile by tile (rvt.tile).
+        If self.tile_size is "auto", DEM is saved tile by tile if tile chosen by cost model is smaller than DEM."""
+        if self.tile_size == "auto":
+            tile_size_x, tile_size_y, _ = self.get_tile_size(rvt_visualization, x_size, y_size)
+            return tile_size_x < x_size or tile_size_y < y_size
+        return x_size * y_size > self.tile_size_limit
 
     def save_default_to_file(self, file_path=None):
         """Saves default attributes into .json file."""
@@ -923,6 +1081,23 @@ class DefaultValues:
         dem_path) and adds dem directory (dem_path) to it. If bit8 it returns 8bit file path."""
         return os.path.normpath(os.path.join(os.path.dirname(dem_path), self.get_opns_file_name(dem_path, bit8)))
 
+    def get_horizon_angles_file_name(self, dem_path):
+        """Returns Horizon angles name, dem name (from dem_path) with added svf parameters."""
+        dem_name = os.path.basename(dem_path).split(".")[0]  # base name without extension
+        out_name = "{}_HORIZON_R{}_D{}".format(dem_name, self.svf_r_max, self.svf_n_dir)
+        if self.svf_noise == 1:
+            out_name += "_NRlow"
+        elif self.svf_noise == 2:
+            out_name += "_NRmedium"
+        elif self.svf_noise == 3:
+            out_name += "_NRhigh"
+        return out_name + "_8bit.tif"
+
+    def get_horizon_angles_path(self, dem_path):
+        """Returns path to Horizon angles. Generates horizon angles name (uses default attributes and dem name from
+        dem_path) and adds dem directory (dem_path) to it."""
+        return os.path.normpath(os.path.join(os.path.dirname(dem_path), self.get_horizon_angles_file_name(dem_path)))
+
     def get_neg_opns_file_name(self, dem_path, bit8=False):
         """Returns Negative Openness name, dem name (from dem_path) with added neg opns parameters.
         If bit8 it returns 8bit file name."""
@@ -1093,6 +1268,19 @@ class DefaultValues:
     ):
         """Converts (byte scale) float visualization to 8bit. Resolution (x_res, y_res) and no_data needed only for
          multiple directions hillshade! Method first normalize then byte scale (0-255)."""
+        with rvt.profiling.stage("8bit", nbytes=float_arr.nbytes, npixels=float_arr.size,
+                                 visualization=visualization.value):
+            return self._float_to_8bit(float_arr=float_arr, visualization=visualization, x_res=x_res, y_res=y_res,
+                                       no_data=no_data)
+
+    def _float_to_8bit(
+            self,
+            float_arr: np.array,
+            visualization: RVTVisualization,
+            x_res: float = None,
+            y_res: float = None,
+            no_data: Optional[float] = None
+    ):
         if visualization == RVTVisualization.HILLSHADE:
             norm_arr = rvt.blend_func.normalize_image(visualization="hs", image=float_arr,
                                                       min_norm=self.hs_bytscl[1], max_norm=self.hs_bytscl[2],
@@ -1107,45 +1295,22 @@ class DefaultValues:
             return float_arr
         elif visualization == RVTVisualization.MULTI_HILLSHADE:
             # Be careful when multihillshade we input dem, because we have to calculate hillshade in 3 directions
-            red_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                             sun_elevation=self.mhs_sun_el, sun_azimuth=315, no_data=no_data)
-            green_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                               sun_elevation=self.mhs_sun_el, sun_azimuth=22.5, no_data=no_data)
-            blue_band_arr = rvt.vis.hillshade(dem=float_arr, resolution_x=x_res, resolution_y=y_res,
-                                              sun_elevation=self.mhs_sun_el, sun_azimuth=90, no_data=no_data)
-            if self.mhs_bytscl[0].lower() == "percent" or self.slp_bytscl[0].lower() == "perc":
-                red_band_arr = rvt.blend_func.normalize_perc(
-                    image=red_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                red_band_arr = rvt.vis.byte_scale(data=red_band_arr, no_data=np.nan, c_min=0, c_max=1)
-                green_band_arr = rvt.blend_func.normalize_perc(
-                    image=green_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                green_band_arr = rvt.vis.byte_scale(data=green_band_arr, no_data=np.nan, c_min=0, c_max=1)
-                blue_band_arr = rvt.blend_func.normalize_perc(
-                    image=blue_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                blue_band_arr = rvt.vis.byte_scale(data=blue_band_arr, no_data=np.nan, c_min=0, c_max=1)
-            else:  # self.mhs_bytscl[0] == "value"
-                red_band_arr = rvt.blend_func.normalize_lin(
-                    image=red_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                red_band_arr = rvt.vis.byte_scale(
-                    data=red_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-                green_band_arr = rvt.blend_func.normalize_lin(
-                    image=green_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                green_band_arr = rvt.vis.byte_scale(
-                    data=green_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-                blue_band_arr = rvt.blend_func.normalize_lin(
-                    image=blue_band_arr, minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
-                )
-                blue_band_arr = rvt.vis.byte_scale(
-                    data=blue_band_arr, no_data=np.nan, c_min=0, c_max=1
-                )
-            multi_hillshade_8bit_arr = np.array([red_band_arr, green_band_arr, blue_band_arr])
+            rgb_hillshade_arr = rvt.vis.hillshade_batch(
+                dem=float_arr, resolution_x=x_res, resolution_y=y_res, sun_azimuth=(315, 22.5, 90),
+                sun_elevation=self.mhs_sun_el, no_data=no_data
+            )
+            multi_hillshade_8bit_arr = np.empty(rgb_hillshade_arr.shape, dtype=np.uint8)
+            for i_band in range(rgb_hillshade_arr.shape[0]):
+                if self.mhs_bytscl[0].lower() == "percent" or self.slp_bytscl[0].lower() == "perc":
+                    band_arr = rvt.blend_func.normalize_perc(
+                        image=rgb_hillshade_arr[i_band], minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
+                    )
+                else:  # self.mhs_bytscl[0] == "value"
+                    band_arr = rvt.blend_func.normalize_lin(
+                        image=rgb_hillshade_arr[i_band], minimum=self.mhs_bytscl[1], maximum=self.mhs_bytscl[2]
+                    )
+                rvt.vis.byte_scale(data=band_arr, no_data=np.nan, c_min=0, c_max=1,
+                                   out=multi_hillshade_8bit_arr[i_band])
             return multi_hillshade_8bit_arr
         elif visualization == RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL:
             norm_arr = rvt.blend_func.normalize_image(visualization="slrm", image=float_arr,
@@ -1203,12 +1368,14 @@ class DefaultValues:
         else:
             raise Exception("rvt.default.DefaultValues.float_to_8bit: Wrong visualization (visualization) parameter!")
 
+    @_cached_visualization(RVTVisualization.SLOPE)
     def get_slope(self, dem_arr, resolution_x, resolution_y, no_data=None):
         slope_arr = rvt.vis.slope_aspect(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
                                          ve_factor=self.ve_factor, output_units=self.slp_output_units,
                                          no_data=no_data)["slope"]
         return slope_arr
 
+    @_profiled_save(RVTVisualization.SLOPE)
     def save_slope(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Slope from dem (dem_path) with default parameters. If custom_dir is None it saves
         in dem directory else in custom_dir. If path to file already exists we can overwrite file (overwrite=0) or
@@ -1247,7 +1414,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile calculation
+        if self.use_tiles(RVTVisualization.SLOPE, *dem_size):  # tile by tile calculation
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1271,28 +1438,31 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=slope_path, out_raster_arr=slope_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(slope_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
                 else:
                     slope_8bit_arr = self.float_to_8bit(float_arr=slope_arr, visualization=RVTVisualization.SLOPE)
                     save_raster(src_raster_path=dem_path, out_raster_path=slope_8bit_path,
-                                out_raster_arr=slope_8bit_arr, e_type=1)
+                                out_raster_arr=slope_8bit_arr, e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.SHADOW)
     def get_shadow(self, dem_arr, resolution, no_data=None):
         shadow_arr = rvt.vis.shadow_horizon(dem=dem_arr, resolution=resolution, shadow_az=self.hs_sun_azi,
                                             shadow_el=self.hs_sun_el, ve_factor=self.ve_factor,
-                                            no_data=no_data)["shadow"]
+                                            no_data=no_data, engine=self.engine)["shadow"]
         return shadow_arr
 
+    @_cached_visualization(RVTVisualization.HILLSHADE)
     def get_hillshade(self, dem_arr, resolution_x, resolution_y, no_data=None):
         hillshade_arr = rvt.vis.hillshade(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
                                           sun_azimuth=self.hs_sun_azi, sun_elevation=self.hs_sun_el,
                                           ve_factor=self.ve_factor, no_data=no_data)
         return hillshade_arr
 
+    @_profiled_save(RVTVisualization.HILLSHADE)
     def save_hillshade(self, dem_path, custom_dir=None, save_float=None, save_8bit=None, save_shadow=None):
         """Calculates and saves Hillshade from dem (dem_path) with default parameters. If custom_dir is None it saves
         in dem directory else in custom_dir. If path to file already exists we can overwrite file (overwrite=1)
@@ -1343,7 +1513,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.HILLSHADE, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1377,7 +1547,7 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=hillshade_path, out_raster_arr=hillshade_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(hillshade_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1386,22 +1556,24 @@ class DefaultValues:
                         float_arr=hillshade_arr, visualization=RVTVisualization.HILLSHADE
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=hillshade_8bit_path,
-                                out_raster_arr=hillshade_8_bit_arr, e_type=1)
+                                out_raster_arr=hillshade_8_bit_arr, e_type=1, cog=self.cog)
             if save_shadow:
                 shadow_arr = self.get_shadow(dem_arr=dem_arr, resolution=x_res)
                 if os.path.isfile(shadow_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=shadow_path, out_raster_arr=shadow_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.MULTI_HILLSHADE)
     def get_multi_hillshade(self, dem_arr, resolution_x, resolution_y, no_data=None):
         multi_hillshade_arr = rvt.vis.multi_hillshade(dem=dem_arr, resolution_x=resolution_x, resolution_y=resolution_y,
                                                       nr_directions=self.mhs_nr_dir, sun_elevation=self.mhs_sun_el,
                                                       ve_factor=self.ve_factor, no_data=no_data)
         return multi_hillshade_arr
 
+    @_profiled_save(RVTVisualization.MULTI_HILLSHADE)
     def save_multi_hillshade(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Multidirectional hillshade from dem (dem_path) with default parameters.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -1442,7 +1614,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.MULTI_HILLSHADE, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1468,7 +1640,7 @@ class DefaultValues:
                                                                    resolution_y=y_res,
                                                                    no_data=no_data).astype('float32')
                     save_raster(src_raster_path=dem_path, out_raster_path=multi_hillshade_path,
-                                out_raster_arr=multi_hillshade_arr, no_data=np.nan)
+                                out_raster_arr=multi_hillshade_arr, no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(multi_hillshade_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1481,13 +1653,15 @@ class DefaultValues:
                         no_data=no_data
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=multi_hillshade_8bit_path,
-                                out_raster_arr=multi_hillshade_8bit_arr, e_type=1)
+                                out_raster_arr=multi_hillshade_8bit_arr, e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL)
     def get_slrm(self, dem_arr, no_data=None):
         slrm_arr = rvt.vis.slrm(dem=dem_arr, radius_cell=self.slrm_rad_cell, ve_factor=self.ve_factor, no_data=no_data)
         return slrm_arr
 
+    @_profiled_save(RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL)
     def save_slrm(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Simple local relief model from dem (dem_path) with default parameters.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -1526,7 +1700,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1548,7 +1722,7 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=slrm_path, out_raster_arr=slrm_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(slrm_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1557,26 +1731,31 @@ class DefaultValues:
                         float_arr=slrm_arr, visualization=RVTVisualization.SIMPLE_LOCAL_RELIEF_MODEL
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=slrm_8bit_path, out_raster_arr=slrm_8bit_arr,
-                                e_type=1)
+                                e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.SKY_VIEW_FACTOR)
     def get_sky_view_factor(self, dem_arr, resolution, compute_svf=True, compute_asvf=False, compute_opns=False,
-                            no_data=None):
+                            no_data=None, compute_neg_opns=False, buffer_pool=None):
         dict_svf_asvf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution, compute_svf=compute_svf,
                                                      compute_opns=compute_opns, compute_asvf=compute_asvf,
+                                                     compute_neg_opns=compute_neg_opns,
                                                      svf_n_dir=self.svf_n_dir, svf_r_max=self.svf_r_max,
                                                      svf_noise=self.svf_noise, asvf_dir=self.asvf_dir,
                                                      asvf_level=self.asvf_level, ve_factor=self.ve_factor,
-                                                     no_data=no_data)
+                                                     no_data=no_data, engine=self.engine, buffer_pool=buffer_pool)
         return dict_svf_asvf_opns
 
+    @_profiled_save(RVTVisualization.SKY_VIEW_FACTOR)
     def save_sky_view_factor(self, dem_path, save_svf=True, save_asvf=False, save_opns=False, custom_dir=None,
-                             save_float=None, save_8bit=None):
+                             save_float=None, save_8bit=None, save_neg_opns=False):
         """Calculates and saves Sky-view factor(save_svf=True), Anisotropic Sky-view factor(save_asvf=True) and
         Positive Openness(save_opns=True) from dem (dem_path) with default parameters.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
         overwrite file (overwrite=1) or not (overwrite=0). If save_float is True method creates Gtiff with real values,
-        if save_8bit is True method creates GTiff with bytescaled values (0-255)."""
+        if save_8bit is True method creates GTiff with bytescaled values (0-255).
+        If save_neg_opns is True it also saves Negative Openness (with neg_opns save settings), computed in the same
+        horizon search as the other outputs."""
 
         # if save_float is None it takes boolean from default (self)
         if save_float is None:
@@ -1619,22 +1798,27 @@ class DefaultValues:
                 opns_8bit_path = os.path.join(custom_dir, self.get_opns_file_name(dem_path, bit8=True))
 
         # if file already exists and overwrite=0
+        files_exist = False
         if save_float and save_8bit:
             if os.path.isfile(svf_path) and os.path.isfile(asvf_path) and os.path.isfile(opns_path) and \
                     os.path.isfile(svf_8bit_path) and os.path.isfile(asvf_8bit_path) and \
                     os.path.isfile(opns_8bit_path) and not self.overwrite:
-                return 0
+                files_exist = True
         elif save_float and not save_8bit:
             if os.path.isfile(svf_path) and os.path.isfile(asvf_path) and os.path.isfile(opns_path) \
                     and not self.overwrite:
-                return 0
+                files_exist = True
         elif not save_float and save_8bit:
             if os.path.isfile(svf_8bit_path) and os.path.isfile(asvf_8bit_path) and os.path.isfile(opns_8bit_path) \
                     and not self.overwrite:
-                return 0
+                files_exist = True
+        if files_exist:
+            if save_neg_opns:
+                self.save_neg_opns(dem_path, custom_dir=custom_dir)
+            return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.SKY_VIEW_FACTOR, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             if save_svf:
@@ -1664,6 +1848,8 @@ class DefaultValues:
                     save_float=save_float,
                     save_8bit=save_8bit
                 )
+            if save_neg_opns:
+                self.save_neg_opns(dem_path, custom_dir=custom_dir)
             return 1
         else:
             dict_arr_res = get_raster_arr(raster_path=dem_path)
@@ -1673,26 +1859,29 @@ class DefaultValues:
             y_res = dict_arr_res["resolution"][1]
             dict_svf_asvf_opns = self.get_sky_view_factor(dem_arr=dem_arr, resolution=x_res, compute_svf=save_svf,
                                                           compute_asvf=save_asvf, compute_opns=save_opns,
-                                                          no_data=no_data)
+                                                          no_data=no_data, compute_neg_opns=save_neg_opns)
             if save_float:
                 if save_svf:
                     if os.path.isfile(svf_path) and not self.overwrite:  # file exists and overwrite=0
                         pass
                     else:  # svf_path, file doesn't exists or exists and overwrite=1
                         save_raster(src_raster_path=dem_path, out_raster_path=svf_path,
-                                    out_raster_arr=dict_svf_asvf_opns["svf"].astype('float32'), no_data=np.nan)
+                                    out_raster_arr=dict_svf_asvf_opns["svf"].astype('float32'), no_data=np.nan,
+                                    cog=self.cog)
                 if save_asvf:
                     if os.path.isfile(asvf_path) and not self.overwrite:  # file exists and overwrite=0
                         pass
                     else:  # asvf_path, file doesn't exists or exists and overwrite=1
                         save_raster(src_raster_path=dem_path, out_raster_path=asvf_path,
-                                    out_raster_arr=dict_svf_asvf_opns["asvf"].astype('float32'), no_data=np.nan)
+                                    out_raster_arr=dict_svf_asvf_opns["asvf"].astype('float32'), no_data=np.nan,
+                                    cog=self.cog)
                 if save_opns:
                     if os.path.isfile(opns_path) and not self.overwrite:  # file exists and overwrite=0
                         pass
                     else:  # opns_path, file doesn't exists or exists and overwrite=1
                         save_raster(src_raster_path=dem_path, out_raster_path=opns_path,
-                                    out_raster_arr=dict_svf_asvf_opns["opns"].astype('float32'), no_data=np.nan)
+                                    out_raster_arr=dict_svf_asvf_opns["opns"].astype('float32'), no_data=np.nan,
+                                    cog=self.cog)
             if save_8bit:
                 if save_svf:
                     if os.path.isfile(svf_8bit_path) and not self.overwrite:  # file exists and overwrite=0
@@ -1702,7 +1891,7 @@ class DefaultValues:
                             float_arr=dict_svf_asvf_opns["svf"], visualization=RVTVisualization.SKY_VIEW_FACTOR
                         )
                         save_raster(src_raster_path=dem_path, out_raster_path=svf_8bit_path,
-                                    out_raster_arr=svf_8bit_arr, e_type=1)
+                                    out_raster_arr=svf_8bit_arr, e_type=1, cog=self.cog)
                 if save_asvf:
                     if os.path.isfile(asvf_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                         pass
@@ -1712,7 +1901,7 @@ class DefaultValues:
                             visualization=RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR
                         )
                         save_raster(src_raster_path=dem_path, out_raster_path=asvf_8bit_path,
-                                    out_raster_arr=asvf_8bit_arr, e_type=1)
+                                    out_raster_arr=asvf_8bit_arr, e_type=1, cog=self.cog)
                 if save_opns:
                     if os.path.isfile(opns_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                         pass
@@ -1721,23 +1910,63 @@ class DefaultValues:
                             float_arr=dict_svf_asvf_opns["opns"], visualization=RVTVisualization.POSITIVE_OPENNESS
                         )
                         save_raster(src_raster_path=dem_path, out_raster_path=opns_8bit_path,
-                                    out_raster_arr=opns_8bit_arr, e_type=1)
+                                    out_raster_arr=opns_8bit_arr, e_type=1, cog=self.cog)
+            if save_neg_opns:
+                self.save_neg_opns(dem_path, custom_dir=custom_dir, neg_opns_arr=dict_svf_asvf_opns["neg_opns"])
             return 1
 
-    def get_neg_opns(self, dem_arr, resolution, no_data=None):
-        dem_arr = -1 * dem_arr
+    def get_horizon_angles(self, dem_arr, resolution, no_data=None, data_type=np.float16):
+        horizon_arr = rvt.vis.horizon_angles(dem=dem_arr, resolution=resolution, svf_n_dir=self.svf_n_dir,
+                                             svf_r_max=self.svf_r_max, svf_noise=self.svf_noise,
+                                             ve_factor=self.ve_factor, no_data=no_data, data_type=data_type,
+                                             engine=self.engine)
+        return horizon_arr
+
+    def save_horizon_angles(self, dem_path, custom_dir=None):
+        """Calculates and saves Horizon angles (band for each svf direction, quantized to 8bit, 255 is no data) from
+        dem (dem_path) with default parameters. Saved horizon angles (read with get_raster_arr) can be used in
+        rvt.vis.svf_from_horizon, rvt.vis.asvf_from_horizon, rvt.vis.opns_from_horizon and
+        rvt.vis.shadow_from_horizon. If custom_dir is None it saves in dem directory else in custom_dir.
+        If path to file already exists we can overwrite file (overwrite=1) or not (overwrite=0)."""
+        if not os.path.isfile(dem_path):
+            raise Exception("rvt.default.DefaultValues.save_horizon_angles: dem_path doesn't exist!")
+
+        if custom_dir is None:
+            horizon_path = self.get_horizon_angles_path(dem_path)
+        else:
+            horizon_path = os.path.join(custom_dir, self.get_horizon_angles_file_name(dem_path))
+
+        # if file already exists and overwrite=0
+        if os.path.isfile(horizon_path) and not self.overwrite:
+            return 0
+
+        dict_arr_res = get_raster_arr(raster_path=dem_path)
+        dem_arr = dict_arr_res["array"]
+        no_data = dict_arr_res["no_data"]
+        x_res = dict_arr_res["resolution"][0]
+        horizon_arr = self.get_horizon_angles(dem_arr=dem_arr, resolution=x_res, no_data=no_data,
+                                              data_type=np.uint8)
+        save_raster(src_raster_path=dem_path, out_raster_path=horizon_path, out_raster_arr=horizon_arr, no_data=255,
+                    e_type=1, cog=self.cog)
+        return 1
+
+    @_cached_visualization(RVTVisualization.NEGATIVE_OPENNESS)
+    def get_neg_opns(self, dem_arr, resolution, no_data=None, buffer_pool=None):
         dict_neg_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=resolution, svf_n_dir=self.svf_n_dir,
                                                 svf_r_max=self.svf_r_max, svf_noise=self.svf_noise,
-                                                compute_svf=False, compute_asvf=False, compute_opns=True,
-                                                ve_factor=self.ve_factor, no_data=no_data)
-        neg_opns_arr = dict_neg_opns["opns"]
+                                                compute_svf=False, compute_asvf=False, compute_opns=False,
+                                                compute_neg_opns=True, ve_factor=self.ve_factor, no_data=no_data,
+                                                engine=self.engine, buffer_pool=buffer_pool)
+        neg_opns_arr = dict_neg_opns["neg_opns"]
         return neg_opns_arr
 
-    def save_neg_opns(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
+    @_profiled_save(RVTVisualization.NEGATIVE_OPENNESS)
+    def save_neg_opns(self, dem_path, custom_dir=None, save_float=None, save_8bit=None, neg_opns_arr=None):
         """Calculates and saves Negative Openness from dem (dem_path) with default parameters. If custom_dir is None
         it saves in dem directory else in custom_dir. If path to file already exists we can
         overwrite file (overwrite=1) or not (overwrite=0). If save_float is True method creates Gtiff with real values,
-        if save_8bit is True method creates GTiff with bytescaled values (0-255)."""
+        if save_8bit is True method creates GTiff with bytescaled values (0-255). If neg_opns_arr is given (already
+        computed, e.g. by save_sky_view_factor) it is saved instead of computing it again."""
 
         # if save_float is None it takes boolean from default (self)
         if save_float is None:
@@ -1771,7 +2000,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if neg_opns_arr is None and self.use_tiles(RVTVisualization.NEGATIVE_OPENNESS, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1784,19 +2013,20 @@ class DefaultValues:
             )
             return 1
         else:  # singleprocess
-            dict_arr_res = get_raster_arr(raster_path=dem_path)
-            dem_arr = dict_arr_res["array"]
-            no_data = dict_arr_res["no_data"]
-            x_res = dict_arr_res["resolution"][0]
-            y_res = dict_arr_res["resolution"][1]
-
-            neg_opns_arr = self.get_neg_opns(dem_arr=dem_arr, resolution=x_res, no_data=no_data).astype('float32')
+            if neg_opns_arr is None:
+                dict_arr_res = get_raster_arr(raster_path=dem_path)
+                dem_arr = dict_arr_res["array"]
+                no_data = dict_arr_res["no_data"]
+                x_res = dict_arr_res["resolution"][0]
+                y_res = dict_arr_res["resolution"][1]
+                neg_opns_arr = self.get_neg_opns(dem_arr=dem_arr, resolution=x_res, no_data=no_data)
+            neg_opns_arr = neg_opns_arr.astype('float32')
             if save_float:
                 if os.path.isfile(neg_opns_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=neg_opns_path, out_raster_arr=neg_opns_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(neg_opns_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1805,18 +2035,20 @@ class DefaultValues:
                         float_arr=neg_opns_arr, visualization=RVTVisualization.NEGATIVE_OPENNESS
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=neg_opns_8bit_path,
-                                out_raster_arr=neg_opns_8bit_arr, e_type=1)
+                                out_raster_arr=neg_opns_8bit_arr, e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.SKY_ILLUMINATION)
     def get_sky_illumination(self, dem_arr, resolution, no_data=None):
         sky_illumination_arr = rvt.vis.sky_illumination(dem=dem_arr, resolution=resolution, sky_model=self.sim_sky_mod,
                                                         compute_shadow=bool(self.sim_compute_shadow),
                                                         max_fine_radius=self.sim_shadow_dist,
                                                         num_directions=self.sim_nr_dir, shadow_az=self.sim_shadow_az,
                                                         shadow_el=self.sim_shadow_el, ve_factor=self.ve_factor,
-                                                        no_data=no_data)
+                                                        no_data=no_data, engine=self.engine)
         return sky_illumination_arr
 
+    @_profiled_save(RVTVisualization.SKY_ILLUMINATION)
     def save_sky_illumination(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Sky illumination from dem (dem_path) with default parameters. If custom_dir is None
         it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -1857,7 +2089,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.SKY_ILLUMINATION, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1883,7 +2115,7 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=sky_illumination_path,
-                                out_raster_arr=sky_illumination_arr, no_data=np.nan)
+                                out_raster_arr=sky_illumination_arr, no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(sky_illumination_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1892,16 +2124,18 @@ class DefaultValues:
                         float_arr=sky_illumination_arr, visualization=RVTVisualization.SKY_ILLUMINATION
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=sky_illumination_8bit_path,
-                                out_raster_arr=sky_illumination_8bit_arr, e_type=1)
+                                out_raster_arr=sky_illumination_8bit_arr, e_type=1, cog=self.cog)
             return 1
 
-    def get_local_dominance(self, dem_arr, no_data=None):
+    @_cached_visualization(RVTVisualization.LOCAL_DOMINANCE)
+    def get_local_dominance(self, dem_arr, no_data=None, buffer_pool=None):
         local_dominance_arr = rvt.vis.local_dominance(dem=dem_arr, min_rad=self.ld_min_rad, max_rad=self.ld_max_rad,
                                                       rad_inc=self.ld_rad_inc, angular_res=self.ld_anglr_res,
                                                       observer_height=self.ld_observer_h, ve_factor=self.ve_factor,
-                                                      no_data=no_data)
+                                                      no_data=no_data, engine=self.engine, buffer_pool=buffer_pool)
         return local_dominance_arr
 
+    @_profiled_save(RVTVisualization.LOCAL_DOMINANCE)
     def save_local_dominance(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Local dominance from dem (dem_path) with default parameters. If custom_dir is None
         it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -1942,7 +2176,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.LOCAL_DOMINANCE, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -1964,7 +2198,7 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=local_dominance_path,
-                                out_raster_arr=local_dominance_arr, no_data=np.nan)
+                                out_raster_arr=local_dominance_arr, no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(local_dominance_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -1973,15 +2207,17 @@ class DefaultValues:
                         float_arr=local_dominance_arr, visualization=RVTVisualization.LOCAL_DOMINANCE
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=local_dominance_8bit_path,
-                                out_raster_arr=local_dominance_8bit_arr, e_type=1)
+                                out_raster_arr=local_dominance_8bit_arr, e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.MULTI_SCALE_RELIEF_MODEL)
     def get_msrm(self, dem_arr, resolution, no_data=None):
         msrm_arr = rvt.vis.msrm(dem=dem_arr, resolution=resolution, feature_min=self.msrm_feature_min,
                                 feature_max=self.msrm_feature_max, scaling_factor=self.msrm_scaling_factor,
                                 ve_factor=self.ve_factor, no_data=no_data)
         return msrm_arr
 
+    @_profiled_save(RVTVisualization.MULTI_SCALE_RELIEF_MODEL)
     def save_msrm(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Multi-scale relief model from dem (dem_path) with default parameters.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -2020,7 +2256,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile
+        if self.use_tiles(RVTVisualization.MULTI_SCALE_RELIEF_MODEL, *dem_size):  # tile by tile
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -2045,7 +2281,7 @@ class DefaultValues:
                     pass
                 else:
                     save_raster(src_raster_path=dem_path, out_raster_path=msrm_path, out_raster_arr=msrm_arr,
-                                no_data=np.nan)
+                                no_data=np.nan, cog=self.cog)
             if save_8bit:
                 if os.path.isfile(msrm_8bit_path) and not self.overwrite:  # file exists and overwrite=0
                     pass
@@ -2054,14 +2290,16 @@ class DefaultValues:
                         float_arr=msrm_arr, visualization=RVTVisualization.MULTI_SCALE_RELIEF_MODEL
                     )
                     save_raster(src_raster_path=dem_path, out_raster_path=msrm_8bit_path, out_raster_arr=msrm_8bit_arr,
-                                e_type=1)
+                                e_type=1, cog=self.cog)
             return 1
 
+    @_cached_visualization(RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION)
     def get_mstp(self, dem_arr, no_data=None):
         mstp_arr = rvt.vis.mstp(dem=dem_arr, local_scale=self.mstp_local_scale, meso_scale=self.mstp_meso_scale,
                                 broad_scale=self.mstp_broad_scale, lightness=self.mstp_lightness, no_data=no_data)
         return mstp_arr
 
+    @_profiled_save(RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION)
     def save_mstp(self, dem_path, custom_dir=None, save_float=None, save_8bit=None):
         """Calculates and saves Multi-scale topographic position from dem (dem_path) with default parameters.
         If custom_dir is None it saves in dem directory else in custom_dir. If path to file already exists we can
@@ -2100,7 +2338,7 @@ class DefaultValues:
                 return 0
 
         dem_size = get_raster_size(raster_path=dem_path)
-        if dem_size[0] * dem_size[1] > self.tile_size_limit:  # tile by tile calculation
+        if self.use_tiles(RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION, *dem_size):  # tile by tile calculation
             if custom_dir is None:
                 custom_dir = Path(dem_path).parent
             rvt.tile.save_rvt_visualization_tile_by_tile(
@@ -2128,7 +2366,8 @@ class DefaultValues:
                         out_raster_path=mstp_path,
                         out_raster_arr=mstp_arr,
                         no_data=np.nan,
-                        e_type=6
+                        e_type=6,
+                        cog=self.cog
                     )
             if save_8bit:
                 if os.path.isfile(mstp_8bit_path) and not self.overwrite:  # file exists and overwrite=0
@@ -2143,11 +2382,13 @@ class DefaultValues:
                         out_raster_path=mstp_8bit_path,
                         out_raster_arr=mstp_8bit_arr,
                         no_data=np.nan,
-                        e_type=1
+                        e_type=1,
+                        cog=self.cog
                     )
 
             return 1
 
+    @_raster_cache_run()
     def save_visualizations(self, dem_path, custom_dir=None):
         """Save all visualizations where self.'visualization'_compute = True also saves float where self.'visualization'
         _save_float = True and 8bit where self.'visualization'_save_8bit = True. In the end method creates log file."""
@@ -2161,9 +2402,11 @@ class DefaultValues:
         if self.slrm_compute:
             self.save_slrm(dem_path, custom_dir=custom_dir)
         if self.svf_compute or self.asvf_compute or self.pos_opns_compute:
+            # negative openness is computed in the same horizon search
             self.save_sky_view_factor(dem_path, save_svf=bool(self.svf_compute), save_asvf=bool(self.asvf_compute),
-                                      save_opns=bool(self.pos_opns_compute), custom_dir=custom_dir)
-        if self.neg_opns_compute:
+                                      save_opns=bool(self.pos_opns_compute), custom_dir=custom_dir,
+                                      save_neg_opns=bool(self.neg_opns_compute))
+        elif self.neg_opns_compute:
             self.save_neg_opns(dem_path, custom_dir=custom_dir)
         if self.sim_compute:
             self.save_sky_illumination(dem_path, custom_dir=custom_dir)
@@ -2185,12 +2428,30 @@ class DefaultValues:
             resolution_y: float,
             no_data: Optional[float] = None,
             save_float: bool = True,
-            save_8bit: bool = False
+            save_8bit: bool = False,
+            n_jobs: int = 1,
+            buffer_pool: Optional[rvt.engine.BufferPool] = None
     ) -> Optional[Tuple[np.array, np.array]]:  # tuple[vis_float_arr, vis_8bit_arr]
+        """Calculates visualization on dem. If n_jobs is not 1 visualization is calculated in parallel on row bands
+        of dem (with the same overlap as tile by tile processing), -1 uses all CPUs. Shadow and sky illumination
+        depend on the whole DEM and are always calculated on the whole dem (n_jobs is ignored). If buffer_pool is not None,
+        scratch arrays (and float output) of visualizations that support it are taken from it (tile loops)."""
         vis_arr = None
         vis_float_arr = None
         vis_8bit_arr = None
-        if visualization == RVTVisualization.SLOPE:
+        if visualization in _WHOLE_DEM_VISUALIZATIONS:
+            n_jobs = 1
+        if n_jobs != 1:
+            vis_arr = rvt.vis.compute_in_row_bands(
+                visualization_function=self.calculate_visualization,
+                dem=dem,
+                function_parameters={"visualization": visualization, "resolution_x": resolution_x,
+                                     "resolution_y": resolution_y, "no_data": no_data},
+                overlap=rvt.tile._get_rvt_visualization_overlap(rvt_visualization=visualization, rvt_default=self),
+                n_jobs=n_jobs,
+                out_visualization_dict_key=0  # float array
+            )
+        elif visualization == RVTVisualization.SLOPE:
             vis_arr = self.get_slope(
                 dem_arr=dem, resolution_x=resolution_x, resolution_y=resolution_y, no_data=no_data
             )
@@ -2217,7 +2478,8 @@ class DefaultValues:
                 compute_svf=True,
                 compute_asvf=False,
                 compute_opns=False,
-                no_data=no_data
+                no_data=no_data,
+                buffer_pool=buffer_pool
             )["svf"]
         elif visualization == RVTVisualization.ANISOTROPIC_SKY_VIEW_FACTOR:
             vis_arr = self.get_sky_view_factor(
@@ -2226,7 +2488,8 @@ class DefaultValues:
                 compute_svf=False,
                 compute_asvf=True,
                 compute_opns=False,
-                no_data=no_data
+                no_data=no_data,
+                buffer_pool=buffer_pool
             )["asvf"]
         elif visualization == RVTVisualization.POSITIVE_OPENNESS:
             vis_arr = self.get_sky_view_factor(
@@ -2235,11 +2498,12 @@ class DefaultValues:
                 compute_svf=False,
                 compute_asvf=False,
                 compute_opns=True,
-                no_data=no_data
+                no_data=no_data,
+                buffer_pool=buffer_pool
             )["opns"]
         elif visualization == RVTVisualization.NEGATIVE_OPENNESS:
             vis_arr = self.get_neg_opns(
-                dem_arr=dem, resolution=resolution_x, no_data=no_data
+                dem_arr=dem, resolution=resolution_x, no_data=no_data, buffer_pool=buffer_pool
             )
         elif visualization == RVTVisualization.SKY_ILLUMINATION:
             vis_arr = self.get_sky_illumination(
@@ -2247,7 +2511,7 @@ class DefaultValues:
             )
         elif visualization == RVTVisualization.LOCAL_DOMINANCE:
             vis_arr = self.get_local_dominance(
-                dem_arr=dem, no_data=no_data
+                dem_arr=dem, no_data=no_data, buffer_pool=buffer_pool
             )
         elif visualization == RVTVisualization.MULTI_SCALE_RELIEF_MODEL:
             vis_arr = self.get_msrm(
@@ -2278,21 +2542,11 @@ class DefaultValues:
     def create_log_file(self, dem_path, custom_dir=None, compute_time=None):
         """Creates log file in custom_dir, if custom_dir=None it creates it in dem directory (dem_path).
         Be aware, all default parameters have to be right! Parameter compute_time is in seconds."""
-        dict_arr_res = get_raster_arr(raster_path=dem_path)
-        resolution = dict_arr_res["resolution"]
-        arr_shape = np.array(dict_arr_res["array"]).shape
-        del dict_arr_res
-        nr_bands = 0
-        nr_cols = 0
-        nr_rows = 0
-        if len(arr_shape) == 3:
-            nr_bands = arr_shape[0]
-            nr_rows = arr_shape[1]
-            nr_cols = arr_shape[2]
-        elif len(arr_shape) == 2:
-            nr_bands = 1
-            nr_rows = arr_shape[0]
-            nr_cols = arr_shape[1]
+        dem_metadata = get_raster_metadata(raster_path=dem_path)  # raster values are not read
+        resolution = dem_metadata["resolution"]
+        nr_bands = dem_metadata["nr_bands"]
+        nr_rows = dem_metadata["y_size"]
+        nr_cols = dem_metadata["x_size"]
         dem_dir = os.path.dirname(dem_path)
         log_dir = dem_dir
         if custom_dir is not None:
@@ -2325,7 +2579,9 @@ class DefaultValues:
         dat.write("# Selected visualization parameters\n")
         dat.write("\tOverwrite: {}\n".format(self.overwrite))
         dat.write("\tVertical exaggeration factor: {}\n".format(self.ve_factor))
-        if nr_rows * nr_cols > self.tile_size_limit:
+        if self.tile_size == "auto":
+            dat.write("\tCalculating tile by tile: {}\n".format("AUTO"))
+        elif nr_rows * nr_cols > self.tile_size_limit:
             dat.write("\tCalculating tile by tile: {}\n".format("ON"))
             dat.write("\t\tTile block size: {}x{}\n".format(self.tile_size[0],
                                                             self.tile_size[1]))
@@ -2534,10 +2790,227 @@ class DefaultValues:
 
         if compute_time is not None:
             dat.write("# Computation time: {:.3f}s".format(compute_time))
+        profiler = rvt.profiling.get_profiler()
+        if profiler is not None:
+            dat.write("\n\n# Stages (rvt.profiling):\n")
+            dat.write(profiler.summary_table())
+            dat.write("\n")
         dat.close()
 
 
-def get_raster_arr(raster_path):
+# maximal number of raster data sets kept open by open_raster()
+RASTER_CACHE_SIZE = 16
+_raster_cache = OrderedDict()  # absolute path: (file modification time and size, gdal.Dataset, metadata dict)
+
+
+def _raster_cache_key(raster_path):
+    """Absolute path of raster and its modification time and size (cached data set is invalid if they change)."""
+    raster_path = str(raster_path)
+    if not os.path.isfile(raster_path):  # e.g. GDAL virtual file systems, not cached
+        return raster_path, None
+    raster_path = os.path.abspath(raster_path)
+    raster_stat = os.stat(raster_path)
+    return raster_path, (raster_stat.st_mtime_ns, raster_stat.st_size)
+
+
+def _get_raster_cache_entry(raster_path):
+    """Returns cached (file stamp, data set, metadata) of raster, opens it and adds it to cache if needed."""
+    raster_path, file_stamp = _raster_cache_key(raster_path)
+    cache_entry = _raster_cache.get(raster_path)
+    if cache_entry is not None and cache_entry[0] == file_stamp and file_stamp is not None:
+        _raster_cache.move_to_end(raster_path)
+        return cache_entry
+    _raster_cache.pop(raster_path, None)
+    data_set = gdal.Open(raster_path)
+    if data_set is None:
+        raise Exception("rvt.default.open_raster: Can't open raster ({})!".format(raster_path))
+    gt = data_set.GetGeoTransform()
+    band = data_set.GetRasterBand(1)
+    metadata = {
+        "x_size": data_set.RasterXSize,  # number of columns
+        "y_size": data_set.RasterYSize,  # number of rows
+        "nr_bands": data_set.RasterCount,
+        "resolution": (abs(gt[1]), abs(-gt[5])),
+        "no_data": band.GetNoDataValue(),  # we assume that all the bands have same no_data val
+        "data_type": band.DataType,  # GDALDataType of the first band
+        "projection": data_set.GetProjection(),
+        "geo_transform": gt
+    }
+    cache_entry = (file_stamp, data_set, metadata)
+    if file_stamp is not None and RASTER_CACHE_SIZE > 0:
+        _raster_cache[raster_path] = cache_entry
+        while len(_raster_cache) > RASTER_CACHE_SIZE:
+            _raster_cache.popitem(last=False)
+    return cache_entry
+
+
+def open_raster(raster_path):
+    """
+    Returns opened (read-only) GDAL data set of raster. Data sets are cached (up to RASTER_CACHE_SIZE least recently
+    used), so functions working on the same raster (get_raster_size, get_raster_arr, save_raster, tile by tile
+    processing) open it only once. Cached data set is reopened if raster file changes. Cached data sets are closed at
+    the end of saving (DefaultValues.save_*, rvt.tile), so files are not kept open (locked on Windows). GDAL data sets
+    are not thread safe, don't read the same data set from multiple threads.
+
+    Parameters
+    ----------
+    raster_path : str
+        Path to raster.
+
+    Returns
+    -------
+    data_set : gdal.Dataset
+        Opened raster data set, don't close it (it is closed when removed from cache).
+    """
+    return _get_raster_cache_entry(raster_path)[1]
+
+
+def get_raster_metadata(raster_path):
+    """
+    Returns raster metadata without reading its values. Metadata is cached together with data set (open_raster).
+
+    Parameters
+    ----------
+    raster_path : str
+        Path to raster.
+
+    Returns
+    -------
+    metadata : dict
+        Dictionary with keys: x_size (number of columns), y_size (number of rows), nr_bands, resolution (x_res, y_res),
+        no_data, data_type (GDALDataType of the first band), projection and geo_transform.
+    """
+    return dict(_get_raster_cache_entry(raster_path)[2])
+
+
+def get_valid_footprint(raster_path, max_size=1024):
+    """
+    Returns coarse mask of valid (not no_data) pixels of raster, without reading it in full resolution. Mask is read
+    from GDAL mask band (no_data, alpha or internal mask) averaged to at most max_size pixels in each direction, GDAL
+    uses raster overviews for it when raster has them. Coarse pixel is valid if any raster pixel in it is valid.
+
+    Parameters
+    ----------
+    raster_path : str
+        Path to raster.
+    max_size : int
+        Maximal number of columns and rows of footprint.
+
+    Returns
+    -------
+    footprint : dict
+        Dictionary with keys: array (2D bool numpy array, True where raster has valid pixels), factor_x and factor_y
+        (number of raster pixels in one footprint pixel in x and y direction, not integer if raster size is not
+        divisible by it) and geo_transform (of footprint).
+    """
+    data_set = open_raster(raster_path)
+    x_size = data_set.RasterXSize
+    y_size = data_set.RasterYSize
+    factor = max(1, int(np.ceil(max(x_size, y_size) / max_size)))
+    buf_x_size = int(np.ceil(x_size / factor))
+    buf_y_size = int(np.ceil(y_size / factor))
+    band = data_set.GetRasterBand(1)
+    if band.GetMaskFlags() & gdal.GMF_ALL_VALID:
+        footprint_arr = np.ones((buf_y_size, buf_x_size), dtype=bool)
+    else:
+        # average of mask (0 no_data, 255 valid) is larger than 0 if any pixel is valid, read as float (no rounding)
+        mask_arr = band.GetMaskBand().ReadAsArray(0, 0, x_size, y_size, buf_xsize=buf_x_size, buf_ysize=buf_y_size,
+                                                  buf_type=gdal.GDT_Float32, resample_alg=gdal.GRIORA_Average)
+        footprint_arr = mask_arr > 0
+    gt = data_set.GetGeoTransform()
+    # footprint pixels are x_size / buf_x_size (y_size / buf_y_size) raster pixels large, terms multiplied by column
+    # (gt[1], gt[4]) are scaled by x factor, terms multiplied by row (gt[2], gt[5]) by y factor
+    factor_x = x_size / buf_x_size
+    factor_y = y_size / buf_y_size
+    footprint_gt = (gt[0], gt[1] * factor_x, gt[2] * factor_y, gt[3], gt[4] * factor_x, gt[5] * factor_y)
+    return {"array": footprint_arr, "factor_x": factor_x, "factor_y": factor_y, "geo_transform": footprint_gt}
+
+
+def clear_raster_cache(raster_path=None):
+    """Closes cached data set of raster_path, or all cached data sets if raster_path is None."""
+    if raster_path is None:
+        _raster_cache.clear()
+    else:
+        _raster_cache.pop(_raster_cache_key(raster_path)[0], None)
+
+
+def read_data_set_arr(data_set, window=None, data_type=None, out=None):
+    """
+    Reads all bands (or window of them) of opened GDAL data set directly into numpy array, without intermediate
+    copies. GDAL converts values to the data type of output array.
+
+    Parameters
+    ----------
+    data_set : gdal.Dataset
+        Opened raster data set.
+    window : tuple(int, int, int, int)
+        Window to read (x_off, y_off, x_size, y_size) in pixels, if None the whole raster is read.
+    data_type : numpy.dtype
+        Data type of output array, if None data type of the first band. Ignored if out is given.
+    out : numpy.ndarray
+        Array to read into, 2D (rows, cols) for one band, 3D (bands, rows, cols) for multiple bands.
+
+    Returns
+    -------
+    array : numpy.ndarray
+        2D array for one band raster, 3D (bands, rows, cols) for multiple bands.
+    """
+    if window is None:
+        window = (0, 0, data_set.RasterXSize, data_set.RasterYSize)
+    x_off, y_off, x_size, y_size = window
+    if x_off < 0 or y_off < 0 or x_off + x_size > data_set.RasterXSize or y_off + y_size > data_set.RasterYSize:
+        raise Exception("rvt.default.read_data_set_arr: window is outside of raster!")
+    if data_set.RasterCount == 1:
+        out_shape = (y_size, x_size)
+    else:
+        out_shape = (data_set.RasterCount, y_size, x_size)
+    if out is None:
+        if data_type is None:
+            data_type = gdal_array.GDALTypeCodeToNumericTypeCode(data_set.GetRasterBand(1).DataType)
+        out = np.empty(out_shape, dtype=data_type)
+    elif out.shape != out_shape:
+        raise Exception("rvt.default.read_data_set_arr: out has to be of shape {}!".format(out_shape))
+    with rvt.profiling.stage("read", nbytes=out.nbytes, npixels=x_size * y_size):
+        if data_set.RasterCount == 1:
+            data_set.GetRasterBand(1).ReadAsArray(x_off, y_off, x_size, y_size, buf_obj=out)
+        else:
+            data_set.ReadAsArray(x_off, y_off, x_size, y_size, buf_obj=out)
+    return out
+
+
+def _memory_map_raster_arr(raster_path, data_set, window=None):
+    """
+    Returns read-only memory map (numpy.memmap) of single band uncompressed GeoTIFF stored in contiguous strips, or
+    None if raster can't be memory mapped.
+    """
+    if data_set.GetDriver().ShortName != "GTiff" or data_set.RasterCount != 1 or \
+            data_set.GetMetadataItem("COMPRESSION", "IMAGE_STRUCTURE") is not None:
+        return None
+    band = data_set.GetRasterBand(1)
+    block_x_size, block_y_size = band.GetBlockSize()
+    if block_x_size != data_set.RasterXSize:  # tiled
+        return None
+    data_type = np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
+    strip_nbytes = block_y_size * data_set.RasterXSize * data_type.itemsize
+    offset = band.GetMetadataItem("BLOCK_OFFSET_0_0", "TIFF")
+    if offset is None:
+        return None
+    offset = int(offset)
+    for i_strip in range(1, int(np.ceil(data_set.RasterYSize / block_y_size))):  # strips have to be contiguous
+        strip_offset = band.GetMetadataItem("BLOCK_OFFSET_0_{}".format(i_strip), "TIFF")
+        if strip_offset is None or int(strip_offset) != offset + i_strip * strip_nbytes:
+            return None
+    with open(raster_path, "rb") as raster_file:  # TIFF byte order
+        byte_order = "<" if raster_file.read(2) == b"II" else ">"
+    array = np.memmap(raster_path, dtype=data_type.newbyteorder(byte_order), mode="r", offset=offset,
+                      shape=(data_set.RasterYSize, data_set.RasterXSize))
+    if window is not None:
+        x_off, y_off, x_size, y_size = window
+        array = array[y_off:y_off + y_size, x_off:x_off + x_size]
+    return array
+
+
+def get_raster_arr(raster_path, window=None, data_type=None, out=None, mem_map=False):
     """
     Reads raster from raster_path and returns its array(value) and resolution.
 
@@ -2545,6 +3018,16 @@ def get_raster_arr(raster_path):
     ----------
     raster_path : str
         Path to raster
+    window : tuple(int, int, int, int)
+        Window to read (x_off, y_off, x_size, y_size) in pixels, if None the whole raster is read.
+    data_type : numpy.dtype
+        Data type of array (e.g. np.float32), GDAL converts values while reading. If None data type of raster.
+    out : numpy.ndarray
+        Array to read into (2D for one band, 3D (bands, rows, cols) for multiple bands), its data type is used.
+    mem_map : bool
+        If True, single band uncompressed GeoTIFF is memory mapped (read-only numpy.memmap, pixels are read from
+        disk when accessed). If raster can't be memory mapped (compressed, tiled, multiple bands) or data_type
+        differs from raster data type, raster is read into memory.
 
     Returns
     -------
@@ -2554,26 +3037,15 @@ def get_raster_arr(raster_path):
         Returns dictionary with keys: array, resolution and no_data. Key resolution is tuple where first element is x
         resolution and second is y resolution. Key no_data represent value of no data.
     """
-    data_set = gdal.Open(raster_path)
-    gt = data_set.GetGeoTransform()
-    x_res = abs(gt[1])
-    y_res = abs(-gt[5])
-    bands = []
-    no_data = data_set.GetRasterBand(1).GetNoDataValue()  # we assume that all the bands have same no_data val
-    if data_set.RasterCount == 1:  # only one band
-        array = np.array(data_set.GetRasterBand(1).ReadAsArray())
-        data_set = None
-        return {"array": array, "resolution": (x_res, y_res), "no_data": no_data}
-    else:  # multiple bands
-        for i_band in range(data_set.RasterCount):
-            i_band += 1
-            band = np.array(data_set.GetRasterBand(i_band).ReadAsArray())
-            if band is None:
-                continue
-            else:
-                bands.append(band)
-        data_set = None  # close dataset
-        return {"array": np.array(bands), "resolution": (x_res, y_res), "no_data": no_data}
+    _, data_set, metadata = _get_raster_cache_entry(raster_path)
+    array = None
+    if mem_map and out is None:
+        array = _memory_map_raster_arr(raster_path=raster_path, data_set=data_set, window=window)
+        if array is not None and data_type is not None and np.dtype(data_type) != array.dtype:
+            array = None
+    if array is None:
+        array = read_data_set_arr(data_set=data_set, window=window, data_type=data_type, out=out)
+    return {"array": array, "resolution": metadata["resolution"], "no_data": metadata["no_data"]}
 
 
 def get_raster_size(raster_path, band=1):
@@ -2590,16 +3062,13 @@ def get_raster_size(raster_path, band=1):
     -------
     tuple(x_size, y_size)
     """
-    data_set = gdal.Open(raster_path)  # Open dem raster
-    band = data_set.GetRasterBand(band)
+    band = open_raster(raster_path).GetRasterBand(band)
     x_size = band.XSize  # number of columns
     y_size = band.YSize  # number of rows
-    del band
-    data_set = None  # close data_set
     return x_size, y_size
 
 
-def save_raster(src_raster_path, out_raster_path, out_raster_arr: np.ndarray, no_data=None, e_type=6):
+def save_raster(src_raster_path, out_raster_path, out_raster_arr: np.ndarray, no_data=None, e_type=6, cog=False):
     """Saves raster array (out_rast_arr) to out_raster_path (GTiff), using src_rast_path information.
 
     Parameters
@@ -2614,18 +3083,28 @@ def save_raster(src_raster_path, out_raster_path, out_raster_arr: np.ndarray, no
         Value that represents no data pixels.
     e_type : GDALDataType
         https://gdal.org/api/raster_c_api.html#_CPPv412GDALDataType, (GDT_Float32 = 6, GDT_UInt8 = 1, ...)
+    cog : bool
+        If True, raster is saved as Cloud Optimized GeoTIFF (COG) with internal overviews (average resampling), they
+        are computed from the array in memory.
     """
-    src_data_set = gdal.Open(src_raster_path)
-    gtiff_driver = gdal.GetDriverByName("GTiff")
+    src_metadata = get_raster_metadata(src_raster_path)
+    clear_raster_cache(out_raster_path)  # cached data set of overwritten raster
+    if cog:  # raster is created in memory and copied to COG (COG driver doesn't support writing)
+        gtiff_driver = gdal.GetDriverByName("MEM")
+        cog_raster_path = out_raster_path
+        out_raster_path = ""
+    else:
+        gtiff_driver = gdal.GetDriverByName("GTiff")
     if len(out_raster_arr.shape) == 2:  # 2D array, one band
         out_data_set = gtiff_driver.Create(out_raster_path, xsize=out_raster_arr.shape[1],
                                            ysize=out_raster_arr.shape[0],
                                            bands=1,
                                            eType=e_type,  # eType: 6 = GDT_Float32
-                                           options=['COMPRESS=LZW'])
-        out_data_set.SetProjection(src_data_set.GetProjection())
-        out_data_set.SetGeoTransform(src_data_set.GetGeoTransform())
-        out_data_set.GetRasterBand(1).WriteArray(out_raster_arr)
+                                           options=[] if cog else ['COMPRESS=LZW'])
+        out_data_set.SetProjection(src_metadata["projection"])
+        out_data_set.SetGeoTransform(src_metadata["geo_transform"])
+        with rvt.profiling.stage("write", nbytes=out_raster_arr.nbytes, npixels=out_raster_arr.size):
+            out_data_set.GetRasterBand(1).WriteArray(out_raster_arr)
         if no_data is not None:
             out_data_set.GetRasterBand(1).SetNoDataValue(no_data)
 
@@ -2634,15 +3113,21 @@ def save_raster(src_raster_path, out_raster_path, out_raster_arr: np.ndarray, no
                                            ysize=out_raster_arr.shape[1],
                                            bands=out_raster_arr.shape[0],
                                            eType=e_type,  # eType: 6 = GDT_Float32
-                                           options=['COMPRESS=LZW'])
-        out_data_set.SetProjection(src_data_set.GetProjection())
-        out_data_set.SetGeoTransform(src_data_set.GetGeoTransform())
-        for i_band in range(out_raster_arr.shape[0]):
-            out_data_set.GetRasterBand(i_band + 1).WriteArray(out_raster_arr[i_band, :, :])
+                                           options=[] if cog else ['COMPRESS=LZW'])
+        out_data_set.SetProjection(src_metadata["projection"])
+        out_data_set.SetGeoTransform(src_metadata["geo_transform"])
+        with rvt.profiling.stage("write", nbytes=out_raster_arr.nbytes, npixels=out_raster_arr.size):
+            for i_band in range(out_raster_arr.shape[0]):
+                out_data_set.GetRasterBand(i_band + 1).WriteArray(out_raster_arr[i_band, :, :])
         if no_data is not None:
             out_data_set.GetRasterBand(1).SetNoDataValue(no_data)
     else:
         raise Exception("rvt.default.save_raster: You have to input 2D or 3D numpy array!")
-    out_data_set.FlushCache()
-    src_data_set = None  # Close source data set
-    out_data_set = None  # Close output data set
+    # blocks are compressed and written to disk when data set is flushed (or copied to COG)
+    with rvt.profiling.stage("compress", nbytes=out_raster_arr.nbytes, npixels=out_raster_arr.size):
+        if cog:
+            gdal.GetDriverByName("COG").CreateCopy(cog_raster_path, out_data_set,
+                                                   options=["COMPRESS=LZW", "BIGTIFF=IF_NEEDED", "RESAMPLING=AVERAGE"])
+        else:
+            out_data_set.FlushCache()
+        out_data_set = None  # Close output data set
@@ -0,0 +1,431 @@
+"""
+Relief Visualization Toolbox – Computation Engines
+
+Contains registry of computation kernels (hot loops of visualization functions) for different engines.
+Engine "numpy" is the reference and is always available, engine "numba" (JIT compiled kernels) is available if numba
+is installed. Engine "auto" selects the first available engine from ENGINES_PREFERENCE.
+Contains also BufferPool, pool of reusable scratch (and output) arrays, which is used by tile loops to avoid allocating
+the same arrays for each tile.
+Floating point precision of intermediates and outputs of visualization and blending functions is set library-wide
+with set_float_dtype (float32 by default), places that need float64 for accuracy (e.g. summed-area tables) keep it
+locally.
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2020 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2020 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+from collections import OrderedDict
+import warnings
+import weakref
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# engines in order of preference for engine="auto"
+ENGINES_PREFERENCE = ("numba", "numpy")
+
+# {kernel_name: {engine: kernel_function}}
+_kernels = {}
+
+# floating point data type of intermediates and outputs (precision policy)
+_float_dtype = np.dtype(np.float32)
+
+
+def get_float_dtype():
+    """Returns floating point data type (numpy.dtype) used for intermediates and outputs, see set_float_dtype."""
+    return _float_dtype
+
+
+def set_float_dtype(dtype):
+    """
+    Sets floating point data type used for intermediates and outputs of visualization (rvt.vis) and blending
+    (rvt.blend, rvt.blend_func) functions.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype
+        np.float32 (default, production) or np.float64.
+    """
+    global _float_dtype
+    if np.dtype(dtype) not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise Exception("rvt.engine.set_float_dtype: dtype must be np.float32 or np.float64!")
+    _float_dtype = np.dtype(dtype)
+
+
+def register_kernel(kernel_name, engine, kernel=None):
+    """
+    Registers kernel function for engine. Can be used as decorator (kernel=None).
+
+    Parameters
+    ----------
+    kernel_name : str
+        Name of kernel, e.g. "horizon_slope", "local_dominance".
+    engine : str
+        Name of engine, e.g. "numpy", "numba".
+    kernel : Callable
+        Kernel function, needs to have the same parameters and outputs as the "numpy" (reference) kernel.
+
+    Returns
+    -------
+    kernel : Callable
+        Registered kernel function.
+    """
+    if kernel is None:
+        return lambda function: register_kernel(kernel_name, engine, function)
+    _kernels.setdefault(kernel_name, {})[engine] = kernel
+    return kernel
+
+
+def available_engines(kernel_name):
+    """Returns list of engines that have kernel_name registered."""
+    return list(_kernels.get(kernel_name, {}))
+
+
+def get_kernel(kernel_name, engine="numpy"):
+    """
+    Returns kernel function for engine. If engine is "auto" it selects the first available engine from
+    ENGINES_PREFERENCE. If kernel is not available for engine it falls back to "numpy" kernel (with warning).
+
+    Parameters
+    ----------
+    kernel_name : str
+        Name of kernel.
+    engine : str
+        Name of engine ("numpy", "numba", "auto", ...).
+
+    Returns
+    -------
+    kernel : Callable
+        Kernel function.
+    """
+    if kernel_name not in _kernels:
+        raise Exception("rvt.engine.get_kernel: Kernel {} doesn't exist!".format(kernel_name))
+    kernels = _kernels[kernel_name]
+    if engine == "auto":
+        engine = next(engine_name for engine_name in ENGINES_PREFERENCE if engine_name in kernels)
+    if engine not in kernels:
+        warnings.warn("rvt.engine.get_kernel: Engine {} is not available for kernel {}, using numpy!".format(
+            engine, kernel_name))
+        engine = "numpy"
+    return kernels[engine]
+
+
+class BufferPool:
+    """
+    Pool of reusable arrays, keyed by (shape, dtype). Arrays are taken from the pool with get() and returned to it with
+    release() when they are not needed anymore. Only arrays allocated by the pool are taken back, other arrays (e.g.
+    output of user functions, cached arrays) are ignored by release(). When released arrays exceed max_nbytes, arrays
+    of the least recently used keys are dropped.
+
+    Attributes
+    ----------
+    max_nbytes : int
+        Maximal number of bytes of (released) arrays kept in the pool, if None there is no limit.
+    """
+
+    def __init__(self, max_nbytes=None):
+        self.max_nbytes = max_nbytes
+        self._free = OrderedDict()  # {(shape, dtype): [arrays]}, ordered from least to most recently used key
+        self._allocated = weakref.WeakValueDictionary()  # {id(array): array} of arrays allocated by the pool
+
+    @property
+    def nbytes(self):
+        """Number of bytes of arrays in the pool."""
+        return sum(arr.nbytes for arrays in self._free.values() for arr in arrays)
+
+    def get(self, shape, dtype=np.float32):
+        """Returns array (with arbitrary values) of shape and dtype, from the pool if available else new array."""
+        key = (tuple(shape), np.dtype(dtype))
+        arrays = self._free.setdefault(key, [])
+        self._free.move_to_end(key)
+        if arrays:
+            return arrays.pop()
+        arr = np.empty(key[0], dtype=key[1])
+        self._allocated[id(arr)] = arr
+        return arr
+
+    def release(self, *arrays):
+        """Returns arrays to the pool. Arrays which weren't allocated by the pool (get()) or are None are skipped."""
+        for arr in arrays:
+            if arr is None or self._allocated.get(id(arr)) is not arr:
+                continue
+            key = (arr.shape, arr.dtype)
+            if any(arr is free_arr for free_arr in self._free.get(key, [])):
+                continue
+            self._free.setdefault(key, []).append(arr)
+        if self.max_nbytes is not None:
+            while self._free and self.nbytes > self.max_nbytes:
+                self._free.popitem(last=False)
+
+    def clear(self):
+        """Removes all arrays from the pool."""
+        self._free.clear()
+
+
+def get_buffer(buffer_pool, shape, dtype=np.float32):
+    """Returns array from buffer_pool (BufferPool) or new empty array if buffer_pool is None."""
+    if buffer_pool is None:
+        return np.empty(shape, dtype=dtype)
+    return buffer_pool.get(shape, dtype)
+
+
+def release_buffer(buffer_pool, *arrays):
+    """Returns arrays to buffer_pool (BufferPool), does nothing if buffer_pool is None."""
+    if buffer_pool is not None:
+        buffer_pool.release(*arrays)
+
+
+# NUMPY (reference) kernels
+@register_kernel("horizon_slope", "numpy")
+def horizon_slope_numpy(height, pad, shifts, distances, compute_max=True, compute_min=False, buffer_pool=None):
+    """
+    Maximal and minimal slope (tangent of elevation angle) over all shifts, for the part of height without pad.
+
+    Parameters
+    ----------
+    height : numpy.ndarray
+        2D numpy array of padded heights (float32 or float64).
+    pad : int
+        Pad width, has to be equal or larger than largest shift.
+    shifts : numpy.ndarray
+        2D numpy array (n_shifts, 2) of integer shifts (rows, columns), the same as shift in np.roll.
+    distances : numpy.ndarray
+        Distance for each shift.
+    compute_max : bool
+        Compute maximal slope.
+    compute_min : bool
+        Compute minimal slope.
+    buffer_pool : BufferPool
+        Pool from which output and scratch arrays are taken (scratch arrays are released back), if None new arrays are
+        allocated.
+
+    Returns
+    -------
+    max_slope, min_slope : numpy.ndarray
+        2D numpy arrays (float64) of maximal and minimal slope (None if not computed). Maximal slope starts with -1000,
+        minimal with 1000, NaN slopes are skipped.
+    """
+    n_rows = height.shape[0] - 2 * pad
+    n_cols = height.shape[1] - 2 * pad
+    height_center = height[pad:pad + n_rows, pad:pad + n_cols]
+    max_slope = None
+    min_slope = None
+    if compute_max:
+        max_slope = get_buffer(buffer_pool, height_center.shape, np.float64)
+        max_slope.fill(-1000)
+    if compute_min:
+        min_slope = get_buffer(buffer_pool, height_center.shape, np.float64)
+        min_slope.fill(1000)
+    height_diff = get_buffer(buffer_pool, height_center.shape, height.dtype)
+    slope = get_buffer(buffer_pool, height_center.shape, np.float64)
+    for shift_indx, radius in zip(shifts, distances):
+        # shifted heights are the same as np.roll(height, shift_indx, axis=(0, 1))
+        height_shift = height[pad - shift_indx[0]:pad - shift_indx[0] + n_rows,
+                              pad - shift_indx[1]:pad - shift_indx[1] + n_cols]
+        np.subtract(height_shift, height_center, out=height_diff)
+        np.divide(height_diff, radius, out=slope)
+        # np.fmax and np.fmin prevent NaN values contaminating the result (if one of the elements is NaN, pick non-NaN)
+        if compute_max:
+            np.fmax(max_slope, slope, out=max_slope)
+        if compute_min:
+            np.fmin(min_slope, slope, out=min_slope)
+    release_buffer(buffer_pool, height_diff, slope)
+    return max_slope, min_slope
+
+
+@register_kernel("local_dominance", "numpy")
+def local_dominance_numpy(dem, pad, shifts, distances, dist_factor, observer_height, buffer_pool=None):
+    """
+    Local dominance sum (not normalized), for the part of dem without pad.
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        2D numpy array of padded heights (float32 or float64).
+    pad : int
+        Pad width, has to be equal or larger than largest shift.
+    shifts : numpy.ndarray
+        2D numpy array (n_shifts, 2) of integer shifts (rows, columns), the same as shift in np.roll.
+    distances : numpy.ndarray
+        Distance for each shift.
+    dist_factor : numpy.ndarray
+        Distance factor for each shift.
+    observer_height : float
+        Observer height.
+    buffer_pool : BufferPool
+        Pool from which output and scratch arrays are taken (scratch arrays are released back), if None new arrays are
+        allocated.
+
+    Returns
+    -------
+    local_dom_out : numpy.ndarray
+        2D numpy array (of dem dtype) of local dominance sum, NaN where dem is NaN.
+    """
+    n_rows = dem.shape[0] - 2 * pad
+    n_cols = dem.shape[1] - 2 * pad
+    dem_center = dem[pad:pad + n_rows, pad:pad + n_cols]
+    dem_observer = get_buffer(buffer_pool, dem_center.shape, dem.dtype)
+    np.add(dem_center, observer_height, out=dem_observer)
+    local_dom_out = get_buffer(buffer_pool, dem_center.shape, dem.dtype)
+    np.multiply(dem_center, 0, out=local_dom_out)  # multiply with 0 to preserve nodata
+    height_diff = get_buffer(buffer_pool, dem_center.shape, dem.dtype)
+    local_dom = get_buffer(buffer_pool, dem_center.shape, np.float64)
+    is_lower = get_buffer(buffer_pool, dem_center.shape, np.bool_)
+    for shift_indx, distance, factor in zip(shifts, distances, dist_factor):
+        dem_moved = dem[pad - shift_indx[0]:pad - shift_indx[0] + n_rows,
+                        pad - shift_indx[1]:pad - shift_indx[1] + n_cols]
+        # add only where observer is higher than moved dem (comparison with NaN is False)
+        np.subtract(dem_observer, dem_moved, out=height_diff)
+        np.divide(height_diff, distance, out=local_dom)
+        np.multiply(local_dom, factor, out=local_dom)
+        np.greater(height_diff, 0, out=is_lower)
+        np.add(local_dom_out, local_dom, out=local_dom_out, where=is_lower, casting="same_kind")
+    release_buffer(buffer_pool, dem_observer, height_diff, local_dom, is_lower)
+    return local_dom_out
+
+
+@register_kernel("max_decimation", "numpy")
+def max_decimation_numpy(dem, row_indices, col_indices, window_from, window_size, buffer_pool=None):
+    """
+    Maximum of window_size x window_size windows of dem, only for selected rows and columns (decimation). The same as
+    rows and columns of maximum of zeros and np.roll(dem, (i, j), axis=(0, 1)) for i and j from window_from to
+    window_from + window_size - 1 (windows wrap around dem edges).
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        2D numpy array of heights (float32 or float64).
+    row_indices : numpy.ndarray
+        Indices of selected rows.
+    col_indices : numpy.ndarray
+        Indices of selected columns.
+    window_from : int
+        First shift of window (the same as shift in np.roll).
+    window_size : int
+        Number of shifts (size of window) in each direction.
+    buffer_pool : BufferPool
+        Pool from which scratch arrays are taken (and released back), if None new arrays are allocated.
+
+    Returns
+    -------
+    max_out : numpy.ndarray
+        2D numpy array (of dem dtype, len(row_indices) x len(col_indices)) of window maximums (at least 0), NaN if
+        window contains NaN.
+    """
+    window_shifts = np.arange(window_from, window_from + window_size)
+    # np.roll(dem, i, axis=0)[row] is dem[(row - i) % n_rows], maximum is computed first over rows, then over columns
+    rows = (np.asarray(row_indices)[:, np.newaxis] - window_shifts) % dem.shape[0]
+    cols = (np.asarray(col_indices)[:, np.newaxis] - window_shifts) % dem.shape[1]
+    row_max = get_buffer(buffer_pool, (rows.shape[0], dem.shape[1]), dem.dtype)
+    row_max.fill(0)
+    for i_shift in range(window_size):
+        np.maximum(row_max, dem[rows[:, i_shift]], out=row_max)
+    max_out = np.zeros((rows.shape[0], cols.shape[0]), dtype=dem.dtype)
+    for j_shift in range(window_size):
+        np.maximum(max_out, row_max[:, cols[:, j_shift]], out=max_out)
+    release_buffer(buffer_pool, row_max)
+    return max_out
+
+
+# NUMBA kernels
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _horizon_slope_numba(height, pad, shifts, distances, compute_max, compute_min):
+        n_rows = height.shape[0] - 2 * pad
+        n_cols = height.shape[1] - 2 * pad
+        max_slope = np.empty((n_rows, n_cols), dtype=np.float64)
+        min_slope = np.empty((n_rows, n_cols), dtype=np.float64)
+        for i_row in numba.prange(n_rows):
+            for i_col in range(n_cols):
+                height_center = height[pad + i_row, pad + i_col]
+                max_value = -1000.
+                min_value = 1000.
+                for i_shift in range(distances.shape[0]):
+                    height_shift = height[pad + i_row - shifts[i_shift, 0], pad + i_col - shifts[i_shift, 1]]
+                    slope = (height_shift - height_center) / distances[i_shift]
+                    # comparison with NaN is False, NaN slopes are skipped
+                    if compute_max and slope > max_value:
+                        max_value = slope
+                    if compute_min and slope < min_value:
+                        min_value = slope
+                max_slope[i_row, i_col] = max_value
+                min_slope[i_row, i_col] = min_value
+        return max_slope, min_slope
+
+    @register_kernel("horizon_slope", "numba")
+    def horizon_slope_numba(height, pad, shifts, distances, compute_max=True, compute_min=False, buffer_pool=None):
+        """Numba kernel of horizon_slope_numpy (buffer_pool is not used)."""
+        max_slope, min_slope = _horizon_slope_numba(
+            height, int(pad), np.asarray(shifts, dtype=np.int64).reshape(-1, 2),
+            np.asarray(distances, dtype=np.float64), compute_max, compute_min
+        )
+        return (max_slope if compute_max else None), (min_slope if compute_min else None)
+
+    @numba.njit(parallel=True, cache=True)
+    def _local_dominance_numba(dem, pad, shifts, distances, dist_factor, observer_height):
+        n_rows = dem.shape[0] - 2 * pad
+        n_cols = dem.shape[1] - 2 * pad
+        local_dom_out = np.empty((n_rows, n_cols), dtype=dem.dtype)
+        for i_row in numba.prange(n_rows):
+            for i_col in range(n_cols):
+                dem_center = dem[pad + i_row, pad + i_col]
+                if np.isnan(dem_center):
+                    local_dom_out[i_row, i_col] = np.nan
+                    continue
+                dem_observer = dem_center + observer_height
+                # sum is stored (rounded to dem dtype) after each addition, the same as in numpy kernel
+                local_dom_out[i_row, i_col] = 0
+                for i_shift in range(distances.shape[0]):
+                    height_diff = dem_observer - dem[pad + i_row - shifts[i_shift, 0],
+                                                     pad + i_col - shifts[i_shift, 1]]
+                    if height_diff > 0:
+                        local_dom_out[i_row, i_col] += height_diff / distances[i_shift] * dist_factor[i_shift]
+        return local_dom_out
+
+    @register_kernel("local_dominance", "numba")
+    def local_dominance_numba(dem, pad, shifts, distances, dist_factor, observer_height, buffer_pool=None):
+        """Numba kernel of local_dominance_numpy (buffer_pool is not used)."""
+        return _local_dominance_numba(
+            dem, int(pad), np.asarray(shifts, dtype=np.int64).reshape(-1, 2),
+            np.asarray(distances, dtype=np.float64), np.asarray(dist_factor, dtype=np.float64),
+            dem.dtype.type(observer_height)
+        )
+
+    @numba.njit(parallel=True, cache=True)
+    def _max_decimation_numba(dem, rows, cols):
+        max_out = np.empty((rows.shape[0], cols.shape[0]), dtype=dem.dtype)
+        for i_row in numba.prange(rows.shape[0]):
+            for i_col in range(cols.shape[0]):
+                max_value = 0.
+                for i_shift in range(rows.shape[1]):
+                    for j_shift in range(cols.shape[1]):
+                        value = dem[rows[i_row, i_shift], cols[i_col, j_shift]]
+                        # NaN propagates, the same as in np.maximum
+                        if value > max_value or np.isnan(value):
+                            max_value = value
+                max_out[i_row, i_col] = max_value
+        return max_out
+
+    @register_kernel("max_decimation", "numba")
+    def max_decimation_numba(dem, row_indices, col_indices, window_from, window_size, buffer_pool=None):
+        """Numba kernel of max_decimation_numpy (buffer_pool is not used)."""
+        window_shifts = np.arange(window_from, window_from + window_size)
+        return _max_decimation_numba(
+            dem, (np.asarray(row_indices, dtype=np.int64)[:, np.newaxis] - window_shifts) % dem.shape[0],
+            (np.asarray(col_indices, dtype=np.int64)[:, np.newaxis] - window_shifts) % dem.shape[1]
+        )
@@ -0,0 +1,265 @@
+"""
+Relief Visualization Toolbox – Profiling
+
+Contains opt-in stage-level profiling of saving visualizations (rvt.default) and tile by tile processing (rvt.tile).
+Stages are: read (reading DEM), nan (changing no_data to NaN), compute (visualization), 8bit (conversion to 8bit),
+write (writing arrays to GDAL data set), compress (GDAL flush: encoding, compression and writing of blocks to disk, COG
+conversion) and save (whole DefaultValues.save_* method, its self time is everything not in other stages). Each
+record has duration, number of bytes and pixels, visualization and tile it belongs to and optionally peak memory.
+
+Profiling is disabled by default, then stage() returns the same no-op context manager and the overhead is one
+function call per stage. Example:
+
+    profiler = rvt.profiling.enable(out_path="profile.jsonl", track_memory=True)
+    default.save_visualizations(dem_path)
+    rvt.profiling.disable()
+    print(profiler.summary_table())
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+
+# active profiler (Profiler), None if profiling is disabled
+_profiler = None
+
+
+class Profiler:
+    """
+    Collects records of profiled stages.
+
+    Attributes
+    ----------
+    records : list(dict)
+        Records of stages, keys: stage, visualization, tile ((x, y) of tile in pixels or None), start (seconds since
+        profiler was enabled), time (duration in seconds, including nested stages), self_time (without nested stages
+        of the same thread), nbytes, npixels and peak_memory (peak of memory allocated by Python and numpy during
+        stage in bytes, None if track_memory is False).
+    out_path : str
+        If not None, records are appended to this file as JSON lines when they are recorded.
+    track_memory : bool
+        If True peak memory of each stage is measured with tracemalloc (slows down allocations).
+    labels : dict
+        Current labels (visualization, tile) of records, see labels().
+    """
+
+    def __init__(self, out_path=None, track_memory=False):
+        self.records = []
+        self.out_path = out_path
+        self.track_memory = track_memory
+        self.labels = {"visualization": None, "tile": None}
+        self._start_time = time.perf_counter()
+        self._local = threading.local()  # stack of active stages of thread
+        self._lock = threading.Lock()
+        self._out_file = open(out_path, "a") if out_path is not None else None
+        self._started_tracing = False  # tracemalloc was started by enable()
+
+    def _stage_stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def record(self, record):
+        """Adds record (dict) and writes it to out_path."""
+        with self._lock:
+            self.records.append(record)
+            if self._out_file is not None:
+                self._out_file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        """Closes out_path file."""
+        if self._out_file is not None:
+            self._out_file.close()
+            self._out_file = None
+
+    def summary(self):
+        """
+        Returns list of dictionaries, one for each visualization and stage: visualization, stage, count (number of
+        records), self_time (sum, seconds), nbytes, npixels, pixels_per_s (npixels / self_time) and peak_memory
+        (maximum). Times of parallel row bands (threads) are summed.
+        """
+        summary = {}
+        for record in self.records:
+            key = (record["visualization"] or "", record["stage"])
+            if key not in summary:
+                summary[key] = {"visualization": record["visualization"], "stage": record["stage"], "count": 0,
+                                "self_time": 0., "nbytes": 0, "npixels": 0, "peak_memory": None}
+            stage_summary = summary[key]
+            stage_summary["count"] += 1
+            stage_summary["self_time"] += record["self_time"]
+            stage_summary["nbytes"] += record["nbytes"]
+            stage_summary["npixels"] += record["npixels"]
+            if record["peak_memory"] is not None:
+                stage_summary["peak_memory"] = max(stage_summary["peak_memory"] or 0, record["peak_memory"])
+        for stage_summary in summary.values():
+            stage_summary["pixels_per_s"] = stage_summary["npixels"] / stage_summary["self_time"] \
+                if stage_summary["self_time"] > 0 else None
+        return [summary[key] for key in sorted(summary)]
+
+    def summary_table(self):
+        """Returns summary (see summary) as text table, share is share of total self time."""
+        summary = self.summary()
+        total_time = sum(stage_summary["self_time"] for stage_summary in summary) or 1.
+        lines = ["{:<16} {:<9} {:>6} {:>10} {:>6} {:>10} {:>12} {:>10}".format(
+            "visualization", "stage", "count", "time [s]", "share", "MB", "pixels/s", "peak MB")]
+        for stage_summary in summary:
+            lines.append("{:<16} {:<9} {:>6} {:>10.3f} {:>5.1f}% {:>10.1f} {:>12} {:>10}".format(
+                stage_summary["visualization"] or "-",
+                stage_summary["stage"],
+                stage_summary["count"],
+                stage_summary["self_time"],
+                100 * stage_summary["self_time"] / total_time,
+                stage_summary["nbytes"] / 1024 ** 2,
+                "-" if stage_summary["pixels_per_s"] is None else "{:.3g}".format(stage_summary["pixels_per_s"]),
+                "-" if stage_summary["peak_memory"] is None else "{:.1f}".format(
+                    stage_summary["peak_memory"] / 1024 ** 2)
+            ))
+        return "\n".join(lines)
+
+
+class _Stage:
+    """Context manager which records stage to profiler."""
+
+    def __init__(self, profiler, name, nbytes, npixels, visualization):
+        self.profiler = profiler
+        self.name = name
+        self.visualization = visualization
+        self.nbytes = nbytes
+        self.npixels = npixels
+        self.children_time = 0.
+        self.peak_memory = 0
+
+    def __enter__(self):
+        stack = self.profiler._stage_stack()
+        if self.profiler.track_memory:
+            if stack:  # peak of parent stage so far, before it is reset
+                stack[-1].peak_memory = max(stack[-1].peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.visualization is None:  # from parent stage (of the same thread) or labels
+            self.visualization = stack[-1].visualization if stack else self.profiler.labels["visualization"]
+        stack.append(self)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start_time
+        stack = self.profiler._stage_stack()
+        stack.pop()
+        peak_memory = None
+        if self.profiler.track_memory:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            peak_memory = self.peak_memory
+        if stack:
+            stack[-1].children_time += duration
+            if self.profiler.track_memory:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, self.peak_memory)
+        tile = self.profiler.labels["tile"]
+        self.profiler.record({
+            "stage": self.name,
+            "visualization": self.visualization,
+            "tile": None if tile is None else list(tile),
+            "start": self.start_time - self.profiler._start_time,
+            "time": duration,
+            "self_time": duration - self.children_time,
+            "nbytes": int(self.nbytes),
+            "npixels": int(self.npixels),
+            "peak_memory": peak_memory
+        })
+        return False
+
+
+# returned by stage() when profiling is disabled
+_NO_STAGE = contextlib.nullcontext()
+
+
+def stage(name, nbytes=0, npixels=0, visualization=None):
+    """
+    Returns context manager which records stage name (read, nan, compute, 8bit, write, compress, save) with nbytes
+    and npixels processed in it, if profiling is enabled. Stages can be nested. If visualization is None, it is taken
+    from parent stage or labels (see labels()).
+    """
+    if _profiler is None:
+        return _NO_STAGE
+    return _Stage(_profiler, name, nbytes, npixels, visualization)
+
+
+@contextlib.contextmanager
+def labels(**new_labels):
+    """Context manager (or decorator) which sets labels (visualization, tile) of stages recorded in it."""
+    if _profiler is None:
+        yield
+        return
+    previous_labels = set_labels(**new_labels)
+    try:
+        yield
+    finally:
+        set_labels(**previous_labels)
+
+
+def set_labels(**new_labels):
+    """Sets labels (visualization, tile) of stages recorded from now on, returns previous values of labels."""
+    if _profiler is None:
+        return {}
+    previous_labels = {name: _profiler.labels.get(name) for name in new_labels}
+    _profiler.labels.update(new_labels)
+    return previous_labels
+
+
+def enable(out_path=None, track_memory=False):
+    """
+    Enables profiling, returns new active profiler (Profiler).
+
+    Parameters
+    ----------
+    out_path : str
+        If not None, records are appended to this file as JSON lines when they are recorded.
+    track_memory : bool
+        If True peak memory of each stage is measured with tracemalloc (memory allocated by Python and numpy, not by
+        GDAL), it slows down allocations.
+
+    Returns
+    -------
+    profiler : Profiler
+        Active profiler.
+    """
+    global _profiler
+    disable()
+    profiler = Profiler(out_path=out_path, track_memory=track_memory)
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        profiler._started_tracing = True
+    _profiler = profiler
+    return _profiler
+
+
+def disable():
+    """Disables profiling, returns profiler which was active (or None)."""
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    if profiler is not None:
+        profiler.close()
+        if profiler._started_tracing:
+            tracemalloc.stop()
+    return profiler
+
+
+def get_profiler():
+    """Returns active profiler (Profiler) or None if profiling is disabled."""
+    return _profiler
@@ -0,0 +1,120 @@
+"""
+Relief Visualization Toolbox – Progress
+
+Contains progress and throughput reporting of long runs: tile by tile processing (rvt.tile) and blending
+(rvt.blend.BlenderCombination.render_all_images). After each finished tile (or layer) progress callback is called
+with dictionary of progress info (see Progress.tile_done), e.g. to update progress bar (QGIS) or job dashboard. Stalled
+workers can be detected from time since last callback. Example:
+
+    rvt.tile.save_rvt_visualization_tile_by_tile(..., progress_callback=rvt.progress.print_progress)
+
+Credits:
+    Žiga Kokalj (ziga.kokalj@zrc-sazu.si)
+    Krištof Oštir (kristof.ostir@fgg.uni-lj.si)
+    Klemen Zakšek
+    Peter Pehani
+    Klemen Čotar
+    Maja Somrak
+    Žiga Maroh
+    Nejc Čož
+
+Copyright:
+    2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
+    2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
+"""
+
+import time
+
+
+class Progress:
+    """
+    Counts finished tiles and bytes read and written, calls callback with progress info after each tile.
+
+    Attributes
+    ----------
+    nr_tiles : int
+        Number of all tiles (or steps).
+    callback : Callable
+        Function called with progress info (dict, see tile_done) after each tile, if None progress is only counted.
+    name : str
+        Name of run (e.g. visualization), passed to callback.
+    tile_index : int
+        Number of finished tiles.
+    bytes_read : int
+        Number of bytes read so far (uncompressed).
+    bytes_written : int
+        Number of bytes written so far (uncompressed, without overviews).
+    """
+
+    def __init__(self, nr_tiles, callback=None, name=None):
+        self.nr_tiles = nr_tiles
+        self.callback = callback
+        self.name = name
+        self.tile_index = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._start_time = time.perf_counter()
+
+    def add_read(self, nbytes):
+        """Adds nbytes to bytes read."""
+        self.bytes_read += int(nbytes)
+
+    def add_written(self, nbytes):
+        """Adds nbytes to bytes written."""
+        self.bytes_written += int(nbytes)
+
+    def tile_done(self, window=None, skipped=False):
+        """
+        Marks next tile as finished and calls callback with progress info (dictionary), keys:
+        name, tile_index (index of finished tile, from 0), nr_tiles, window ((x, y, cols, rows) of tile in pixels,
+        None if step is not a tile), skipped (True if tile was no_data and visualization wasn't computed),
+        elapsed (seconds since start), tiles_per_s, bytes_read, bytes_written, read_bytes_per_s, write_bytes_per_s and
+        eta (estimated seconds until the end, from tiles_per_s).
+        Returns progress info.
+        """
+        self.tile_index += 1
+        elapsed = time.perf_counter() - self._start_time
+        tiles_per_s = self.tile_index / elapsed if elapsed > 0 else None
+        progress_info = {
+            "name": self.name,
+            "tile_index": self.tile_index - 1,
+            "nr_tiles": self.nr_tiles,
+            "window": window,
+            "skipped": skipped,
+            "elapsed": elapsed,
+            "tiles_per_s": tiles_per_s,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "read_bytes_per_s": self.bytes_read / elapsed if elapsed > 0 else None,
+            "write_bytes_per_s": self.bytes_written / elapsed if elapsed > 0 else None,
+            "eta": max(self.nr_tiles - self.tile_index, 0) / tiles_per_s if tiles_per_s else None
+        }
+        if self.callback is not None:
+            self.callback(progress_info)
+        return progress_info
+
+
+def get_nr_tiles(x_size, y_size, tile_size_x, tile_size_y):
+    """Returns number of tiles of raster x_size * y_size pixels (tiles at right and bottom edge can be smaller)."""
+    return -(-x_size // tile_size_x) * -(-y_size // tile_size_y)
+
+
+def format_progress(progress_info):
+    """Returns progress info (see Progress.tile_done) as one line of text."""
+    eta = progress_info["eta"]
+    return "{}Finished tile {} of {}{}, {:.1f} s elapsed, {} tiles/s, read {:.1f} MB, written {:.1f} MB, ETA {}".format(
+        "{}: ".format(progress_info["name"]) if progress_info["name"] is not None else "",
+        progress_info["tile_index"] + 1,
+        progress_info["nr_tiles"],
+        " (no_data)" if progress_info["skipped"] else "",
+        progress_info["elapsed"],
+        "-" if progress_info["tiles_per_s"] is None else "{:.3g}".format(progress_info["tiles_per_s"]),
+        progress_info["bytes_read"] / 1024 ** 2,
+        progress_info["bytes_written"] / 1024 ** 2,
+        "-" if eta is None else "{:.0f} s".format(eta)
+    )
+
+
+def print_progress(progress_info):
+    """Progress callback which prints progress info (see format_progress)."""
+    print(format_progress(progress_info))
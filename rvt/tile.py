@@ -17,11 +17,32 @@ Copyright:
     2010-2022 Research Centre of the Slovenian Academy of Sciences and Arts
     2016-2022 University of Ljubljana, Faculty of Civil and Geodetic Engineering
 """
+import contextlib
+import functools
+import inspect
+import os
 from pathlib import Path
-from typing import Callable, Dict, Any, Optional, Union, Tuple
+from typing import Callable, Dict, Any, List, Optional, Union, Tuple
 import numpy as np
-from osgeo import gdal
+from osgeo import gdal, gdal_array
+import rvt.cache
 import rvt.default
+import rvt.engine
+import rvt.profiling
+import rvt.progress
+
+# value of no_data (NaN) in 8bit visualizations (rvt.vis.byte_scale)
+_NO_DATA_8BIT = 255
+
+
+def _closing_raster_cache(function: Callable) -> Callable:
+    """Decorator of tile by tile functions, cached raster data sets (rvt.default.open_raster) are closed at the end of
+    run (see rvt.default._raster_cache_run)."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with rvt.default._raster_cache_run():
+            return function(*args, **kwargs)
+    return wrapper
 
 
 def _create_blank_raster(
@@ -30,21 +51,237 @@ def _create_blank_raster(
         nr_bands: int = 1,
         no_data: float = np.nan,
         e_type: int = 6,
+        overview_levels: Optional[List[int]] = None,
 ):
-    """Takes input data set and creates new raster. It copies input data set size, projection and geo info."""
+    """Takes input data set and creates new raster. It copies input data set size, projection and geo info. If
+    overview_levels are given, raster is tiled and has empty internal overviews (filled with _write_tile)."""
+    rvt.default.clear_raster_cache(out_raster_path.as_posix())  # cached data set of overwritten raster
     gtiff_driver = gdal.GetDriverByName("GTiff")
     band = in_data_set.GetRasterBand(1)
     x_size = band.XSize  # number of columns
     y_size = band.YSize  # number of rows
+    options = ["BIGTIFF=IF_NEEDED"]
+    if overview_levels:
+        options.append("TILED=YES")
     out_ds = gtiff_driver.Create(out_raster_path.as_posix(), xsize=x_size, ysize=y_size, bands=nr_bands, eType=e_type,
-                                 options=["BIGTIFF=IF_NEEDED"])
+                                 options=options)
     out_ds.SetProjection(in_data_set.GetProjection())
     out_ds.SetGeoTransform(in_data_set.GetGeoTransform())
     out_ds.GetRasterBand(1).SetNoDataValue(no_data)
+    if overview_levels:
+        out_ds.BuildOverviews("NONE", list(overview_levels))  # only allocates overviews, values are written per tile
     out_ds.FlushCache()
     out_ds = None
 
 
+def _get_overview_levels(x_size: int, y_size: int, tile_size_x: int, tile_size_y: int) -> List[int]:
+    """Overview decimation factors (2, 4, 8, ...) until overview is smaller than COG block (512 pixels). Factors have
+    to divide tile sizes, so that each tile covers whole overview pixels."""
+    overview_levels = []
+    factor = 2
+    while max(x_size, y_size) / (factor // 2) > 512 and tile_size_x % factor == 0 and tile_size_y % factor == 0:
+        overview_levels.append(factor)
+        factor *= 2
+    return overview_levels
+
+
+def _downsample_average(tile_arr: np.ndarray, factor: int, no_data: Optional[float] = None) -> np.ndarray:
+    """Averages (ignoring NaN and no_data) blocks of factor x factor pixels of 2D array, edge blocks can be smaller.
+    Blocks without valid pixels are NaN (no_data for integer arrays). Size of output is the same as size of GDAL
+    overview (rounded up)."""
+    rows, cols = tile_arr.shape
+    out_rows = -(-rows // factor)
+    out_cols = -(-cols // factor)
+    tile_pad_arr = np.full((out_rows * factor, out_cols * factor), np.nan, dtype=np.float64)
+    tile_pad_arr[:rows, :cols] = tile_arr
+    if no_data is not None and not np.isnan(no_data):
+        tile_pad_arr[tile_pad_arr == no_data] = np.nan
+    tile_pad_arr = tile_pad_arr.reshape(out_rows, factor, out_cols, factor)
+    idx_valid = ~np.isnan(tile_pad_arr)
+    with np.errstate(divide="ignore", invalid="ignore"):  # all NaN block is NaN
+        average_arr = np.nansum(tile_pad_arr, axis=(1, 3)) / idx_valid.sum(axis=(1, 3))
+    if np.issubdtype(tile_arr.dtype, np.integer):
+        if no_data is not None:
+            average_arr[np.isnan(average_arr)] = no_data
+        return np.round(average_arr).astype(tile_arr.dtype)
+    return average_arr.astype(tile_arr.dtype)
+
+
+def _get_band_no_data(band: gdal.Band) -> Tuple[np.dtype, Optional[float]]:
+    """Returns numpy data type of band and its no_data value cast to this data type. If band has no no_data value (or
+    it can't be stored in integer band, e.g. NaN), no_data is NaN for float bands, _NO_DATA_8BIT for 8bit bands and
+    None for other integer bands."""
+    dtype = np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
+    no_data = band.GetNoDataValue()
+    if no_data is not None and (np.issubdtype(dtype, np.floating) or not np.isnan(no_data)):
+        return dtype, dtype.type(no_data)
+    if np.issubdtype(dtype, np.floating):
+        return dtype, dtype.type(np.nan)
+    if band.DataType == gdal.GDT_Byte:
+        return dtype, dtype.type(_NO_DATA_8BIT)
+    return dtype, None
+
+
+def _write_tile(out_ds: gdal.Dataset, tile_arr: np.ndarray, x: int, y: int,
+                overview_levels: Optional[List[int]] = None) -> int:
+    """Writes tile (2D or 3D array, bands first) to out_ds at x, y, and its averages to overviews (overview_levels).
+    No_data pixels (NaN and no_data of band, see _get_band_no_data) are not averaged. Returns number of bytes of
+    tile."""
+    if tile_arr.ndim == 2:
+        tile_arr = tile_arr[np.newaxis]
+    no_data = _get_band_no_data(out_ds.GetRasterBand(1))[1]
+    with rvt.profiling.stage("write", nbytes=tile_arr.nbytes, npixels=tile_arr[0].size):
+        for i_band in range(tile_arr.shape[0]):
+            band = out_ds.GetRasterBand(i_band + 1)
+            band.WriteArray(tile_arr[i_band], x, y)
+            if overview_levels:
+                for i_overview, factor in enumerate(overview_levels):
+                    band.GetOverview(i_overview).WriteArray(_downsample_average(tile_arr[i_band], factor, no_data),
+                                                            x // factor, y // factor)
+    with rvt.profiling.stage("compress", nbytes=tile_arr.nbytes, npixels=tile_arr[0].size):
+        out_ds.FlushCache()
+    return tile_arr.nbytes
+
+
+def _write_no_data_tile(out_ds: gdal.Dataset, x: int, y: int, cols: int, rows: int,
+                        overview_levels: Optional[List[int]] = None) -> int:
+    """Writes no_data tile (cols x rows) to all bands of out_ds at x, y, without computing visualization. No_data is
+    no_data value of band in its data type (see _get_band_no_data), 0 for integer bands without no_data value.
+    Returns number of bytes of tile."""
+    dtype, no_data = _get_band_no_data(out_ds.GetRasterBand(1))
+    tile_arr = np.full((out_ds.RasterCount, rows, cols), 0 if no_data is None else no_data, dtype=dtype)
+    return _write_tile(out_ds=out_ds, tile_arr=tile_arr, x=x, y=y, overview_levels=overview_levels)
+
+
+def _finalize_cog(raster_path: Path) -> None:
+    """Converts tiled GeoTIFF with internal overviews (raster_path) to Cloud Optimized GeoTIFF (COG) layout, existing
+    overviews are copied (not recalculated)."""
+    cog_path = raster_path.with_name(raster_path.stem + "_cog_tmp" + raster_path.suffix)
+    with rvt.profiling.stage("compress"):
+        gdal.Translate(cog_path.as_posix(), raster_path.as_posix(), format="COG",
+                       creationOptions=["COMPRESS=LZW", "BIGTIFF=IF_NEEDED", "OVERVIEWS=FORCE_USE_EXISTING"])
+    rvt.default.clear_raster_cache(raster_path.as_posix())
+    os.replace(cog_path.as_posix(), raster_path.as_posix())
+
+
+def _release_tile_buffers(buffer_pool: rvt.engine.BufferPool, *visualization_arrays: Any) -> None:
+    """
+    Releases visualization arrays (output of tile, arrays or dictionaries of arrays) back to buffer_pool, so they are
+    reused for the next tile. Arrays which weren't taken from buffer_pool (e.g. cached visualization) are skipped. After the first tile pool size is limited to arrays of three tile shapes (first, inner
+    and last tile in a row).
+    """
+    for visualization_array in visualization_arrays:
+        if isinstance(visualization_array, dict):
+            buffer_pool.release(*visualization_array.values())
+        elif isinstance(visualization_array, np.ndarray):
+            buffer_pool.release(visualization_array)
+    if buffer_pool.max_nbytes is None:
+        buffer_pool.max_nbytes = 3 * buffer_pool.nbytes
+
+
+def _get_tile_offsets(start: int, size: int, overlap: int, dem_size: int) -> Tuple[int, int]:
+    """Overlap (offset) before and after tile (start, size) in one direction, smaller at DEM edges."""
+    return min(start, overlap), min(dem_size - start - size, overlap)
+
+
+def _is_no_data_arr(arr: np.ndarray, no_data: Optional[float]) -> bool:
+    """True if all values of arr are no_data (or NaN)."""
+    if no_data is None or np.isnan(no_data):
+        return bool(np.isnan(arr).all())
+    return bool(np.logical_or(arr == no_data, np.isnan(arr)).all())
+
+
+def _is_empty_window(band: gdal.Band, window: Tuple[int, int, int, int]) -> bool:
+    """True if GDAL knows (without reading pixels) that window of band is empty (e.g. not written blocks of sparse
+    GeoTIFF), empty blocks are read as no_data. False if it is unknown or band has no no_data value."""
+    if band.GetNoDataValue() is None or band.GetMaskFlags() & gdal.GMF_ALL_VALID:
+        return False
+    status = band.GetDataCoverageStatus(*window)[0]
+    return status == gdal.GDAL_DATA_COVERAGE_STATUS_EMPTY
+
+
+def _iterate_tiles(
+        dem_ds: gdal.Dataset,
+        overlap: int,
+        tile_size_x: int,
+        tile_size_y: int,
+        buffer_pool: Optional[rvt.engine.BufferPool] = None,
+        streaming: bool = False,
+        skip_no_data: bool = False,
+        progress: Optional[rvt.progress.Progress] = None
+):
+    """
+    Yields tiles of dem_ds row by row as (x, y, (left_offset, right_offset, top_offset, bottom_offset), tile_array),
+    where tile_array is tile with overlap (offsets) in float data type (rvt.engine.get_float_dtype()), taken from
+    buffer_pool. If streaming, rows of current strip (row of tiles) with overlap are kept in memory (band) and for
+    next strip only rows which are not in band yet are read, overlap rows are reused. Each DEM pixel is then read
+    only once, instead of reading overlap of each tile from raster again.
+    If skip_no_data, tile_array is None for tiles where all pixels (without overlap) are no_data. Empty tiles of
+    sparse rasters are detected from GDAL data coverage without reading them, other tiles are checked after reading.
+    Profiling stages (rvt.profiling) of each tile are labeled with tile (x, y). If progress is not None, bytes read are
+    added to it.
+    """
+    x_size = dem_ds.RasterXSize  # number of columns
+    y_size = dem_ds.RasterYSize  # number of rows
+    float_dtype = rvt.engine.get_float_dtype()
+    dem_band = dem_ds.GetRasterBand(1)
+    no_data = dem_band.GetNoDataValue()
+    band_arr = None  # rows band_start:band_end of DEM (streaming)
+    band_start = 0
+    band_end = 0
+    with rvt.profiling.labels(tile=None):  # restored also if generator is closed before the last tile
+        for y in range(0, y_size, tile_size_y):
+            rows = min(tile_size_y, y_size - y)
+            top_offset, bottom_offset = _get_tile_offsets(y, rows, overlap, y_size)
+            strip_start = y - top_offset
+            strip_end = y + rows + bottom_offset
+            if streaming:
+                rvt.profiling.set_labels(tile=(0, y))  # band is read with the first tile of strip
+                if band_arr is None:
+                    band_arr = np.empty((min(tile_size_y + 2 * overlap, y_size), x_size), dtype=float_dtype)
+                # move rows of previous strip which are also in this strip (overlap) to the top of band, read the rest
+                nr_kept_rows = max(band_end - strip_start, 0)
+                if nr_kept_rows > 0:
+                    band_arr[:nr_kept_rows] = band_arr[strip_start - band_start:band_end - band_start]
+                rvt.default.read_data_set_arr(
+                    data_set=dem_ds,
+                    window=(0, strip_start + nr_kept_rows, x_size, strip_end - strip_start - nr_kept_rows),
+                    out=band_arr[nr_kept_rows:strip_end - strip_start]
+                )
+                if progress is not None:
+                    progress.add_read(band_arr[nr_kept_rows:strip_end - strip_start].nbytes)
+                band_start = strip_start
+                band_end = strip_end
+            for x in range(0, x_size, tile_size_x):
+                cols = min(tile_size_x, x_size - x)
+                rvt.profiling.set_labels(tile=(x, y))
+                left_offset, right_offset = _get_tile_offsets(x, cols, overlap, x_size)
+                tile_offsets = (left_offset, right_offset, top_offset, bottom_offset)
+                if skip_no_data and not streaming and _is_empty_window(dem_band, (x, y, cols, rows)):
+                    yield x, y, tile_offsets, None
+                    continue
+                tile_shape = (strip_end - strip_start, cols + left_offset + right_offset)
+                tile_array = rvt.engine.get_buffer(buffer_pool, tile_shape, float_dtype)
+                if streaming:
+                    # copy, visualization functions can change input DEM
+                    np.copyto(tile_array, band_arr[:strip_end - strip_start, x - left_offset:x + cols + right_offset])
+                else:
+                    rvt.default.read_data_set_arr(
+                        data_set=dem_ds,
+                        window=(x - left_offset, strip_start, tile_shape[1], tile_shape[0]),
+                        out=tile_array
+                    )
+                    if progress is not None:
+                        progress.add_read(tile_array.nbytes)
+                tile_core = tile_array[top_offset:top_offset + rows, left_offset:left_offset + cols]
+                if skip_no_data and _is_no_data_arr(tile_core, no_data):
+                    rvt.engine.release_buffer(buffer_pool, tile_array)
+                    yield x, y, tile_offsets, None
+                    continue
+                yield x, y, tile_offsets, tile_array
+
+
+@_closing_raster_cache
 def save_visualization_tile_by_tile(
         visualization_function: Callable,
         function_parameters: Optional[Dict[str, Optional[Any]]],
@@ -56,12 +293,18 @@ def save_visualization_tile_by_tile(
         out_raster_nr_of_bands: int = 1,
         out_raster_e_type: int = 6,
         out_visualization_dict_key: Optional[str] = None,
+        cog: bool = False,
+        cache: Optional[rvt.cache.VisualizationCache] = None,
+        streaming: bool = False,
+        skip_no_data: bool = False,
+        progress_callback: Optional[Callable] = None
 ) -> None:
     """
     Some DEMs are too large to load them into memory. This function reads dem raster tile by tile,
     calculates visualization on it tile by tile and than saves calculated visualization tile by tile in out raster.
     Note that visualization_function needs dem parameter but it shouldn't be inputted in function_parameters because it
-    is read tile_by_tile from dem_path.
+    is read tile_by_tile from dem_path. If visualization_function has buffer_pool parameter (rvt.engine.BufferPool),
+    arrays are reused between tiles.
 
     Parameters
     ----------
@@ -94,6 +337,23 @@ def save_visualization_tile_by_tile(
         to define result 2D numpy array in dictionary.
         For example rvt.visualization.slope_aspect outputs dictionary with keys "slope" and "aspect".
         To select slope set this parameter to "slope".
+    cog : bool
+        If True, output is Cloud Optimized GeoTIFF (COG). Overviews are averaged from each tile when it is written (no
+        extra reading of output), tile sizes should be divisible by overview factors (powers of 2).
+    cache : rvt.cache.VisualizationCache
+        If not None, visualization of each tile is taken from cache (or computed and stored in it), key is content of
+        tile (with overlap), visualization function and function_parameters.
+    streaming : bool
+        If True, DEM rows of current row of tiles (with overlap) are kept in memory and only new rows are read for next
+        row of tiles, so each DEM pixel is read once (overlap is not read again for each tile). Needs memory for
+        tile_size_y + 2 * overlap rows of whole DEM width.
+    skip_no_data : bool
+        If True, visualization is not computed for tiles where all DEM pixels are no_data, no_data of out raster is
+        written instead. Visualization function has to return no_data where dem is no_data (all rvt.vis functions
+        return NaN), otherwise output differs from computed tiles.
+    progress_callback : Optional[Callable]
+        If not None, it is called after each tile with progress info (dict with tile index, window, elapsed time,
+        tiles per second, bytes read and written and ETA, see rvt.progress.Progress.tile_done).
 
     Returns
     -------
@@ -105,7 +365,7 @@ def save_visualization_tile_by_tile(
         Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
                   " it needs to be bigger than 50 pixels!")
 
-    dem_ds = gdal.Open(dem_path.as_posix())
+    dem_ds = rvt.default.open_raster(dem_path.as_posix())
     gt = dem_ds.GetGeoTransform()
     x_res = gt[1]  # x_resolution
     y_res = -gt[5]  # y_resolution
@@ -128,57 +388,50 @@ def save_visualization_tile_by_tile(
         if function_parameters["no_data"] is None:
             function_parameters["no_data"] = no_data
 
+    overview_levels = _get_overview_levels(x_size, y_size, tile_size_x, tile_size_y) if cog else None
     _create_blank_raster(in_data_set=dem_ds, out_raster_path=out_raster_path, nr_bands=out_raster_nr_of_bands,
-                         e_type=out_raster_e_type)
-
-    for y in range(0, y_size, tile_size_y):
-        if y + tile_size_y < y_size:  # if rows overlap
-            rows = tile_size_y
-        else:
-            rows = y_size - y
-        for x in range(0, x_size, tile_size_x):
-            if x + tile_size_x < x_size:  # if cols overlap
-                cols = tile_size_x
-            else:
-                cols = x_size - x
-
-            # get offset for each tile, check edges
-            left_offset = 0
-            right_offset = 0
-            top_offset = 0
-            bottom_offset = 0
-            if x != 0:  # left offset
-                if x - overlap < 0:  # left overlap
-                    left_offset = x
-                else:
-                    left_offset = overlap
-            if x + cols != x_size:  # right offset
-                if x + cols + overlap > x_size:  # right overlap
-                    right_offset = x_size - x - cols
-                else:
-                    right_offset = overlap
-            if y != 0:  # apply top offset
-                if y - overlap < 0:  # top overlap
-                    top_offset = y
-                else:
-                    top_offset = overlap
-            if y + rows != y_size:  # bottom offset
-                if y + rows + overlap > y_size:  # bottom overlap
-                    bottom_offset = y_size - y - rows
-                else:
-                    bottom_offset = overlap
-
-            # read tile
-            x_off = x - left_offset
-            y_off = y - top_offset
-            cols_off = cols + left_offset + right_offset
-            rows_off = rows + top_offset + bottom_offset
-
-            tile_array = np.array(dem_ds.GetRasterBand(1).ReadAsArray(x_off, y_off, cols_off, rows_off))
-            if function_parameters is not None:
-                visualization_array = visualization_function(dem=tile_array, **function_parameters)
-            else:
-                visualization_array = visualization_function(dem=tile_array)
+                         e_type=out_raster_e_type, overview_levels=overview_levels)
+
+    # reuse arrays between tiles (if visualization function supports it)
+    tile_function_parameters = dict(function_parameters) if function_parameters is not None else {}
+    buffer_pool = None
+    if "buffer_pool" in inspect.signature(visualization_function).parameters and \
+            tile_function_parameters.get("buffer_pool") is None:
+        buffer_pool = rvt.engine.BufferPool()
+        tile_function_parameters["buffer_pool"] = buffer_pool
+    if cache is not None:
+        cache_visualization_name = "{}.{}".format(visualization_function.__module__,
+                                                  visualization_function.__qualname__)
+        cache_parameters = {name: value for name, value in tile_function_parameters.items()
+                            if name != "buffer_pool"}
+    progress = rvt.progress.Progress(nr_tiles=rvt.progress.get_nr_tiles(x_size, y_size, tile_size_x, tile_size_y),
+                                     callback=progress_callback, name=visualization_function.__name__)
+    tiles = _iterate_tiles(dem_ds=dem_ds, overlap=overlap, tile_size_x=tile_size_x, tile_size_y=tile_size_y,
+                           buffer_pool=buffer_pool, streaming=streaming, skip_no_data=skip_no_data, progress=progress)
+
+    # labels are restored (and tiles closed) also if computation of tile fails
+    with rvt.profiling.labels(visualization=visualization_function.__name__), contextlib.closing(tiles):
+        for x, y, tile_offsets, tile_array in tiles:
+            left_offset, right_offset, top_offset, bottom_offset = tile_offsets
+            window = (x, y, min(tile_size_x, x_size - x), min(tile_size_y, y_size - y))
+            if tile_array is None:  # all pixels are no_data, visualization is not computed
+                out_ds = gdal.Open(out_raster_path.as_posix(), gdal.GA_Update)
+                progress.add_written(_write_no_data_tile(out_ds=out_ds, x=x, y=y, cols=window[2], rows=window[3],
+                                                         overview_levels=overview_levels))
+                out_ds = None
+                progress.tile_done(window=window, skipped=True)
+                continue
+            visualization_out = None
+            if cache is not None:
+                cache_key = cache.key(dem=tile_array, visualization=cache_visualization_name,
+                                      parameters=cache_parameters)
+                visualization_out = cache.get(cache_key)
+            if visualization_out is None:
+                with rvt.profiling.stage("compute", nbytes=tile_array.nbytes, npixels=tile_array.size):
+                    visualization_out = visualization_function(dem=tile_array, **tile_function_parameters)
+                if cache is not None:
+                    cache.put(cache_key, visualization_out)
+            visualization_array = visualization_out
 
             if out_visualization_dict_key is not None:
                 visualization_array = visualization_array[out_visualization_dict_key]
@@ -205,16 +458,15 @@ def save_visualization_tile_by_tile(
 
             # write tile
             out_ds = gdal.Open(out_raster_path.as_posix(), gdal.GA_Update)
-            if out_raster_nr_of_bands == 1:  # one band
-                out_ds.GetRasterBand(1).WriteArray(visualization_array, x, y)
-                out_ds.FlushCache()
-            else:  # multiple bands
-                for i_band in range(out_raster_nr_of_bands):
-                    band = i_band + 1
-                    out_ds.GetRasterBand(band).WriteArray(visualization_array[i_band], x, y)
-                    out_ds.FlushCache()
+            progress.add_written(_write_tile(out_ds=out_ds, tile_arr=visualization_array, x=x, y=y,
+                                             overview_levels=overview_levels))
             out_ds = None
+            if buffer_pool is not None:
+                _release_tile_buffers(buffer_pool, tile_array, visualization_out)
+            progress.tile_done(window=window)
     dem_ds = None
+    if cog:
+        _finalize_cog(out_raster_path)
 
 
 def _create_rvt_visualization_blank_raster(
@@ -224,7 +476,8 @@ def _create_rvt_visualization_blank_raster(
         output_dir_path: Path,
         dem_ds: gdal.Dataset,
         save_float: bool,
-        save_8bit: bool
+        save_8bit: bool,
+        overview_levels: Optional[List[int]] = None
 ) -> None:
     """"Create blank raster or rasters for rvt_visualization to later store visualization in it tile by tile."""
     if save_float:
@@ -241,7 +494,8 @@ def _create_rvt_visualization_blank_raster(
             in_data_set=dem_ds,
             out_raster_path=out_float_path,
             nr_bands=nr_bands,
-            e_type=6)
+            e_type=6,
+            overview_levels=overview_levels)
     if save_8bit:
         out_8bit_path = rvt_default.get_visualization_path(
             rvt_visualization=rvt_visualization,
@@ -257,7 +511,8 @@ def _create_rvt_visualization_blank_raster(
             in_data_set=dem_ds,
             out_raster_path=out_8bit_path,
             nr_bands=nr_bands,
-            e_type=1)
+            e_type=1,
+            overview_levels=overview_levels)
 
 
 def _get_rvt_visualization_overlap(
@@ -291,18 +546,23 @@ def _get_rvt_visualization_overlap(
         return int(rvt_default.mstp_broad_scale[1])
 
 
+@_closing_raster_cache
 def save_rvt_visualization_tile_by_tile(
         rvt_visualization: "rvt.default.RVTVisualization",
         rvt_default: "rvt.default.DefaultValues",
         dem_path: Path,
         output_dir_path: Optional[Path] = None,
         save_float: bool = True,
-        save_8bit: bool = False
+        save_8bit: bool = False,
+        progress_callback: Optional[Callable] = None
 ) -> None:
     """
     Some DEMs are too large to load them into memory. This function reads dem raster tile by tile,
     calculates RVT visualization on it tile by tile and than saves calculated visualization tile by tile in out raster.
     This function can silmultaniously store float and 8bit version of visualization (where possible).
+    Tile size and number of parallel jobs (row bands of each tile) are taken from rvt_default.get_tile_size(), if
+    rvt_default.tile_streaming is True, overlap rows are kept in memory and each DEM pixel is read once. Tiles where
+    all DEM pixels are no_data are not computed, no_data is written directly.
 
     Parameters
     ----------
@@ -318,6 +578,10 @@ def save_rvt_visualization_tile_by_tile(
         If save float.
     save_8bit : bool
         If save 8bit.
+    progress_callback : Optional[Callable]
+        If not None, it is called after each tile with progress info (dict with tile index, window, elapsed time,
+        tiles per second, bytes read and written and ETA, see rvt.progress.Progress.tile_done). If None,
+        rvt_default.tile_progress_callback is used.
 
     Returns
     -------
@@ -328,17 +592,10 @@ def save_rvt_visualization_tile_by_tile(
     if not dem_path.exists():
         Exception("rvt.tile.save_visualization_tile_by_tile: Input dem path does not exist!")
 
-    tile_size_x = rvt_default.tile_size[0]
-    tile_size_y = rvt_default.tile_size[1]
-
-    if tile_size_x < 50 or tile_size_y < 50:
-        Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
-                  " it needs to be bigger than 50 pixels!")
-
     if output_dir_path is None:
         output_dir_path = dem_path.parent
 
-    dem_ds = gdal.Open(dem_path.as_posix())
+    dem_ds = rvt.default.open_raster(dem_path.as_posix())
     gt = dem_ds.GetGeoTransform()
     x_res = gt[1]  # x_resolution
     y_res = -gt[5]  # y_resolution
@@ -347,6 +604,15 @@ def save_rvt_visualization_tile_by_tile(
     x_size = band.XSize  # number of columns
     y_size = band.YSize  # number of rows
 
+    # tile size and parallel jobs (row bands) of each tile, chosen with cost model if rvt_default.tile_size is "auto"
+    tile_size_x, tile_size_y, n_jobs = rvt_default.get_tile_size(rvt_visualization, x_size, y_size)
+
+    if tile_size_x < 50 or tile_size_y < 50:
+        Exception("rvt.tile.save_visualization_tile_by_tile: Tile size too small (tile_size_x, tile_size_y),"
+                  " it needs to be bigger than 50 pixels!")
+
+    # COG output, overviews are written tile by tile
+    overview_levels = _get_overview_levels(x_size, y_size, tile_size_x, tile_size_y) if rvt_default.cog else None
     _create_rvt_visualization_blank_raster(
         rvt_visualization=rvt_visualization,
         rvt_default=rvt_default,
@@ -354,55 +620,41 @@ def save_rvt_visualization_tile_by_tile(
         output_dir_path=output_dir_path,
         dem_ds=dem_ds,
         save_float=save_float,
-        save_8bit=save_8bit
+        save_8bit=save_8bit,
+        overview_levels=overview_levels
     )
 
     overlap = _get_rvt_visualization_overlap(rvt_visualization=rvt_visualization, rvt_default=rvt_default)
 
-    for y in range(0, y_size, tile_size_y):
-        if y + tile_size_y < y_size:  # if rows overlap
-            rows = tile_size_y
-        else:
-            rows = y_size - y
-        for x in range(0, x_size, tile_size_x):
-            if x + tile_size_x < x_size:  # if cols overlap
-                cols = tile_size_x
-            else:
-                cols = x_size - x
-
-            # get offset for each tile, check edges
-            left_offset = 0
-            right_offset = 0
-            top_offset = 0
-            bottom_offset = 0
-            if x != 0:  # left offset
-                if x - overlap < 0:  # left overlap
-                    left_offset = x
-                else:
-                    left_offset = overlap
-            if x + cols != x_size:  # right offset
-                if x + cols + overlap > x_size:  # right overlap
-                    right_offset = x_size - x - cols
-                else:
-                    right_offset = overlap
-            if y != 0:  # apply top offset
-                if y - overlap < 0:  # top overlap
-                    top_offset = y
-                else:
-                    top_offset = overlap
-            if y + rows != y_size:  # bottom offset
-                if y + rows + overlap > y_size:  # bottom overlap
-                    bottom_offset = y_size - y - rows
-                else:
-                    bottom_offset = overlap
-
-            # read tile
-            x_off = x - left_offset
-            y_off = y - top_offset
-            cols_off = cols + left_offset + right_offset
-            rows_off = rows + top_offset + bottom_offset
-
-            tile_array = np.array(dem_ds.GetRasterBand(1).ReadAsArray(x_off, y_off, cols_off, rows_off))
+    # reuse arrays between tiles
+    buffer_pool = rvt.engine.BufferPool()
+    if progress_callback is None:
+        progress_callback = rvt_default.tile_progress_callback
+    progress = rvt.progress.Progress(nr_tiles=rvt.progress.get_nr_tiles(x_size, y_size, tile_size_x, tile_size_y),
+                                     callback=progress_callback, name=rvt_visualization.value)
+    tiles = _iterate_tiles(dem_ds=dem_ds, overlap=overlap, tile_size_x=tile_size_x, tile_size_y=tile_size_y,
+                           buffer_pool=buffer_pool, streaming=rvt_default.tile_streaming, skip_no_data=True,
+                           progress=progress)
+
+    # labels are restored (and tiles closed) also if computation of tile fails
+    with rvt.profiling.labels(visualization=rvt_visualization.value), contextlib.closing(tiles):
+        for x, y, tile_offsets, tile_array in tiles:
+            left_offset, right_offset, top_offset, bottom_offset = tile_offsets
+            window = (x, y, min(tile_size_x, x_size - x), min(tile_size_y, y_size - y))
+            if tile_array is None:  # all pixels are no_data, visualization is not computed
+                for save, path_8bit in ((save_float, False), (save_8bit, True)):
+                    if save:
+                        out_ds = gdal.Open(rvt_default.get_visualization_path(
+                            rvt_visualization=rvt_visualization,
+                            dem_path=dem_path,
+                            output_dir_path=output_dir_path,
+                            path_8bit=path_8bit
+                        ).as_posix(), gdal.GA_Update)
+                        progress.add_written(_write_no_data_tile(out_ds=out_ds, x=x, y=y, cols=window[2],
+                                                                 rows=window[3], overview_levels=overview_levels))
+                        out_ds = None
+                progress.tile_done(window=window, skipped=True)
+                continue
 
             visualization_float_arr, visualization_8bit_arr = rvt_default.calculate_visualization(
                 visualization=rvt_visualization,
@@ -411,8 +663,11 @@ def save_rvt_visualization_tile_by_tile(
                 resolution_y=y_res,
                 no_data=no_data,
                 save_float=save_float,
-                save_8bit=save_8bit
+                save_8bit=save_8bit,
+                n_jobs=n_jobs,
+                buffer_pool=buffer_pool
             )
+            visualization_float_out = visualization_float_arr
 
             # remove offset from visualization block
             if save_float:
@@ -472,14 +727,8 @@ def save_rvt_visualization_tile_by_tile(
                     path_8bit=False
                 )
                 out_ds_float = gdal.Open(out_visualization_float_path.as_posix(), gdal.GA_Update)
-                if visualization_float_arr.ndim == 2:
-                    out_ds_float.GetRasterBand(1).WriteArray(visualization_float_arr, x, y)
-                    out_ds_float.FlushCache()
-                else:
-                    for i_band in range(visualization_float_arr.shape[0]):
-                        band = i_band + 1
-                        out_ds_float.GetRasterBand(band).WriteArray(visualization_float_arr[i_band], x, y)
-                        out_ds_float.FlushCache()
+                progress.add_written(_write_tile(out_ds=out_ds_float, tile_arr=visualization_float_arr, x=x, y=y,
+                                                 overview_levels=overview_levels))
                 out_ds_float = None
             if save_8bit:  # multiple bands
                 out_visualization_8bit_path = rvt_default.get_visualization_path(
@@ -489,14 +738,19 @@ def save_rvt_visualization_tile_by_tile(
                     path_8bit=True
                 )
                 out_ds_8bit = gdal.Open(out_visualization_8bit_path.as_posix(), gdal.GA_Update)
-                if visualization_8bit_arr.ndim == 2:
-                    out_ds_8bit.GetRasterBand(1).WriteArray(visualization_8bit_arr, x, y)
-                    out_ds_8bit.FlushCache()
-                else:
-                    for i_band in range(visualization_8bit_arr.shape[0]):
-                        band = i_band + 1
-                        out_ds_8bit.GetRasterBand(band).WriteArray(visualization_8bit_arr[i_band], x, y)
-                        out_ds_8bit.FlushCache()
+                progress.add_written(_write_tile(out_ds=out_ds_8bit, tile_arr=visualization_8bit_arr, x=x, y=y,
+                                                 overview_levels=overview_levels))
                 out_ds_8bit = None
+            _release_tile_buffers(buffer_pool, tile_array, visualization_float_out)
+            progress.tile_done(window=window)
 
     dem_ds = None
+    if rvt_default.cog:
+        for save, path_8bit in ((save_float, False), (save_8bit, True)):
+            if save:
+                _finalize_cog(rvt_default.get_visualization_path(
+                    rvt_visualization=rvt_visualization,
+                    dem_path=dem_path,
+                    output_dir_path=output_dir_path,
+                    path_8bit=path_8bit
+                ))
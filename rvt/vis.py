@@ -19,18 +19,29 @@ Copyright:
 """
 
 # python libraries
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
+import rvt.engine
+import rvt.profiling
 from scipy.interpolate import griddata, RectBivariateSpline
 from scipy.ndimage.morphology import distance_transform_edt
 from scipy.spatial import cKDTree
 
+try:
+    import dask.array
+except ImportError:
+    dask = None
+
 
 def byte_scale(data,
                c_min=None,
                c_max=None,
                high=255,
                low=0,
-               no_data=None
+               no_data=None,
+               out=None
                ):
     """
     Remade old scipy function.
@@ -38,80 +49,92 @@ def byte_scale(data,
 
     Byte scaling means converting the input image to uint8 dtype and scaling
     the range to ``(low, high)`` (default 0-255).
+    Input array is not changed, all bands are scaled at once.
 
     Parameters
     ----------
     data : numpy.ndarray
         Input data (visualization) as 2D or multi-D numpy array.
     c_min : int or float
-        Scalar, Bias scaling of small values. Default is ``data.min()``.
+        Scalar, Bias scaling of small values. Default is ``data.min()`` (of each band).
     c_max : int or float
-        Scalar, Bias scaling of large values. Default is ``data.max()``.
+        Scalar, Bias scaling of large values. Default is ``data.max()`` (of each band).
     high : int
         Scalar, Scale max value to `high`.  Default is 255.
     low : int
         Scalar, Scale min value to `low`.  Default is 0.
     no_data : int or float
-        Value that represents no_data, it is changed to np.nan .
+        Value that represents no_data, it is treated as np.nan .
+    out : numpy.ndarray
+        Optional uint8 array of the same shape as data to store the result into.
 
     Returns
     -------
     img_array : uint8 numpy.ndarray
         The byte-scaled array.
     """
-    is_2d_arr = False
-    data_bands = data
-    if len(data.shape) == 2:
-        is_2d_arr = True
-        data_bands = np.array([data])
-
-    c_min_orig = c_min
-    c_max_orig = c_max
-
-    byte_data_bands = []
-    for i_band in data_bands:
-        data = i_band
-        c_min = c_min_orig
-        c_max = c_max_orig
-        if high < low:
-            raise ValueError("`high` should be larger than `low`.")
-
-        if no_data is not None:  # change no data to np.nan
-            data[data == no_data] = np.nan
+    if high < low:
+        raise ValueError("`high` should be larger than `low`.")
+    if out is None:
+        out = np.empty(data.shape, dtype=np.uint8)
+    elif out.shape != data.shape or out.dtype != np.uint8:
+        raise ValueError("`out` should be uint8 array of the same shape as `data`.")
+
+    # no_data mask, no_data is changed to np.nan in the scaled (working) array
+    if no_data is not None and not np.isnan(no_data):
+        no_data_mask = data == no_data
+    else:
+        no_data_mask = None
 
+    # Min and max of each band (last two axes)
+    if c_min is None or c_max is None:
+        band_axes = (-2, -1) if data.ndim > 1 else None
+        data_valid = data if no_data_mask is None else np.where(no_data_mask, np.nan, data)
         if c_min is None:
-            c_min = np.nanmin(data)
+            c_min = np.nanmin(data_valid, axis=band_axes, keepdims=True)
         if c_max is None:
-            c_max = np.nanmax(data)
-
-        c_scale = c_max - c_min
-        if c_scale < 0:
-            raise ValueError("`cmax` should be larger than `cmin`.")
-        elif c_scale == 0:
-            c_scale = 1
-
-        if data.dtype == np.uint8:
-            # TODO: the following line seems not good to  me - if cmin=0, then that pixel will get negative value
-            byte_data = (high + 1) * (data - c_min - 1) / (c_max - c_min)  # copied from IDL BYTSCL
-            byte_data[byte_data > high] = high
-            byte_data[byte_data < 0] = 0
-            byte_data[np.isnan(byte_data)] = 0  # change no_data to 0
-            return np.cast[np.uint8](byte_data) + np.cast[np.uint8](low)
-
+            c_max = np.nanmax(data_valid, axis=band_axes, keepdims=True)
+        del data_valid
+    c_scale = np.asarray(c_max, dtype=np.float32) - np.asarray(c_min, dtype=np.float32)
+    if np.any(c_scale < 0):
+        raise ValueError("`cmax` should be larger than `cmin`.")
+    c_scale = np.where(c_scale == 0, np.float32(1), c_scale)
+
+    if data.dtype == np.uint8:
+        # TODO: the following line seems not good to  me - if cmin=0, then that pixel will get negative value
+        # copied from IDL BYTSCL: (high + 1) * (data - c_min - 1) / (c_max - c_min)
+        offset = np.asarray(c_min, dtype=np.float32) + 1
+        high_scale = high + 1
+    else:
         # scale = float(high - low) / cscale  # old scipy fn
         # byte_data = (data * 1.0 - cmin) * scale + 0.4999  # old scipy fn
+        # copied from IDL BYTSCL: (high + 0.9999) * (data - c_min) / (c_max - c_min)
+        offset = np.asarray(c_min, dtype=np.float32)
+        high_scale = high + 0.9999
+
+    # Single working array for all bands
+    byte_data = np.subtract(data, offset, dtype=np.float32)
+    byte_data *= high_scale
+    byte_data /= c_scale
+    if no_data_mask is not None:
+        byte_data[no_data_mask] = np.nan
+    np.clip(byte_data, 0, high, out=byte_data)  # NaN stays NaN
+    if data.dtype == np.uint8:
+        np.fmax(byte_data, 0, out=byte_data)  # change no_data to 0
+    else:
+        np.fmin(byte_data, 255, out=byte_data)  # change no_data to 255
+    np.copyto(out, byte_data, casting="unsafe")
+    if low != 0:
+        np.add(out, low, out=out, casting="unsafe")
+
+    return out
 
-        byte_data = (high + 0.9999) * (data - c_min) / (c_max - c_min)  # copied from IDL BYTSCL
-        byte_data[byte_data > high] = high
-        byte_data[byte_data < 0] = 0
-        byte_data[np.isnan(byte_data)] = 255  # change no_data to 255
-        byte_data = np.cast[np.uint8](byte_data) + np.cast[np.uint8](low)
-        byte_data_bands.append(byte_data)
 
-    if is_2d_arr:  # if only one band
-        return byte_data_bands[0]
-    else:  # multiple bands
-        return np.array(byte_data_bands)
+def _no_data_to_nan(dem, no_data):
+    """Changes no_data values of dem to np.nan (in place)."""
+    if no_data is not None:
+        with rvt.profiling.stage("nan", nbytes=dem.nbytes, npixels=dem.size):
+            dem[dem == no_data] = np.nan
 
 
 def slope_aspect(dem,
@@ -154,6 +177,9 @@ def slope_aspect(dem,
         slope_out, slope gradient : 2D numpy array (numpy.ndarray) of slope;
         aspect_out, aspect : 2D numpy array (numpy.ndarray) of aspect.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(slope_aspect, dem, function_parameters=_dask_function_parameters(locals()),
+                                out_keys=("slope", "aspect"))
     if dem.ndim != 2:
         raise Exception("rvt.visualization.slope_aspect: dem has to be 2D np.array!")
     if not (10000 >= ve_factor >= -10000):
@@ -162,11 +188,10 @@ def slope_aspect(dem,
         raise Exception("rvt.visualization.slope_aspect: resolution must be a positive number!")
 
     # Make sure array has the correct dtype!
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
 
     # Change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
     # Save NaN mask
     nan_dem = np.isnan(dem)
@@ -175,20 +200,30 @@ def slope_aspect(dem,
     dem = np.pad(array=dem, pad_width=1, mode="edge")
 
     # Vertical exaggeration
-    dem = dem * ve_factor
-
-    # Derivatives in X and Y direction
-    dzdx = ((roll_fill_nans(dem, 1, axis=1) - roll_fill_nans(dem, -1, axis=1)) / 2) / resolution_x
-    dzdy = ((roll_fill_nans(dem, -1, axis=0) - roll_fill_nans(dem, 1, axis=0)) / 2) / resolution_y
-    tan_slope = np.sqrt(dzdx ** 2 + dzdy ** 2)
+    if ve_factor != 1:
+        dem *= ve_factor
+
+    # Derivatives in X and Y direction, central differences on slices of the padded array
+    dzdx = np.empty(nan_dem.shape, dtype=dem.dtype)
+    dzdy = np.empty(nan_dem.shape, dtype=dem.dtype)
+    if nan_dem.any():
+        nan_dem_pad = np.isnan(dem)
+    else:
+        nan_dem_pad = None
+    _central_difference(dem, nan_dem_pad, axis=1, out=dzdx)
+    _central_difference(dem, nan_dem_pad, axis=0, out=dzdy)
+    dzdx /= 2 * resolution_x
+    dzdy /= -2 * resolution_y  # rows increase towards South
 
     # Compute slope
+    slope_out = np.hypot(dzdx, dzdy)  # tangent of slope
     if output_units == "percent":
-        slope_out = tan_slope * 100
+        slope_out *= 100
     elif output_units == "degree":
-        slope_out = np.rad2deg(np.arctan(tan_slope))
+        np.arctan(slope_out, out=slope_out)
+        np.rad2deg(slope_out, out=slope_out)
     elif output_units == "radian":
-        slope_out = np.arctan(tan_slope)
+        np.arctan(slope_out, out=slope_out)
     else:
         raise Exception("rvt.visualization.calculate_slope: Wrong function input 'output_units'!")
 
@@ -197,14 +232,11 @@ def slope_aspect(dem,
     #     0
     # 270    90
     #    180
-    dzdy[dzdy == 0] = 10e-9  # important for numeric stability - where dzdy is zero, make tangent to really high value
-    aspect_out = np.arctan2(dzdx, dzdy)  # atan2 took care of the quadrants
+    # important for numeric stability - where dzdy is zero, make tangent to really high value
+    np.copyto(dzdy, 10e-9, where=(dzdy == 0))
+    aspect_out = np.arctan2(dzdx, dzdy, out=dzdx)  # atan2 took care of the quadrants
     if output_units == "degree":
-        aspect_out = np.rad2deg(aspect_out)
-
-    # Remove padding
-    aspect_out = aspect_out[1:-1, 1:-1]
-    slope_out = slope_out[1:-1, 1:-1]
+        np.rad2deg(aspect_out, out=aspect_out)
 
     # Apply NaN mask
     slope_out[nan_dem] = np.nan
@@ -213,6 +245,36 @@ def slope_aspect(dem,
     return {"slope": slope_out, "aspect": aspect_out}
 
 
+def _central_difference(dem_pad, nan_dem_pad, axis, out):
+    """
+    Computes (previous - next) neighbour difference along axis for the inner part of 1 pixel padded array (dem_pad)
+    and stores it into out. Where one of the neighbours is NaN (nan_dem_pad) and the middle pixel isn't, the middle
+    value is used instead of the neighbour, this is equivalent to edge padding of the NaN areas.
+    """
+    if axis == 1:
+        center = (slice(1, -1), slice(1, -1))
+        previous = (slice(1, -1), slice(None, -2))
+        following = (slice(1, -1), slice(2, None))
+    else:
+        center = (slice(1, -1), slice(1, -1))
+        previous = (slice(None, -2), slice(1, -1))
+        following = (slice(2, None), slice(1, -1))
+
+    np.subtract(dem_pad[previous], dem_pad[following], out=out)
+    if nan_dem_pad is None:
+        return out
+
+    # Precomputed masks where one-sided difference has to be used
+    valid_center = ~nan_dem_pad[center]
+    fill_previous = nan_dem_pad[previous] & valid_center
+    fill_following = nan_dem_pad[following] & valid_center
+    np.subtract(dem_pad[center], dem_pad[following], out=out, where=fill_previous)
+    np.subtract(dem_pad[previous], dem_pad[center], out=out, where=fill_following)
+    out[fill_previous & fill_following] = 0
+
+    return out
+
+
 def roll_fill_nans(dem, shift, axis):
     """
     Uses numpy.roll() function to roll array, then checks element-wise if new array has NaN value, but there was a
@@ -267,6 +329,8 @@ def hillshade(dem,
     hillshade_out : numpy.ndarray
         Result hillshade 2D numpy array.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(hillshade, dem, function_parameters=_dask_function_parameters(locals()))
     if dem.ndim != 2:
         raise Exception("rvt.visualization.hillshade: dem has to be 2D np.array!")
     if not (10000 >= ve_factor >= -10000):
@@ -277,17 +341,16 @@ def hillshade(dem,
         raise Exception("rvt.visualization.hillshade: resolution must be a positive number!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
     # add 1 pixel edge padding
     dem = np.pad(array=dem, pad_width=1, mode="edge")
     dem = dem * ve_factor
 
-    # Convert solar position (degrees) to radians
-    sun_azimuth_rad = np.deg2rad(sun_azimuth)
-    sun_elevation_rad = np.deg2rad(sun_elevation)
+    # Convert solar position (degrees) to radians (python floats, they don't upcast dem dtype)
+    sun_azimuth_rad = float(np.deg2rad(sun_azimuth))
+    sun_elevation_rad = float(np.deg2rad(sun_elevation))
 
     # Convert to solar zenith angle
     sun_zenith_rad = np.pi / 2 - sun_elevation_rad
@@ -301,8 +364,8 @@ def hillshade(dem,
         aspect = dict_slp_asp["aspect"]
 
     # Compute solar incidence angle, hillshading
-    hillshade_out = np.cos(sun_zenith_rad) * np.cos(slope) + np.sin(sun_zenith_rad) * np.sin(slope) * np.cos(
-        aspect - sun_azimuth_rad)
+    hillshade_out = float(np.cos(sun_zenith_rad)) * np.cos(slope) + float(np.sin(sun_zenith_rad)) * np.sin(slope) * \
+        np.cos(aspect - sun_azimuth_rad)
 
     hillshade_out[hillshade_out < 0] = 0  # set all negative to 0
 
@@ -312,6 +375,115 @@ def hillshade(dem,
     return hillshade_out
 
 
+def hillshade_batch(dem,
+                    resolution_x,
+                    resolution_y,
+                    sun_azimuth=(315,),
+                    sun_elevation=35,
+                    slope=None,
+                    aspect=None,
+                    ve_factor=1,
+                    no_data=None,
+                    out=None
+                    ):
+    """
+    Compute hillshades for multiple solar positions at once.
+
+    Slope and aspect (and their sines and cosines) are computed only once and shared between all solar positions.
+    Each hillshade is written directly into one band of the output array, so no per-direction copies are made.
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        Input digital elevation model as 2D numpy array.
+    resolution_x : int
+        DEM resolution in X direction.
+    resolution_y : int
+        DEM resolution in Y direction.
+    sun_azimuth : list of int or float
+        Solar azimuth angles (clockwise from North) in degrees, one for each output band.
+    sun_elevation : int or float or list of int or float
+        Solar vertical angle (above the horizon) in degrees. Either a single value used for all azimuths or one value
+        for each azimuth.
+    slope : numpy.ndarray
+        Slope arr in radians if you don't input it, it is calculated.
+    aspect : numpy.ndarray
+        Aspect arr in radians if you don't input it, it is calculated.
+    ve_factor : int or float
+        Vertical exaggeration factor.
+    no_data : int or float
+        Value that represents no_data, all pixels with this value are changed to np.nan.
+    out : numpy.ndarray
+        Optional float array of shape (len(sun_azimuth), dem rows, dem columns) to store the result into.
+
+    Returns
+    -------
+    hillshades_out : numpy.ndarray
+        Result hillshades as 3D numpy array, one band for each solar position.
+    """
+    if _is_dask_array(dem):
+        return dask_map_overlap(hillshade_batch, dem, function_parameters=_dask_function_parameters(locals()),
+                                out_nr_bands=np.size(sun_azimuth))
+    if dem.ndim != 2:
+        raise Exception("rvt.visualization.hillshade_batch: dem has to be 2D np.array!")
+    if not (10000 >= ve_factor >= -10000):
+        raise Exception("rvt.visualization.hillshade_batch: ve_factor must be between -10000 and 10000!")
+    if resolution_x < 0 or resolution_y < 0:
+        raise Exception("rvt.visualization.hillshade_batch: resolution must be a positive number!")
+
+    sun_azimuth = np.atleast_1d(np.asarray(sun_azimuth, dtype=np.float64))
+    sun_elevation = np.asarray(sun_elevation, dtype=np.float64)
+    if sun_elevation.ndim == 0:  # same elevation for all azimuths
+        sun_elevation = np.full(sun_azimuth.shape, sun_elevation)
+    if sun_elevation.shape != sun_azimuth.shape:
+        raise Exception("rvt.visualization.hillshade_batch: sun_elevation has to be a single value or have the same"
+                        " length as sun_azimuth!")
+    if np.any(sun_azimuth > 360) or np.any(sun_azimuth < 0) or np.any(sun_elevation > 90) or \
+            np.any(sun_elevation < 0):
+        raise Exception("rvt.visualization.hillshade_batch: sun_azimuth must be [0-360] and sun_elevation [0-90]!")
+
+    out_shape = (sun_azimuth.size, dem.shape[0], dem.shape[1])
+    if out is None:
+        out = np.empty(out_shape, dtype=rvt.engine.get_float_dtype())
+    elif out.shape != out_shape:
+        raise Exception("rvt.visualization.hillshade_batch: out has to be of shape (nr. of azimuths, rows, columns)!")
+
+    # calculates slope and aspect if they are not added
+    if slope is None or aspect is None:
+        dict_slp_asp = slope_aspect(dem=dem, resolution_x=resolution_x, resolution_y=resolution_y,
+                                    output_units="radian", ve_factor=ve_factor, no_data=no_data)
+        slope = dict_slp_asp["slope"]
+        aspect = dict_slp_asp["aspect"]
+
+    # Terms shared by all solar positions, cos(aspect - azimuth) is expanded so that only the (scalar) azimuth
+    # terms change from band to band
+    cos_slope = np.cos(slope, dtype=out.dtype)
+    sin_slope = np.sin(slope, dtype=out.dtype)
+    sin_slope_cos_aspect = np.cos(aspect, dtype=out.dtype)
+    sin_slope_cos_aspect *= sin_slope
+    sin_slope_sin_aspect = np.sin(aspect, dtype=out.dtype)
+    sin_slope_sin_aspect *= sin_slope
+    del sin_slope
+    tmp = np.empty(dem.shape, dtype=out.dtype)
+
+    # Solar zenith angle
+    sun_zenith_rad = np.pi / 2 - np.deg2rad(sun_elevation)
+    sun_azimuth_rad = np.deg2rad(sun_azimuth)
+
+    # Compute solar incidence angle, hillshading
+    for i_band in range(sun_azimuth.size):
+        hillshade_out = out[i_band]
+        sin_zenith = np.sin(sun_zenith_rad[i_band])
+        np.multiply(cos_slope, np.cos(sun_zenith_rad[i_band]), out=hillshade_out)
+        np.multiply(sin_slope_cos_aspect, sin_zenith * np.cos(sun_azimuth_rad[i_band]), out=tmp)
+        hillshade_out += tmp
+        np.multiply(sin_slope_sin_aspect, sin_zenith * np.sin(sun_azimuth_rad[i_band]), out=tmp)
+        hillshade_out += tmp
+        np.maximum(hillshade_out, 0, out=hillshade_out)  # set all negative to 0, NaNs are kept
+
+    return out
+
+
 def multi_hillshade(dem,
                     resolution_x,
                     resolution_y,
@@ -351,6 +523,9 @@ def multi_hillshade(dem,
     multi_hillshade_out : numpy.ndarray
         Result multiple direction hillshade multidimensional (nr_directions=dimensions) numpy array.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(multi_hillshade, dem, function_parameters=_dask_function_parameters(locals()),
+                                out_nr_bands=nr_directions)
     if dem.ndim != 2:
         raise Exception("rvt.visualization.multi_hillshade: dem has to be 2D np.array!")
     if sun_elevation > 90 or sun_elevation < 0:
@@ -362,70 +537,118 @@ def multi_hillshade(dem,
     if not (10000 >= ve_factor >= -10000):
         raise Exception("rvt.visualization.multi_hillshade: ve_factor must be between -10000 and 10000!")
 
-    # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
-
-    dem = dem.astype(np.float32)
-    dem = dem * ve_factor
-
-    # calculates slope and aspect if they are not added
-    if slope is None or aspect is None:  # slope and aspect are the same, so we have to calculate it once
-        dict_slp_asp = slope_aspect(dem=dem, resolution_x=resolution_x, resolution_y=resolution_y,
-                                    output_units="radian")
-        slope = dict_slp_asp["slope"]
-        aspect = dict_slp_asp["aspect"]
-
-    hillshades_arr_list = []  # list of all hillshades in different directions
-    for i_direction in range(nr_directions):
-        sun_azimuth = (360 / nr_directions) * i_direction
-        hillshading = hillshade(dem=dem, resolution_x=resolution_x, resolution_y=resolution_y,
-                                sun_elevation=sun_elevation, sun_azimuth=sun_azimuth, slope=slope, aspect=aspect)
-        hillshades_arr_list.append(hillshading)
-    multi_hillshade_out = np.asarray(hillshades_arr_list)
+    sun_azimuths = (360 / nr_directions) * np.arange(nr_directions)
+    multi_hillshade_out = hillshade_batch(dem=dem, resolution_x=resolution_x, resolution_y=resolution_y,
+                                          sun_azimuth=sun_azimuths, sun_elevation=sun_elevation, slope=slope,
+                                          aspect=aspect, ve_factor=ve_factor, no_data=no_data)
 
     return multi_hillshade_out
 
 
 def mean_filter(dem, kernel_radius):
     """Applies mean filter (low pass filter) on DEM. Kernel radius is in pixels. Kernel size is 2 * kernel_radius + 1.
-    It uses matrix shifting (roll) instead of convolutional approach (works faster).
+    It uses summed-area tables (integral images) instead of convolutional approach (works faster).
     It returns mean filtered dem as numpy.ndarray (2D numpy array)."""
     radius_cell = int(kernel_radius)
 
     if kernel_radius == 0:
         return dem
 
-    # store nans
-    idx_nan_dem = np.isnan(dem)
+    dict_integral_images = padded_integral_images(dem=dem, pad_width=radius_cell, mode="edge")
 
-    # mean filter
-    dem_pad = np.pad(dem, (radius_cell + 1, radius_cell), mode="edge")
-    # store nans
-    idx_nan_dem_pad = np.isnan(dem_pad)
-    # change nan to 0
-    dem_pad[idx_nan_dem_pad] = 0
+    return integral_image_mean(dem=dem, dict_integral_images=dict_integral_images, kernel_radius=radius_cell)
+
+
+def padded_integral_images(dem, pad_width, mode="edge", compute_squared=False):
+    """
+    Pads DEM (pad_width + 1 pixels before and pad_width pixels after in each axis) and calculates its summed-area
+    tables (integral images). The same tables can then be used to calculate box statistics for any kernel radius up to
+    pad_width (see integral_image_box_sum and integral_image_mean). NaN pixels are excluded (they add 0 to the sum and
+    are not counted).
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        Input digital elevation model as 2D numpy array.
+    pad_width : int
+        Largest kernel radius the tables will be used for.
+    mode : str
+        Padding mode, see numpy.pad.
+    compute_squared : bool
+        If True it also computes summed-area table of dem squared (dem**2).
+
+    Returns
+    -------
+    dict_out : dict
+        Returns {"pad_width": pad_width, "nr_pixels": dem_i_nr_pixels, "sum": dem_i1, "sum_squared": dem_i2};
+        dem_i_nr_pixels : summed-area table of number of (non NaN) pixels, None if dem has no NaN values;
+        dem_i1 : summed-area table of dem;
+        dem_i2 : summed-area table of dem squared, None if compute_squared is False.
+    """
+    pad_width = int(pad_width)
+    dem_pad = np.pad(dem, (pad_width + 1, pad_width), mode=mode)
 
-    # kernel nr pixel integral image
-    dem_i_nr_pixels = np.ones(dem_pad.shape)
-    dem_i_nr_pixels[idx_nan_dem_pad] = 0
-    dem_i_nr_pixels = integral_image(dem_i_nr_pixels, np.int64)
+    # number of pixels for summed area table, only needed when some pixels are NaN
+    idx_nan_dem_pad = np.isnan(dem_pad)
+    if idx_nan_dem_pad.any():
+        # change nan to 0
+        dem_pad[idx_nan_dem_pad] = 0
+        dem_i_nr_pixels = integral_image(~idx_nan_dem_pad, np.int64)
+    else:
+        dem_i_nr_pixels = None
+    del idx_nan_dem_pad
 
+    # Sums are float64 by design, float32 cumulative sums lose precision over large arrays
     dem_i1 = integral_image(dem_pad)
+    if compute_squared:
+        dem_pad = dem_pad.astype(np.float64)
+        dem_pad **= 2
+        dem_i2 = integral_image(dem_pad)
+    else:
+        dem_i2 = None
 
-    kernel_nr_pix_arr = (np.roll(dem_i_nr_pixels, (radius_cell, radius_cell), axis=(0, 1)) +
-                         np.roll(dem_i_nr_pixels, (-radius_cell - 1, -radius_cell - 1), axis=(0, 1)) -
-                         np.roll(dem_i_nr_pixels, (-radius_cell - 1, radius_cell), axis=(0, 1)) -
-                         np.roll(dem_i_nr_pixels, (radius_cell, -radius_cell - 1), axis=(0, 1)))
-    mean_out = (np.roll(dem_i1, (radius_cell, radius_cell), axis=(0, 1)) +
-                np.roll(dem_i1, (-radius_cell - 1, -radius_cell - 1), axis=(0, 1)) -
-                np.roll(dem_i1, (-radius_cell - 1, radius_cell), axis=(0, 1)) -
-                np.roll(dem_i1, (radius_cell, -radius_cell - 1), axis=(0, 1)))
-    mean_out = mean_out / kernel_nr_pix_arr
-    mean_out = mean_out.astype(np.float32)
-    mean_out = mean_out[radius_cell:-(radius_cell + 1), radius_cell:-(radius_cell + 1)]  # remove padding
+    return {"pad_width": pad_width, "nr_pixels": dem_i_nr_pixels, "sum": dem_i1, "sum_squared": dem_i2}
+
+
+def integral_image_box_sum(dem_i, kernel_radius, pad_width, shape):
+    """
+    Calculates sum of kernel (box of size 2 * kernel_radius + 1) around each pixel from summed-area table (dem_i) of
+    array padded with padded_integral_images (pad_width). Parameter shape is shape of the array before padding and
+    kernel_radius can't be larger than pad_width. Returns array of shape.
+    """
+    kernel_radius = int(kernel_radius)
+    if kernel_radius > pad_width:
+        raise Exception("rvt.visualization.integral_image_box_sum: kernel_radius can't be larger than pad_width!")
+    low_rows = slice(pad_width - kernel_radius, pad_width - kernel_radius + shape[0])
+    low_cols = slice(pad_width - kernel_radius, pad_width - kernel_radius + shape[1])
+    high_rows = slice(pad_width + kernel_radius + 1, pad_width + kernel_radius + 1 + shape[0])
+    high_cols = slice(pad_width + kernel_radius + 1, pad_width + kernel_radius + 1 + shape[1])
+
+    box_sum = dem_i[high_rows, high_cols] - dem_i[high_rows, low_cols]
+    box_sum -= dem_i[low_rows, high_cols]
+    box_sum += dem_i[low_rows, low_cols]
+
+    return box_sum
+
+
+def integral_image_mean(dem, dict_integral_images, kernel_radius):
+    """
+    Calculates mean of kernel (box of size 2 * kernel_radius + 1) around each pixel of dem from summed-area tables
+    calculated with padded_integral_images. Where dem is NaN output is NaN. Returns 2D numpy array of
+    rvt.engine.get_float_dtype() (sums stay float64).
+    """
+    pad_width = dict_integral_images["pad_width"]
+    mean_out = integral_image_box_sum(dem_i=dict_integral_images["sum"], kernel_radius=kernel_radius,
+                                      pad_width=pad_width, shape=dem.shape)
+    if dict_integral_images["nr_pixels"] is None:
+        mean_out /= (2 * int(kernel_radius) + 1) ** 2
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):  # Suppress warning for dividing by zero (NaN areas)
+            mean_out /= integral_image_box_sum(dem_i=dict_integral_images["nr_pixels"], kernel_radius=kernel_radius,
+                                               pad_width=pad_width, shape=dem.shape)
+    mean_out = mean_out.astype(rvt.engine.get_float_dtype())
     # nan back to nan
-    mean_out[idx_nan_dem] = np.nan
+    mean_out[np.isnan(dem)] = np.nan
 
     return mean_out
 
@@ -454,6 +677,8 @@ def slrm(dem,
     slrm_out : numpy.ndarray
         Simple local relief model 2D numpy array.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(slrm, dem, function_parameters=_dask_function_parameters(locals()))
     if dem.ndim != 2:
         raise Exception("rvt.visualization.slrm: dem has to be 2D np.array!")
     if radius_cell < 10 or radius_cell > 50:
@@ -462,10 +687,9 @@ def slrm(dem,
         raise Exception("rvt.visualization.slrm: ve_factor must be between -10000 and 10000!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
     dem = dem * ve_factor
 
     # mean filter
@@ -540,6 +764,43 @@ def horizon_shift_vector(num_directions=16,
     return shift
 
 
+def _pad_array(arr, pad_width, mode, buffer_pool=None):
+    """
+    The same as np.pad(arr, pad_width, mode) for 2D arr and integer pad_width, but the padded array is taken from
+    buffer_pool (rvt.engine.BufferPool) if it is not None.
+    """
+    if buffer_pool is None:
+        return np.pad(arr, pad_width, mode=mode)
+    n_rows, n_cols = arr.shape
+    arr_pad = buffer_pool.get((n_rows + 2 * pad_width, n_cols + 2 * pad_width), arr.dtype)
+    arr_pad[pad_width:pad_width + n_rows, pad_width:pad_width + n_cols] = arr
+    if pad_width == 0:
+        return arr_pad
+    # padding is separable, indexes of padded rows and columns (in arr_pad) are the same as in np.pad of 1D array
+    rows_indx = np.pad(np.arange(n_rows), pad_width, mode=mode) + pad_width
+    cols_indx = np.pad(np.arange(n_cols), pad_width, mode=mode) + pad_width
+    center_cols = slice(pad_width, pad_width + n_cols)
+    arr_pad[:pad_width, center_cols] = arr_pad[rows_indx[:pad_width], center_cols]
+    arr_pad[pad_width + n_rows:, center_cols] = arr_pad[rows_indx[pad_width + n_rows:], center_cols]
+    arr_pad[:, :pad_width] = arr_pad[:, cols_indx[:pad_width]]
+    arr_pad[:, pad_width + n_cols:] = arr_pad[:, cols_indx[pad_width + n_cols:]]
+    return arr_pad
+
+
+def _to_float_dtype(arr, buffer_pool=None):
+    """
+    Returns arr converted to rvt.engine.get_float_dtype() (arr if it already has it). Converted array is taken from
+    buffer_pool (rvt.engine.BufferPool) and arr is released to it, if buffer_pool is not None.
+    """
+    float_dtype = rvt.engine.get_float_dtype()
+    if arr.dtype == float_dtype:
+        return arr
+    arr_out = rvt.engine.get_buffer(buffer_pool, arr.shape, float_dtype)
+    np.copyto(arr_out, arr, casting="unsafe")
+    rvt.engine.release_buffer(buffer_pool, arr)
+    return arr_out
+
+
 def sky_view_factor_compute(height_arr,
                             radius_max=10,
                             radius_min=1,
@@ -547,9 +808,13 @@ def sky_view_factor_compute(height_arr,
                             compute_svf=True,
                             compute_opns=False,
                             compute_asvf=False,
+                            compute_neg_opns=False,
+                            compute_horizon=False,
                             a_main_direction=315.,
                             a_poly_level=4,
-                            a_min_weight=0.4
+                            a_min_weight=0.4,
+                            engine="numpy",
+                            buffer_pool=None
                             ):
     """
     Calculates horizon based visualizations: Sky-view factor, Anisotropic SVF and Openness.
@@ -566,10 +831,11 @@ def sky_view_factor_compute(height_arr,
     ----------
     height_arr : numpy.ndarray
         Elevation (DEM) as 2D numpy array.
-    radius_max : int
-        Maximal search radius in pixels/cells (not in meters).
-    radius_min : int
-        Minimal search radius in pixels/cells (not in meters), for noise reduction.
+    radius_max : int or list of int
+        Maximal search radius in pixels/cells (not in meters). If list, outputs for all radii are computed in the same
+        horizon search.
+    radius_min : int or list of int
+        Minimal search radius in pixels/cells (not in meters), for noise reduction. If list, one for each radius_max.
     num_directions : int
         Number of directions as input.
     compute_svf : bool
@@ -578,6 +844,11 @@ def sky_view_factor_compute(height_arr,
         If true it computes and outputs asvf.
     compute_opns : bool
         If true it computes and outputs opns.
+    compute_neg_opns : bool
+        If true it computes and outputs negative openness (openness of the inverted DEM), in the same sweep as
+        positive openness.
+    compute_horizon : bool
+        If true it outputs horizon elevation angle (in radians) for each direction, see horizon_angles().
     a_main_direction : int or float
         Main direction of anisotropy.
     a_poly_level : int
@@ -586,31 +857,71 @@ def sky_view_factor_compute(height_arr,
         Weight to consider anisotropy:
                  0 - low anisotropy, 
                  1 - high  anisotropy (no illumination from the direction opposite the main direction)
+    engine : str
+        Engine of horizon search kernel ("numpy", "numba", "auto"), see rvt.engine.
+    buffer_pool : rvt.engine.BufferPool
+        Pool of reusable arrays, padded array, scratch arrays and outputs are taken from it (outputs can be released
+        back to it when they are not needed anymore). If None, new arrays are allocated.
 
     Returns
     -------
     dict_out : dictionary
-        Return {"svf": svf_out, "asvf": asvf_out, "opns": opns_out};
+        Return {"svf": svf_out, "asvf": asvf_out, "opns": opns_out, "neg_opns": neg_opns_out};
         svf_out, skyview factor : 2D numpy array (numpy.ndarray) of skyview factor;
         asvf_out, anisotropic skyview factor : 2D numpy array (numpy.ndarray) of anisotropic skyview factor;
-        opns_out, openness : 2D numpy array (numpy.ndarray) openness (elevation angle of horizon).
+        opns_out, openness : 2D numpy array (numpy.ndarray) openness (elevation angle of horizon);
+        neg_opns_out, negative openness : 2D numpy array (numpy.ndarray) negative openness;
+        horizon (if compute_horizon), horizon angles : 3D numpy array (numpy.ndarray) (num_directions, rows, cols).
+        If radius_max is a list, it returns list of dictionaries, one for each radius_max.
     """
 
-    # Pad the array for the radius_max on all 4 sides
-    height = np.pad(height_arr, radius_max, mode='reflect')
-
-    # Compute the vector of movement and corresponding distances
-    move = horizon_shift_vector(num_directions=num_directions, radius_pixels=radius_max, min_radius=radius_min)
+    # Multiple search radii (and minimal radii) are computed in the same horizon search
+    multi_radius = isinstance(radius_max, (list, tuple, np.ndarray))
+    radii_max = list(radius_max) if multi_radius else [radius_max]
+    if isinstance(radius_min, (list, tuple, np.ndarray)):
+        radii_min = list(radius_min)
+    else:
+        radii_min = [radius_min] * len(radii_max)
+    if len(radii_min) != len(radii_max):
+        raise Exception("rvt.visualization.sky_view_factor_compute: radius_min and radius_max need the same length!")
+    nr_radii = len(radii_max)
+
+    # Pad the array for the largest radius_max on all 4 sides (reflected values do not depend on the pad width)
+    pad = int(max(radii_max))
+    height = _pad_array(height_arr, pad, mode="reflect", buffer_pool=buffer_pool)
+    # Horizon is searched only for the original extent, shifted heights are slices (views) of the padded array
+    n_rows, n_cols = height_arr.shape
+    height_center = height[pad:pad + n_rows, pad:pad + n_cols]
+
+    # Compute the vector of movement and corresponding distances for each radius, then join the shifts of all radii.
+    # For each direction shifts are grouped by the radii (indexes) they belong to, nested radii share the shifts of
+    # the inner radius, so each shift is searched only once
+    moves = [horizon_shift_vector(num_directions=num_directions, radius_pixels=r_max, min_radius=r_min)
+             for r_max, r_min in zip(radii_max, radii_min)]
+    move = {}
+    for direction in moves[0]:
+        shift_radii = {}
+        for i_radius, move_radius in enumerate(moves):
+            for shift_indx, radius in zip(move_radius[direction]["shift"], move_radius[direction]["distance"]):
+                shift_radii.setdefault(shift_indx, (radius, []))[1].append(i_radius)
+        move[direction] = {}
+        for shift_indx, (radius, i_radii) in shift_radii.items():
+            move[direction].setdefault(tuple(i_radii), []).append((shift_indx, radius))
+
+    def init_sum():
+        # Multiply with 0 instead of using np.zeros to preserve nodata
+        return [np.multiply(height_center, 0, out=rvt.engine.get_buffer(buffer_pool, height_center.shape, np.float64))
+                for _ in range(nr_radii)]
 
     # Initiate the output for SVF
     if compute_svf:
-        svf_out = height * 0  # Multiply with 0 instead of using np.zeros to preserve nodata
+        svf_out = init_sum()
     else:
         svf_out = None
 
     # Initiate the output for azimuth dependent SVF
     if compute_asvf:
-        asvf_out = height * 0  # Multiply with 0 instead of using np.zeros to preserve nodata
+        asvf_out = init_sum()
         w_m = a_min_weight
         w_a = np.deg2rad(a_main_direction)
         weight = np.arange(num_directions) * (2 * np.pi / num_directions)
@@ -621,53 +932,107 @@ def sky_view_factor_compute(height_arr,
 
     # Initiate the output for Openness
     if compute_opns:
-        opns_out = height * 0  # Multiply with 0 instead of using np.zeros to preserve nodata
+        opns_out = init_sum()
     else:
         opns_out = None
 
+    # Initiate the output for Negative openness
+    if compute_neg_opns:
+        neg_opns_out = init_sum()
+    else:
+        neg_opns_out = None
+
+    # Initiate the output for horizon angles
+    if compute_horizon:
+        horizon_out = [rvt.engine.get_buffer(buffer_pool, (num_directions,) + height_center.shape, np.float32)
+                       for _ in range(nr_radii)]
+    else:
+        horizon_out = None
+
+    compute_max_slope = compute_svf or compute_asvf or compute_opns or compute_horizon
+    horizon_slope = rvt.engine.get_kernel("horizon_slope", engine)
+    # Scratch arrays for joined slopes of a radius and for directional output
+    slope = rvt.engine.get_buffer(buffer_pool, height_center.shape, np.float64)
+    directional_out = rvt.engine.get_buffer(buffer_pool, height_center.shape, np.float64)
+
     # Search for horizon in each direction...
     for i_dir, direction in enumerate(move):
-        # Reset maximum at each iteration (i.e. at the start of new direction),
-        # smallest possible elevation angle is -1000 rad (i.e. -90 deg)
-        max_slope = np.zeros(height.shape, dtype=np.float32) - 1000
-
-        # ... and for each search radius
-        for i_rad, radius in enumerate(move[direction]["distance"]):
-            # Get shift index from move dictionary
-            shift_indx = move[direction]["shift"][i_rad]
-            # Estimate the slope
-            _ = (np.roll(height, shift_indx, axis=(0, 1)) - height) / radius
-            # Compare to the previous max slope and keep the largest values (element wise). Use np.fmax to prevent NaN
-            # values contaminating the edge of the image (if one of the elements is NaN, pick non-NaN element)
-            max_slope = np.fmax(max_slope, _)
-
-        # Convert to angle in radians and compute directional output
-        max_slope = np.arctan(max_slope)
-
-        # Sum max angle for all directions
+        group_max_slope = {}
+        group_min_slope = {}
+        for i_radii, shifts in move[direction].items():
+            # Maximum slope over all search radii (smallest possible elevation angle is -1000 rad, i.e. -90 deg),
+            # minimum slope is the (negated) maximum slope of the inverted DEM, used for negative openness
+            group_max_slope[i_radii], group_min_slope[i_radii] = horizon_slope(
+                height=height, pad=pad, shifts=[shift_indx for shift_indx, _ in shifts],
+                distances=[radius for _, radius in shifts], compute_max=compute_max_slope,
+                compute_min=compute_neg_opns, buffer_pool=buffer_pool
+            )
+
+        for i_radius in range(nr_radii):
+            # Join the groups of shifts that belong to this radius
+            radius_groups = [i_radii for i_radii in move[direction] if i_radius in i_radii]
+            if compute_neg_opns:
+                np.copyto(slope, group_min_slope[radius_groups[0]])
+                for i_radii in radius_groups[1:]:
+                    np.fmin(slope, group_min_slope[i_radii], out=slope)
+                # Sum min angle for all directions, arctan(min_slope) == -arctan(max_slope of inverted DEM)
+                neg_opns_out[i_radius] += np.arctan(slope, out=slope)
+            if not compute_max_slope:
+                continue
+            np.copyto(slope, group_max_slope[radius_groups[0]])
+            for i_radii in radius_groups[1:]:
+                np.fmax(slope, group_max_slope[i_radii], out=slope)
+
+            # Convert to angle in radians and compute directional output
+            max_slope_angle = np.arctan(slope, out=slope)
+
+            # Sum max angle for all directions
+            if compute_svf or compute_asvf:
+                # For SVF minimum possible angle is 0 (hemisphere), use np.fmax() to change NaNs to 0
+                np.fmax(max_slope_angle, 0, out=directional_out)
+                np.sin(directional_out, out=directional_out)
+                np.subtract(1, directional_out, out=directional_out)
+            if compute_svf:
+                svf_out[i_radius] += directional_out
+            if compute_asvf:
+                asvf_out[i_radius] += np.multiply(directional_out, weight[i_dir], out=directional_out)
+            if compute_opns:
+                # For Openness taking the entire sphere
+                opns_out[i_radius] += max_slope_angle
+            if compute_horizon:
+                horizon_out[i_radius][i_dir] = max_slope_angle
+        rvt.engine.release_buffer(buffer_pool, *group_max_slope.values(), *group_min_slope.values())
+    rvt.engine.release_buffer(buffer_pool, height, slope, directional_out)
+
+    # Average the directional output over all directions (directional sums are float64 for accuracy, outputs are
+    # converted to rvt.engine.get_float_dtype())
+    list_dict_svf_asvf_opns = []
+    for i_radius in range(nr_radii):
+        dict_svf_asvf_opns = {}
         if compute_svf:
-            # For SVF minimum possible angle is 0 (hemisphere), use np.fmax() to change NaNs to 0
-            svf_out = svf_out + (1 - np.sin(np.fmax(max_slope, 0)))
+            dict_svf_asvf_opns["svf"] = np.divide(svf_out[i_radius], num_directions, out=svf_out[i_radius])
         if compute_asvf:
-            # For SVF minimum possible angle is 0 (hemisphere), use np.fmax() to change NaNs to 0
-            asvf_out = asvf_out + (1 - np.sin(np.fmax(max_slope, 0))) * weight[i_dir]
+            dict_svf_asvf_opns["asvf"] = np.divide(asvf_out[i_radius], np.sum(weight), out=asvf_out[i_radius])
         if compute_opns:
-            # For Openness taking the entire sphere
-            opns_out = opns_out + max_slope
-
-    # Cut to original extent and average the directional output over all directions
-    if compute_svf:
-        svf_out = svf_out[radius_max:-radius_max, radius_max:-radius_max] / num_directions
-    if compute_asvf:
-        asvf_out = asvf_out[radius_max:-radius_max, radius_max:-radius_max] / np.sum(weight)
-    if compute_opns:
-        opns_out = np.rad2deg(0.5 * np.pi - (opns_out[radius_max:-radius_max, radius_max:-radius_max] / num_directions))
-
-    # Return results within dict
-    dict_svf_asvf_opns = {"svf": svf_out, "asvf": asvf_out, "opns": opns_out}
-    dict_svf_asvf_opns = {k: v for k, v in dict_svf_asvf_opns.items() if v is not None}  # filter out none
-
-    return dict_svf_asvf_opns
+            opns_out[i_radius] /= num_directions
+            dict_svf_asvf_opns["opns"] = np.rad2deg(
+                np.subtract(0.5 * np.pi, opns_out[i_radius], out=opns_out[i_radius]), out=opns_out[i_radius]
+            )
+        if compute_neg_opns:
+            neg_opns_out[i_radius] /= num_directions
+            dict_svf_asvf_opns["neg_opns"] = np.rad2deg(
+                np.add(0.5 * np.pi, neg_opns_out[i_radius], out=neg_opns_out[i_radius]), out=neg_opns_out[i_radius]
+            )
+        for key in dict_svf_asvf_opns:
+            dict_svf_asvf_opns[key] = _to_float_dtype(dict_svf_asvf_opns[key], buffer_pool=buffer_pool)
+        if compute_horizon:
+            dict_svf_asvf_opns["horizon"] = horizon_out[i_radius]
+        list_dict_svf_asvf_opns.append(dict_svf_asvf_opns)
+
+    # Return results within dict (list of dicts, one for each radius, if radius_max is a list)
+    if multi_radius:
+        return list_dict_svf_asvf_opns
+    return list_dict_svf_asvf_opns[0]
 
 
 def sky_view_factor(dem,
@@ -675,13 +1040,17 @@ def sky_view_factor(dem,
                     compute_svf=True,
                     compute_opns=False,
                     compute_asvf=False,
+                    compute_neg_opns=False,
+                    compute_horizon=False,
                     svf_n_dir=16,
                     svf_r_max=10,
                     svf_noise=0,
                     asvf_dir=315,
                     asvf_level=1,
                     ve_factor=1,
-                    no_data=None
+                    no_data=None,
+                    engine="numpy",
+                    buffer_pool=None
                     ):
     """
     Prepare the data, call sky_view_factor_compute, reformat and return back 2D arrays.
@@ -694,14 +1063,19 @@ def sky_view_factor(dem,
         Compute SVF (True) or not (False).
     compute_opns : bool
         Compute OPENNESS (True) or not (False).
+    compute_neg_opns : bool
+        Compute negative OPENNESS (True) or not (False). Negative openness is computed in the same horizon search as
+        the other outputs, there is no need to invert the DEM.
+    compute_horizon : bool
+        Output horizon elevation angle (in radians) for each direction (True) or not (False).
     resolution : float
         Pixel resolution.
     svf_n_dir : int
         Number of directions.
-    svf_r_max : int
-        Maximal search radius in pixels.
-    svf_noise : int
-        The level of noise remove (0-don't remove, 1-low, 2-med, 3-high).
+    svf_r_max : int or list of int
+        Maximal search radius in pixels. If list, outputs for all radii are computed in the same horizon search.
+    svf_noise : int or list of int
+        The level of noise remove (0-don't remove, 1-low, 2-med, 3-high). If list, one level for each svf_r_max.
     compute_asvf : bool
         Compute anisotropic SVF (True) or not (False).
     asvf_level : int
@@ -713,34 +1087,60 @@ def sky_view_factor(dem,
     no_data : int or float
         Value that represents no_data, all pixels with this value are changed to np.nan. Use this parameter when nodata
         is not np.nan.
+    engine : str
+        Engine of horizon search kernel ("numpy", "numba", "auto"), see rvt.engine.
+    buffer_pool : rvt.engine.BufferPool
+        Pool of reusable arrays (for example in tile loops), scratch arrays and outputs are taken from it. Outputs can
+        be released back to the pool when they are not needed anymore. If None, new arrays are allocated.
 
     Returns
     -------
     dict_out : dictionary
-        Return {"svf": svf_out, "asvf": asvf_out, "opns": opns_out};
+        Return {"svf": svf_out, "asvf": asvf_out, "opns": opns_out, "neg_opns": neg_opns_out};
         svf_out, skyview factor : 2D numpy array (numpy.ndarray) of skyview factor;
         asvf_out, anisotropic skyview factor : 2D numpy array (numpy.ndarray) of anisotropic skyview factor;
-        opns_out, openness : 2D numpy array (numpy.ndarray) openness (elevation angle of horizon).
+        opns_out, openness : 2D numpy array (numpy.ndarray) openness (elevation angle of horizon);
+        neg_opns_out, negative openness : 2D numpy array (numpy.ndarray) negative openness;
+        horizon (if compute_horizon), horizon angles : 3D numpy array (numpy.ndarray) (svf_n_dir, rows, cols).
+        If svf_r_max is a list, it returns list of dictionaries, one for each svf_r_max.
     """
+    if _is_dask_array(dem):
+        if isinstance(svf_r_max, (list, tuple)) or compute_horizon:
+            raise Exception("rvt.visualization.sky_view_factor: dask array dem supports single svf_r_max and"
+                            " no compute_horizon (use horizon_angles)!")
+        function_parameters = _dask_function_parameters(locals())
+        out_keys = [key for key, compute in (("svf", compute_svf), ("asvf", compute_asvf), ("opns", compute_opns),
+                                             ("neg_opns", compute_neg_opns)) if compute]
+        return dask_map_overlap(sky_view_factor, dem, function_parameters=function_parameters, out_keys=out_keys)
+
+    # Multiple radii
+    multi_radius = isinstance(svf_r_max, (list, tuple))
+    list_svf_r_max = list(svf_r_max) if multi_radius else [svf_r_max]
+    if isinstance(svf_noise, (list, tuple)):
+        list_svf_noise = list(svf_noise)
+    else:
+        list_svf_noise = [svf_noise] * len(list_svf_r_max)
 
     # Checks for input parameters
     if dem.ndim != 2:
         raise Exception("rvt.visualization.sky_view_factor: dem has to be 2D np.array!")
     if not (10000 >= ve_factor >= -10000):
         raise Exception("rvt.visualization.sky_view_factor: ve_factor must be between -10000 and 10000!")
-    if svf_noise != 0 and svf_noise != 1 and svf_noise != 2 and svf_noise != 3:
+    if len(list_svf_noise) != len(list_svf_r_max):
+        raise Exception("rvt.visualization.sky_view_factor: svf_noise list must have the same length as svf_r_max!")
+    if any(noise not in (0, 1, 2, 3) for noise in list_svf_noise):
         raise Exception("rvt.visualization.sky_view_factor: svf_noise must be one of the following"
                         "values (0-don't remove, 1-low, 2-med, 3-high)!")
     if asvf_level != 1 and asvf_level != 2:
         raise Exception("rvt.visualization.sky_view_factor: asvf_leve must be one of the following"
                         "values (1-low, 2-high)!")
-    if not compute_svf and not compute_asvf and not compute_opns:
+    if not compute_svf and not compute_asvf and not compute_opns and not compute_neg_opns and not compute_horizon:
         raise Exception("rvt.visualization.sky_view_factor: All computes are false!")
     if resolution < 0:
         raise Exception("rvt.visualization.sky_view_factor: resolution must be a positive number!")
 
     # Make sure array has the correct dtype!
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
 
     # CONSTANTS
     # Level of polynomial that determines the anisotropy, selected with asvf_level (1 - low, 2 - high)
@@ -751,8 +1151,7 @@ def sky_view_factor(dem,
     sc_svf_r_min = [0., 10., 20., 40.]
 
     # Before doing anything to the array, make sure all NODATA values are set to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
     # Save NaN mask (processing may change NaNs to arbitrary values)
     nan_mask = np.isnan(dem)
 
@@ -762,33 +1161,247 @@ def sky_view_factor(dem,
     dem = dem / resolution
 
     # Minimal search radius depends on the noise level, it has to be an integer not smaller than 1
-    svf_r_min = max(np.round(svf_r_max * sc_svf_r_min[svf_noise] * 0.01, decimals=0), 1)
+    list_svf_r_min = [max(np.round(r_max * sc_svf_r_min[noise] * 0.01, decimals=0), 1)
+                      for r_max, noise in zip(list_svf_r_max, list_svf_noise)]
 
     # Set anisotropy parameters
     poly_level = sc_asvf_pol[asvf_level - 1]
     min_weight = sc_asvf_min[asvf_level - 1]
 
     # Main routine for SVF processing
-    dict_svf_asvf_opns = sky_view_factor_compute(
+    list_dict_svf_asvf_opns = sky_view_factor_compute(
         height_arr=dem,
-        radius_max=svf_r_max,
-        radius_min=svf_r_min,
+        radius_max=list_svf_r_max,
+        radius_min=list_svf_r_min,
         num_directions=svf_n_dir,
         compute_svf=compute_svf,
         compute_opns=compute_opns,
         compute_asvf=compute_asvf,
+        compute_neg_opns=compute_neg_opns,
+        compute_horizon=compute_horizon,
         a_main_direction=asvf_dir,
         a_poly_level=poly_level,
-        a_min_weight=min_weight
+        a_min_weight=min_weight,
+        engine=engine,
+        buffer_pool=buffer_pool
     )
 
     # Apply NaN mask to outputs
-    for item in dict_svf_asvf_opns.values():
-        item[nan_mask] = np.nan
+    for dict_svf_asvf_opns in list_dict_svf_asvf_opns:
+        for item in dict_svf_asvf_opns.values():
+            item[..., nan_mask] = np.nan
+
+    if multi_radius:
+        return list_dict_svf_asvf_opns
+    dict_svf_asvf_opns = list_dict_svf_asvf_opns[0]
 
     return dict_svf_asvf_opns
 
 
+def horizon_angles(dem,
+                   resolution,
+                   svf_n_dir=16,
+                   svf_r_max=10,
+                   svf_noise=0,
+                   ve_factor=1,
+                   no_data=None,
+                   data_type=np.float16,
+                   engine="numpy",
+                   buffer_pool=None
+                   ):
+    """
+    Compute horizon elevation angle for each search direction (horizon cube). Sky-view factor, anisotropic SVF,
+    openness and shadows can then be derived from it (svf_from_horizon, asvf_from_horizon, opns_from_horizon,
+    shadow_from_horizon) without repeating the horizon search.
+
+    Parameters
+    ----------
+    dem : numpy.ndarray
+        Input digital elevation model as 2D numpy array.
+    resolution : float
+        Pixel resolution.
+    svf_n_dir : int
+        Number of directions.
+    svf_r_max : int
+        Maximal search radius in pixels.
+    svf_noise : int
+        The level of noise remove (0-don't remove, 1-low, 2-med, 3-high).
+    ve_factor : int or float
+        Vertical exaggeration factor.
+    no_data : int or float
+        Value that represents no_data, all pixels with this value are changed to np.nan .
+    data_type : numpy.dtype
+        Output data type: np.float16 or np.float32 (angle in radians), np.uint8 (angle quantized to 254 levels
+        between -90 and 90 degrees, 255 is no_data).
+    engine : str
+        Engine of horizon search kernel ("numpy", "numba", "auto"), see rvt.engine.
+    buffer_pool : rvt.engine.BufferPool
+        Pool of reusable arrays, scratch arrays are taken from it (and released back). If None, new arrays are
+        allocated.
+
+    Returns
+    -------
+    horizon_out : numpy.ndarray
+        3D numpy array (svf_n_dir, rows, cols) of horizon elevation angles. Direction i looks towards azimuth
+        (360 - i * 360 / svf_n_dir) % 360 (clockwise from north).
+    """
+    if _is_dask_array(dem):
+        return dask_map_overlap(horizon_angles, dem, function_parameters=_dask_function_parameters(locals()),
+                                out_nr_bands=svf_n_dir, dtype=data_type)
+    if data_type not in (np.float16, np.float32, np.uint8):
+        raise Exception("rvt.visualization.horizon_angles: data_type must be np.float16, np.float32 or np.uint8!")
+
+    horizon_out = sky_view_factor(dem=dem, resolution=resolution, compute_svf=False, compute_horizon=True,
+                                  svf_n_dir=svf_n_dir, svf_r_max=svf_r_max, svf_noise=svf_noise,
+                                  ve_factor=ve_factor, no_data=no_data, engine=engine,
+                                  buffer_pool=buffer_pool)["horizon"]
+
+    if data_type == np.uint8:
+        nan_mask = np.isnan(horizon_out)
+        horizon_out += 0.5 * np.pi
+        horizon_out *= 254 / np.pi
+        np.rint(horizon_out, out=horizon_out)
+        horizon_out[nan_mask] = 255
+    if data_type == np.float32:
+        return horizon_out
+    horizon_converted_out = horizon_out.astype(data_type)
+    rvt.engine.release_buffer(buffer_pool, horizon_out)
+    return horizon_converted_out
+
+
+def _horizon_angle_radians(horizon_arr, i_dir):
+    """Returns horizon angle (rvt.engine.get_float_dtype(), radians) of direction i_dir from horizon_angles() output."""
+    float_dtype = rvt.engine.get_float_dtype()
+    if horizon_arr.dtype == np.uint8:
+        angle = horizon_arr[i_dir] * float_dtype.type(np.pi / 254) - float_dtype.type(0.5 * np.pi)
+        angle[horizon_arr[i_dir] == 255] = np.nan
+        return angle
+    return horizon_arr[i_dir].astype(float_dtype)
+
+
+def svf_from_horizon(horizon_arr):
+    """
+    Compute Sky-view factor from horizon angles.
+
+    Parameters
+    ----------
+    horizon_arr : numpy.ndarray
+        Horizon angles, output of horizon_angles().
+
+    Returns
+    -------
+    svf_out : numpy.ndarray
+        2D numpy array (numpy.ndarray) of sky-view factor.
+    """
+    return asvf_from_horizon(horizon_arr, direction_weight=np.ones(horizon_arr.shape[0]))
+
+
+def asvf_from_horizon(horizon_arr, asvf_dir=315, asvf_level=1, direction_weight=None):
+    """
+    Compute Anisotropic Sky-view factor from horizon angles.
+
+    Parameters
+    ----------
+    horizon_arr : numpy.ndarray
+        Horizon angles, output of horizon_angles().
+    asvf_dir : int or float
+        Direction of anisotropy.
+    asvf_level : int
+        Level of anisotropy, 1-low, 2-high.
+    direction_weight : numpy.ndarray
+        Weight of each direction, if not None asvf_dir and asvf_level are ignored.
+
+    Returns
+    -------
+    asvf_out : numpy.ndarray
+        2D numpy array (numpy.ndarray) of anisotropic sky-view factor.
+    """
+    num_directions = horizon_arr.shape[0]
+    if direction_weight is None:
+        if asvf_level != 1 and asvf_level != 2:
+            raise Exception("rvt.visualization.asvf_from_horizon: asvf_level must be one of the following"
+                            "values (1-low, 2-high)!")
+        # same weights as in sky_view_factor
+        poly_level = [4, 8][asvf_level - 1]
+        min_weight = [0.4, 0.1][asvf_level - 1]
+        direction_weight = np.arange(num_directions) * (2 * np.pi / num_directions)
+        direction_weight = (1 - min_weight) * (np.cos((direction_weight - np.deg2rad(asvf_dir)) / 2)) ** poly_level \
+            + min_weight
+
+    float_dtype = rvt.engine.get_float_dtype()
+    asvf_out = np.zeros(horizon_arr.shape[1:], dtype=float_dtype)
+    for i_dir in range(num_directions):
+        # For SVF minimum possible angle is 0 (hemisphere)
+        angle = _horizon_angle_radians(horizon_arr, i_dir)
+        asvf_out += (1 - np.sin(np.maximum(angle, 0))) * float_dtype.type(direction_weight[i_dir])
+    asvf_out /= float_dtype.type(np.sum(direction_weight))
+    return asvf_out
+
+
+def opns_from_horizon(horizon_arr):
+    """
+    Compute Openness from horizon angles.
+
+    Parameters
+    ----------
+    horizon_arr : numpy.ndarray
+        Horizon angles, output of horizon_angles().
+
+    Returns
+    -------
+    opns_out : numpy.ndarray
+        2D numpy array (numpy.ndarray) of openness (in degrees).
+    """
+    num_directions = horizon_arr.shape[0]
+    float_dtype = rvt.engine.get_float_dtype()
+    opns_out = np.zeros(horizon_arr.shape[1:], dtype=float_dtype)
+    for i_dir in range(num_directions):
+        opns_out += _horizon_angle_radians(horizon_arr, i_dir)
+    opns_out /= -num_directions
+    opns_out += float_dtype.type(0.5 * np.pi)
+    return np.rad2deg(opns_out, out=opns_out)
+
+
+def shadow_from_horizon(horizon_arr, sun_azimuth=315, sun_elevation=35):
+    """
+    Compute binary shadows from horizon angles. Horizon angle in sun azimuth is linearly interpolated between the two
+    closest directions. Shadows are limited to the search radius of horizon angles.
+
+    Parameters
+    ----------
+    horizon_arr : numpy.ndarray
+        Horizon angles, output of horizon_angles().
+    sun_azimuth : int or float
+        Solar azimuth angle (clockwise from North) in degrees.
+    sun_elevation : int or float
+        Solar vertical angle (above the horizon) in degrees.
+
+    Returns
+    -------
+    shadow_out : numpy.ndarray
+        2D numpy array (numpy.ndarray) of shadows (0 - shadow, 1 - lit).
+    """
+    if sun_azimuth > 360 or sun_azimuth < 0:
+        raise Exception("rvt.visualization.shadow_from_horizon: sun_azimuth must be between 0 and 360!")
+    if sun_elevation > 90 or sun_elevation < 0:
+        raise Exception("rvt.visualization.shadow_from_horizon: sun_elevation must be between 0 and 90!")
+
+    num_directions = horizon_arr.shape[0]
+    # position of sun azimuth between directions of horizon angles
+    position = ((360 - sun_azimuth) % 360) / (360 / num_directions)
+    i_dir = int(np.floor(position)) % num_directions
+    weight = position - np.floor(position)
+    float_dtype = rvt.engine.get_float_dtype()
+    horizon = _horizon_angle_radians(horizon_arr, i_dir)
+    if weight > 0:
+        horizon *= float_dtype.type(1 - weight)
+        horizon += _horizon_angle_radians(horizon_arr, (i_dir + 1) % num_directions) * float_dtype.type(weight)
+
+    shadow_out = (horizon < np.deg2rad(sun_elevation)).astype(float_dtype)
+    shadow_out[np.isnan(horizon)] = np.nan
+    return shadow_out
+
+
 def local_dominance(dem,
                     min_rad=10,
                     max_rad=20,
@@ -796,7 +1409,10 @@ def local_dominance(dem,
                     angular_res=15,
                     observer_height=1.7,
                     ve_factor=1,
-                    no_data=None
+                    no_data=None,
+                    engine="numpy",
+                    buffer_pool=None,
+                    out=None
                     ):
     """
     Compute Local Dominance dem visualization.
@@ -820,26 +1436,38 @@ def local_dominance(dem,
         Vertical exaggeration factor.
     no_data : int or float
         Value that represents no_data, all pixels with this value are changed to np.nan .
+    engine : str
+        Engine of local dominance kernel ("numpy", "numba", "auto"), see rvt.engine.
+    buffer_pool : rvt.engine.BufferPool
+        Pool of reusable arrays, padded dem and scratch arrays are taken from it (and released back). If None, new
+        arrays are allocated.
+    out : numpy.ndarray
+        Optional array of the same shape as dem and of rvt.engine.get_float_dtype() to store the result into.
 
     Returns
     -------
     local_dom_out : numpy.ndarray
         2D numpy array of local dominance
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(local_dominance, dem, function_parameters=_dask_function_parameters(locals()))
     if dem.ndim != 2:
         raise Exception("rvt.visualization.local_dominance: dem has to be 2D np.array!")
     if not (10000 >= ve_factor >= -10000):
         raise Exception("rvt.visualization.local_dominance: ve_factor must be between -10000 and 10000!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
+
+    if out is not None and (out.shape != dem.shape or out.dtype != rvt.engine.get_float_dtype()):
+        raise Exception("rvt.visualization.local_dominance: out has to be array of the same shape as dem and of"
+                        " rvt.engine.get_float_dtype()!")
 
-    dem = dem.astype(np.float32)
-    # add max_rad pixel edge padding
+    dem = dem.astype(rvt.engine.get_float_dtype(), copy=False)
+    # add max_rad pixel edge padding (padded dem is a new array)
     pad_width = max_rad
-    dem = np.pad(array=dem, pad_width=pad_width, mode="edge")
-    dem = dem * ve_factor
+    dem = _pad_array(dem, pad_width=pad_width, mode="edge", buffer_pool=buffer_pool)
+    dem *= ve_factor
 
     # create a vector with possible distances
     n_dist = int((max_rad - min_rad) / rad_inc + 1)
@@ -857,29 +1485,27 @@ def local_dominance(dem,
     distances = (np.outer(np.ones(n_ang), distances)).reshape(n_shifts)
     dist_factor = 2 * distances + rad_inc
 
-    local_dom_out = dem * 0
-    for i_s in range(n_shifts):
-        dem_moved = np.roll(dem, int(round(y_t[i_s])), axis=0)
-        dem_moved = np.roll(dem_moved, int(round(x_t[i_s])), axis=1)
-        idx_lower = np.where((dem + observer_height) > dem_moved)
-        if idx_lower[0].size > 0:
-            local_dom_out[idx_lower[0], idx_lower[1]] = local_dom_out[idx_lower[0], idx_lower[1]] + \
-                                                        (dem[idx_lower[0], idx_lower[1]] + observer_height -
-                                                         dem_moved[idx_lower[0], idx_lower[1]]) / \
-                                                        distances[i_s] * dist_factor[i_s]
-    local_dom_out = local_dom_out / norma
+    shifts = np.array([(int(round(y_t[i_s])), int(round(x_t[i_s]))) for i_s in range(n_shifts)])
 
-    # Remove padding
-    local_dom_out = local_dom_out[pad_width:-pad_width, pad_width:-pad_width]
+    # sum over shifts (the same as np.roll(dem, shift, axis=(0, 1))), padding is removed by kernel
+    local_dom_out = rvt.engine.get_kernel("local_dominance", engine)(
+        dem=dem, pad=pad_width, shifts=shifts, distances=distances, dist_factor=dist_factor,
+        observer_height=observer_height, buffer_pool=buffer_pool
+    )
+    if out is None:
+        out = rvt.engine.get_buffer(buffer_pool, local_dom_out.shape, rvt.engine.get_float_dtype())
+    np.divide(local_dom_out, norma, out=out, casting="same_kind")
+    rvt.engine.release_buffer(buffer_pool, dem, local_dom_out)
 
-    return local_dom_out
+    return out
 
 
 def horizon_generate_coarse_dem(dem_fine,
                                 pyramid_scale,
                                 conv_from,
                                 conv_to,
-                                max_radius
+                                max_radius,
+                                engine="numpy"
                                 ):
     # first reduce the size for the edge required for horizon search
     dem_fine = dem_fine[max_radius:-max_radius, max_radius:-max_radius]
@@ -913,20 +1539,18 @@ def horizon_generate_coarse_dem(dem_fine,
     # pad the data to support np.move.
     dem_fine = np.pad(dem_fine, ((-conv_from, conv_to), (-conv_from, conv_to)), mode="symmetric")
 
-    # Convolution (keep maximum)
-    dem_convolve = np.zeros(dem_fine.shape)
-    for i in np.arange(pyramid_scale) + conv_from:
-        for j in np.arange(pyramid_scale) + conv_from:
-            dem_convolve = np.maximum(dem_convolve, np.roll(dem_fine, (i, j), axis=(0, 1)))
-    # Divide by pyramid_scale to account for the change of resolution
-    # (important for the angle computation later on)
-    dem_convolve = dem_convolve / pyramid_scale
-
     # Consider only the selected convoluted points according to the scale change.
     # As we select slice's end point make sure to consider at least 1 point more 
     # to the right / below to really include it (Python way of considering end index).
-    dem_coarse = dem_convolve[-conv_from:(n_lin_coarse * pyramid_scale + 1):pyramid_scale,
-                              -conv_from:(n_col_coarse * pyramid_scale + 1):pyramid_scale]
+    i_lin_coarse = np.arange(dem_fine.shape[0])[-conv_from:(n_lin_coarse * pyramid_scale + 1):pyramid_scale]
+    i_col_coarse = np.arange(dem_fine.shape[1])[-conv_from:(n_col_coarse * pyramid_scale + 1):pyramid_scale]
+
+    # Convolution (keep maximum), computed only in the selected points
+    max_decimation = rvt.engine.get_kernel("max_decimation", engine)
+    dem_coarse = max_decimation(dem_fine, i_lin_coarse, i_col_coarse, conv_from, pyramid_scale)
+    # Divide by pyramid_scale to account for the change of resolution
+    # (important for the angle computation later on)
+    dem_coarse = dem_coarse / pyramid_scale
 
     # Final padding to enable searching the horizon over the edge:
     # use constant-mode set to the minimal height, so it doesn't 
@@ -942,6 +1566,7 @@ def horizon_generate_pyramids(dem,
                               max_fine_radius=100,
                               max_pyramid_radius=7,
                               pyramid_scale=3,
+                              engine="numpy"
                               ):
     # In the levels higher than 1, determine the minimal search distance
     # and number of search distances.
@@ -998,7 +1623,8 @@ def horizon_generate_pyramids(dem,
             max_radius = max_pyramid_radius
         # determine the dict of shifts
         shift = horizon_shift_vector(num_directions, max_radius, min_radius)
-        dem_coarse = horizon_generate_coarse_dem(dem_fine, pyramid_scale, conv_from, conv_to, max_pyramid_radius)
+        dem_coarse = horizon_generate_coarse_dem(dem_fine, pyramid_scale, conv_from, conv_to, max_pyramid_radius,
+                                                 engine=engine)
         i_lin = np.arange(dem_fine.shape[0])
         i_col = np.arange(dem_fine.shape[1])
 
@@ -1025,7 +1651,8 @@ def sky_illumination(dem,
                      shadow_az=315,
                      shadow_el=35,
                      ve_factor=1,
-                     no_data=None
+                     no_data=None,
+                     engine="numpy"
                      ):
     """
     Compute topographic corrections for sky illumination.
@@ -1054,6 +1681,8 @@ def sky_illumination(dem,
         Vertical exaggeration factor.
     no_data : int or float
         Value that represents no_data, all pixels with this value are changed to np.nan .
+    engine : str
+        Engine of DEM pyramid (max decimation) kernel ("numpy", "numba", "auto"), see rvt.engine.
 
     Returns
     -------
@@ -1074,10 +1703,9 @@ def sky_illumination(dem,
         raise Exception("rvt.visualization.sky_illumination: resolution must be a positive number!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
     dem = dem * ve_factor
 
     if sky_model.lower() == "overcast":
@@ -1099,7 +1727,8 @@ def sky_illumination(dem,
                                         num_directions=num_directions,
                                         max_fine_radius=max_fine_radius,
                                         max_pyramid_radius=max_pyramid_radius,
-                                        pyramid_scale=pyramid_scale, )
+                                        pyramid_scale=pyramid_scale,
+                                        engine=engine)
     n_levels = np.max([i for i in pyramid])
 
     # get the convolution window indices
@@ -1113,13 +1742,13 @@ def sky_illumination(dem,
 
     # init the intermediate results for uniform SI
     uniform_a = np.zeros((dem.shape[0] + 2 * max_pyramid_radius, dem.shape[1] + 2 * max_pyramid_radius),
-                         dtype=np.float32)
+                         dtype=dem.dtype)
     uniform_b = np.copy(uniform_a)
     # init the output for overcast SI
     if compute_overcast:
-        overcast_out = np.zeros(dem.shape, dtype=np.float32)
+        overcast_out = np.zeros(dem.shape, dtype=dem.dtype)
         overcast_c = np.zeros((dem.shape[0] + 2 * max_pyramid_radius, dem.shape[1] + 2 * max_pyramid_radius),
-                              dtype=np.float32)
+                              dtype=dem.dtype)
         overcast_d = np.copy(overcast_c)
     else:
         overcast_out = None
@@ -1131,16 +1760,16 @@ def sky_illumination(dem,
         i = np.argmin(np.abs(_ - (360 - shadow_az)))
         shadow_az = _[i]
         # binary shadows
-        shadow_out = np.zeros(dem.shape, dtype=np.float32)
+        shadow_out = np.zeros(dem.shape, dtype=dem.dtype)
         # height of horizon in degrees
-        horizon_out = np.zeros(dem.shape, dtype=np.float32)
+        horizon_out = np.zeros(dem.shape, dtype=dem.dtype)
         # overcast model + binary shadow
         if compute_overcast:
-            overcast_sh_out = np.zeros(dem.shape, dtype=np.float32)
+            overcast_sh_out = np.zeros(dem.shape, dtype=dem.dtype)
         else:
             overcast_sh_out = None
         # uniform model + binary shadow
-        uniform_sh_out = np.zeros(dem.shape, dtype=np.float32)
+        uniform_sh_out = np.zeros(dem.shape, dtype=dem.dtype)
     else:
         shadow_out = None
         horizon_out = None
@@ -1151,7 +1780,7 @@ def sky_illumination(dem,
     for i_dir, direction in enumerate(pyramid[0]["shift"]):
         dir_rad = np.radians(direction)
         # reset maximum at each iteration (direction)
-        max_slope = np.zeros(pyramid[n_levels]["dem"].shape, dtype=np.float32) - 1000
+        max_slope = np.zeros(pyramid[n_levels]["dem"].shape, dtype=dem.dtype) - 1000
 
         for i_level in reversed(range(n_levels + 1)):
             height = pyramid[i_level]["dem"]
@@ -1190,7 +1819,7 @@ def sky_illumination(dem,
             horizon_out = np.degrees(_[max_pyramid_radius:-max_pyramid_radius, max_pyramid_radius:-max_pyramid_radius])
             shadow_out = (horizon_out < shadow_el) * 1
             if shadow_horizon_only:
-                return {"shadow": shadow_out, "horizon": horizon_out}
+                return {"shadow": shadow_out, "horizon": _to_float_dtype(horizon_out)}
 
     # because of numeric stability check if the uniform_b is less then pi
     uniform_out = da * np.cos(slope) * uniform_a + np.sin(slope) * np.minimum(uniform_b, np.pi)
@@ -1220,15 +1849,15 @@ def sky_illumination(dem,
     # dict_sky_illumination = {k: v for k, v in dict_sky_illumination.items() if v is not None}  # filter out none
     # return dict_sky_illumination
 
-    # output
+    # output (integration of horizon is float64, output is converted to rvt.engine.get_float_dtype())
     if compute_uniform and not compute_shadow:
-        return uniform_out
+        return _to_float_dtype(uniform_out)
     elif compute_uniform and compute_shadow:
-        return uniform_sh_out
+        return _to_float_dtype(uniform_sh_out)
     elif compute_overcast and not compute_shadow:
-        return overcast_out
+        return _to_float_dtype(overcast_out)
     elif compute_overcast and compute_shadow:
-        return overcast_sh_out
+        return _to_float_dtype(overcast_sh_out)
 
 
 def shadow_horizon(dem,
@@ -1236,7 +1865,8 @@ def shadow_horizon(dem,
                    shadow_az=315,
                    shadow_el=35,
                    ve_factor=1,
-                   no_data=None
+                   no_data=None,
+                   engine="numpy"
                    ):
     """
     Compute shadow and horizon.
@@ -1255,6 +1885,8 @@ def shadow_horizon(dem,
         Vertical exaggeration factor.
     no_data : int or float
         Value that represents no_data, all pixels with this value are changed to np.nan .
+    engine : str
+        Engine of DEM pyramid (max decimation) kernel ("numpy", "numba", "auto"), see rvt.engine.
 
     Returns
     -------
@@ -1274,7 +1906,7 @@ def shadow_horizon(dem,
 
     return sky_illumination(dem=dem, resolution=resolution, compute_shadow=True,
                             shadow_horizon_only=True, shadow_el=shadow_el, shadow_az=shadow_az, ve_factor=ve_factor,
-                            no_data=no_data)
+                            no_data=no_data, engine=engine)
 
 
 def msrm(dem,
@@ -1311,16 +1943,17 @@ def msrm(dem,
     msrm_out : numpy.ndarray
         2D numpy result array of Multi-scale relief model.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(msrm, dem, function_parameters=_dask_function_parameters(locals()))
     if not (10000 >= ve_factor >= -10000):
         raise Exception("rvt.visualization.msrm: ve_factor must be between -10000 and 10000!")
     if resolution < 0:
         raise Exception("rvt.visualization.msrm: resolution must be a positive number!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
     dem = dem * ve_factor
 
     if feature_min < resolution:  # feature_min can't be smaller than resolution
@@ -1332,22 +1965,29 @@ def msrm(dem,
     i = int(np.floor(((feature_min - resolution) / (2 * resolution)) ** (1 / scaling_factor)))
     n = int(np.ceil(((feature_max - resolution) / (2 * resolution)) ** (1 / scaling_factor)))
 
+    if n <= i:
+        raise Exception("rvt.visualization.msrm: feature_max is too small, there has to be at least two filtered"
+                        " surfaces!")
+
     # lpf = low pass filter
-    relief_models_sum = np.zeros(dem.shape)  # sum of all substitution of 2 consecutive
-    nr_relief_models = 0  # number of additions (substitutions of 2 consecutive surfaces)
-    last_lpf_surface = 0
-
-    # generation of filtered surfaces (lpf_surface)
-    for ndx in range(i, n + 1, 1):
-        kernel_radius = ndx ** scaling_factor
-        # calculate mean filtered surface
-        lpf_surface = mean_filter(dem=dem, kernel_radius=kernel_radius)
-        if not ndx == i:  # if not first surface
-            relief_models_sum += (last_lpf_surface - lpf_surface)  # substitution of 2 consecutive lpf_surface
-            nr_relief_models += 1
-        last_lpf_surface = lpf_surface
-
-    msrm_out = relief_models_sum / nr_relief_models
+    # MSRM is the mean of differences of consecutive filtered surfaces (kernel radius ndx ** scaling_factor for ndx
+    # from i to n). The sum of consecutive differences telescopes to (first - last) surface, so only these two
+    # surfaces are calculated, both from summed-area tables padded for the largest kernel.
+    nr_relief_models = n - i  # number of additions (substitutions of 2 consecutive surfaces)
+    first_kernel_radius = i ** scaling_factor
+    last_kernel_radius = n ** scaling_factor
+    dict_integral_images = padded_integral_images(dem=dem, pad_width=last_kernel_radius, mode="edge")
+    if first_kernel_radius == 0:
+        first_lpf_surface = dem
+    else:
+        first_lpf_surface = integral_image_mean(dem=dem, dict_integral_images=dict_integral_images,
+                                                kernel_radius=first_kernel_radius)
+    last_lpf_surface = integral_image_mean(dem=dem, dict_integral_images=dict_integral_images,
+                                           kernel_radius=last_kernel_radius)
+    del dict_integral_images
+
+    msrm_out = np.subtract(first_lpf_surface, last_lpf_surface, out=last_lpf_surface)
+    msrm_out /= nr_relief_models
 
     return msrm_out
 
@@ -1382,7 +2022,7 @@ def integral_image(dem, data_type=np.float64):
           [13. 26. 42. 49.]
           [19. 38. 61. 74.]]
     """
-    dem = dem.astype(data_type)
+    dem = dem.astype(data_type, copy=False)  # cumsum makes a new array anyway
     return dem.cumsum(axis=0).cumsum(axis=1)
 
 
@@ -1443,7 +2083,7 @@ def topographic_dev(dem, dem_i_nr_pixels, dem_i1, dem_i2, kernel_radius):
     return dev_out
 
 
-def max_elevation_deviation(dem, minimum_radius, maximum_radius, step):
+def max_elevation_deviation(dem, minimum_radius, maximum_radius, step, dict_integral_images=None):
     """
     Calculates maximum deviation from mean elevation, dev_max (Maximum Deviation from mean elevation) for each
     grid cell in a digital elevation model (DEM) across a range specified spatial scales.
@@ -1458,6 +2098,10 @@ def max_elevation_deviation(dem, minimum_radius, maximum_radius, step):
         Maximum radius to calculate DEV (topographic_dev).
     step : int
         Step from minimum to maximum radius to calc DEV (topographic_dev).
+    dict_integral_images : dict
+        Summed-area tables of dem from padded_integral_images (mode="symmetric", compute_squared=True) with pad_width
+        of at least maximum_radius. They can be shared between calls with different radii (e.g. mstp scales). If None,
+        they are calculated.
 
     Returns
     -------
@@ -1468,41 +2112,51 @@ def max_elevation_deviation(dem, minimum_radius, maximum_radius, step):
     maximum_radius = int(maximum_radius)
     step = int(step)
 
-    # store positions of nan
-    idx_nan_dem = np.isnan(dem)
-
-    dem_pad = np.pad(dem, (maximum_radius + 1, maximum_radius), mode="symmetric")
-    # store nans
-    idx_nan_dem_pad = np.isnan(dem_pad)
-    # change nan to 0
-    dem_pad[idx_nan_dem_pad] = 0
-
-    # number of pixels for summed area table
-    dem_i_nr_pixels = np.ones(dem_pad.shape)
-    dem_i_nr_pixels[idx_nan_dem_pad] = 0
-    dem_i_nr_pixels = integral_image(dem_i_nr_pixels, np.int64)
-
-    # This outputs float64, which is by design. Change final array to float32 at the end of the function (at return)
-    dem_i1 = integral_image(dem_pad)
-    dem_i2 = integral_image(dem_pad ** 2)
+    # Summed-area tables are float64, which is by design (float32 cumulative sums lose precision over large arrays).
+    # Change final array to rvt.engine.get_float_dtype() at the end of the function (at return)
+    if dict_integral_images is None:
+        dict_integral_images = padded_integral_images(dem=dem, pad_width=maximum_radius, mode="symmetric",
+                                                      compute_squared=True)
+    elif dict_integral_images["pad_width"] < maximum_radius or dict_integral_images["sum_squared"] is None:
+        raise Exception("rvt.visualization.max_elevation_deviation: dict_integral_images needs pad_width of at least"
+                        " maximum_radius and sum_squared!")
+    pad_width = dict_integral_images["pad_width"]
 
     for kernel_radius in range(minimum_radius, maximum_radius + 1, step):
-        dev = topographic_dev(dem_pad, dem_i_nr_pixels, dem_i1, dem_i2, kernel_radius)[
-              maximum_radius:-(maximum_radius + 1),
-              maximum_radius:-(maximum_radius + 1)]
+        # DEV - deviation from mean elevation, DEV(D) = (z0 - zmD) / sD (see topographic_dev)
+        if dict_integral_images["nr_pixels"] is None:
+            kernel_nr_pix_arr = (2 * kernel_radius + 1) ** 2
+        else:
+            kernel_nr_pix_arr = integral_image_box_sum(dem_i=dict_integral_images["nr_pixels"],
+                                                       kernel_radius=kernel_radius, pad_width=pad_width,
+                                                       shape=dem.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):  # Suppress warning for dividing by zero
+            dem_mean = integral_image_box_sum(dem_i=dict_integral_images["sum"], kernel_radius=kernel_radius,
+                                              pad_width=pad_width, shape=dem.shape)
+            dem_mean /= kernel_nr_pix_arr
+            dem_std = integral_image_box_sum(dem_i=dict_integral_images["sum_squared"], kernel_radius=kernel_radius,
+                                             pad_width=pad_width, shape=dem.shape)
+            dem_std /= kernel_nr_pix_arr
+            dem_std -= dem_mean ** 2
+            np.sqrt(np.abs(dem_std, out=dem_std), out=dem_std)
+            # returns nan values where division by zero happens
+        dem_std += 1e-6  # add 1e-6 to prevent division with 0
+        dev = dem - dem_mean
+        dev /= dem_std
         if kernel_radius == minimum_radius:
             dev_max_out = dev
-            rad_max_out = np.zeros_like(dev, dtype=np.float32) + kernel_radius
+            rad_max_out = np.zeros_like(dev, dtype=rvt.engine.get_float_dtype()) + kernel_radius
         else:
             rad_max_out = np.where(np.abs(dev_max_out) >= np.abs(dev), rad_max_out, kernel_radius)
             dev_max_out = np.where(np.abs(dev_max_out) >= np.abs(dev), dev_max_out, dev)
     # rad_max_out, radius of DEV for maxDEV (for each pixel)
 
     # change where dem nan back to nan
+    idx_nan_dem = np.isnan(dem)
     dev_max_out[idx_nan_dem] = np.nan
     rad_max_out[idx_nan_dem] = np.nan
 
-    return dev_max_out.astype(np.float32)
+    return dev_max_out.astype(rvt.engine.get_float_dtype())
 
 
 def mstp(dem,
@@ -1538,6 +2192,8 @@ def mstp(dem,
     msrm_out : numpy.ndarray
         3D numpy RGB result array of Multi-scale topographic position.
     """
+    if _is_dask_array(dem):
+        return dask_map_overlap(mstp, dem, function_parameters=_dask_function_parameters(locals()), out_nr_bands=3)
     if local_scale[0] > local_scale[1] or meso_scale[0] > meso_scale[1] or broad_scale[0] > broad_scale[1]:
         raise Exception("rvt.visualization.mstp: local_scale, meso_scale, broad_scale min has to be smaller than max!")
     if (local_scale[1] - local_scale[0] < local_scale[2]) or (meso_scale[1] - meso_scale[0] < meso_scale[2]) or \
@@ -1548,18 +2204,22 @@ def mstp(dem,
         raise Exception("rvt.visualization.mstp: ve_factor must be between -10000 and 10000!")
 
     # change no_data to np.nan
-    if no_data is not None:
-        dem[dem == no_data] = np.nan
+    _no_data_to_nan(dem, no_data)
 
-    dem = dem.astype(np.float32)
+    dem = dem.astype(rvt.engine.get_float_dtype())
     dem = dem * ve_factor
 
+    # summed-area tables for the largest radius are shared between all three scales
+    dict_integral_images = padded_integral_images(dem=dem,
+                                                  pad_width=max(local_scale[1], meso_scale[1], broad_scale[1]),
+                                                  mode="symmetric", compute_squared=True)
     local_dev = max_elevation_deviation(dem=dem, minimum_radius=local_scale[0], maximum_radius=local_scale[1],
-                                        step=local_scale[2])
+                                        step=local_scale[2], dict_integral_images=dict_integral_images)
     meso_dev = max_elevation_deviation(dem=dem, minimum_radius=meso_scale[0], maximum_radius=meso_scale[1],
-                                       step=meso_scale[2])
+                                       step=meso_scale[2], dict_integral_images=dict_integral_images)
     broad_dev = max_elevation_deviation(dem=dem, minimum_radius=broad_scale[0], maximum_radius=broad_scale[1],
-                                        step=broad_scale[2])
+                                        step=broad_scale[2], dict_integral_images=dict_integral_images)
+    del dict_integral_images
 
     cutoff = lightness
     # RGB order - broad, meso, local
@@ -1575,7 +2235,7 @@ def mstp(dem,
     green[green > 1] = 1
     blue[blue > 1] = 1
 
-    return np.asarray([red, green, blue])  # RGB float32 (3 x 32bit)
+    return np.asarray([red, green, blue])  # RGB (3 x rvt.engine.get_float_dtype())
 
 
 def fill_where_nan(dem, method="idw"):
@@ -1667,3 +2327,227 @@ def fill_where_nan(dem, method="idw"):
         raise Exception("rvt.visualization.fill_where_nan: Wrong method!")
 
     return dem_out
+
+
+def visualization_overlap(visualization_function, function_parameters=None):
+    """
+    Number of pixels from neighbouring area (overlap, halo) that visualization function needs to compute the same
+    result on a part of the DEM as on the whole DEM.
+
+    Parameters
+    ----------
+    visualization_function : Callable
+        Visualization function from rvt.vis (slope_aspect, hillshade, hillshade_batch, multi_hillshade, slrm,
+        sky_view_factor, horizon_angles, local_dominance, msrm, mstp).
+    function_parameters : dict
+        Visualization function parameters, parameters that are not defined have function default values.
+
+    Returns
+    -------
+    overlap : int
+        Overlap in pixels.
+    """
+    if function_parameters is None:
+        function_parameters = {}
+    signature_parameters = inspect.signature(visualization_function).parameters
+
+    def get_parameter(name):
+        if name in function_parameters:
+            return function_parameters[name]
+        return signature_parameters[name].default
+
+    if visualization_function in (slope_aspect, hillshade, hillshade_batch, multi_hillshade):
+        return 1
+    elif visualization_function == slrm:
+        return int(get_parameter("radius_cell"))
+    elif visualization_function in (sky_view_factor, horizon_angles):
+        return int(np.max(get_parameter("svf_r_max")))
+    elif visualization_function == local_dominance:
+        return int(get_parameter("max_rad"))
+    elif visualization_function == msrm:
+        resolution = get_parameter("resolution")
+        scaling_factor = int(get_parameter("scaling_factor"))
+        n = int(np.ceil(((get_parameter("feature_max") - resolution) / (2 * resolution)) ** (1 / scaling_factor)))
+        return n ** scaling_factor
+    elif visualization_function == mstp:
+        return int(get_parameter("broad_scale")[1]) + 1
+    else:
+        raise Exception("rvt.visualization.visualization_overlap: Overlap for this function is not known,"
+                        " define it (overlap)!")
+
+
+def _compute_row_band(visualization_function, dem, function_parameters, out_visualization_dict_key):
+    """Computes visualization function on one row band."""
+    visualization_out = visualization_function(dem=dem, **function_parameters)
+    if out_visualization_dict_key is not None:
+        visualization_out = visualization_out[out_visualization_dict_key]
+    return visualization_out
+
+
+def compute_in_row_bands(visualization_function,
+                         dem,
+                         function_parameters=None,
+                         overlap=None,
+                         n_jobs=-1,
+                         use_processes=False,
+                         out_visualization_dict_key=None
+                         ):
+    """
+    Splits DEM into row bands (with overlap to neighbouring bands), computes visualization function on bands in
+    parallel (thread or process pool) and joins results. Result is the same as computing visualization on the whole
+    DEM if overlap is large enough and visualization doesn't use statistics of the whole DEM (e.g. sky illumination
+    normalization).
+
+    Parameters
+    ----------
+    visualization_function : Callable
+        Visualization function, needs to have parameter called dem and return 2D or 3D (bands, rows, cols) array, or
+        dictionary of them.
+    dem : numpy.ndarray
+        Input digital elevation model as 2D numpy array.
+    function_parameters : dict
+        Visualization function parameters (without dem).
+    overlap : int
+        Number of rows from neighbouring bands, if None it is determined with visualization_overlap().
+    n_jobs : int
+        Number of parallel jobs (row bands), -1 uses all CPUs.
+    use_processes : bool
+        If True bands are computed in process pool else in thread pool (NumPy releases GIL in most operations).
+    out_visualization_dict_key : str or int
+        If output of visualization function is dictionary (or tuple), key of result array. If None, whole output is
+        used.
+
+    Returns
+    -------
+    visualization_out : numpy.ndarray or dict
+        Visualization of the whole DEM (dict of visualizations if function outputs dict and
+        out_visualization_dict_key is None).
+    """
+    if dem.ndim != 2:
+        raise Exception("rvt.visualization.compute_in_row_bands: dem has to be 2D np.array!")
+    if function_parameters is None:
+        function_parameters = {}
+    if overlap is None:
+        overlap = visualization_overlap(visualization_function, function_parameters)
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+
+    n_rows = dem.shape[0]
+    nr_bands = max(min(n_jobs, n_rows), 1)
+    if nr_bands == 1:
+        return _compute_row_band(visualization_function, dem, function_parameters, out_visualization_dict_key)
+
+    # row band limits (without and with overlap), bands are copied because some functions change input dem
+    band_limits = np.linspace(0, n_rows, nr_bands + 1).astype(int)
+    bands = []
+    for row_start, row_end in zip(band_limits[:-1], band_limits[1:]):
+        top = max(row_start - overlap, 0)
+        bottom = min(row_end + overlap, n_rows)
+        bands.append((row_start - top, row_end - top, dem[top:bottom].copy()))
+
+    pool_executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_executor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(_compute_row_band, visualization_function, band_dem, function_parameters,
+                                   out_visualization_dict_key) for _, _, band_dem in bands]
+        bands_out = [future.result() for future in futures]
+
+    def join_bands(bands_arr):
+        out = np.empty(bands_arr[0].shape[:-2] + (n_rows, bands_arr[0].shape[-1]), dtype=bands_arr[0].dtype)
+        for (row_start, row_end), (band_start, band_end, _), band_arr in zip(
+                zip(band_limits[:-1], band_limits[1:]), bands, bands_arr):
+            out[..., row_start:row_end, :] = band_arr[..., band_start:band_end, :]
+        return out
+
+    if isinstance(bands_out[0], dict):
+        return {key: join_bands([band_out[key] for band_out in bands_out]) for key in bands_out[0]}
+    return join_bands(bands_out)
+
+
+def _is_dask_array(arr):
+    """Checks if arr is dask array (False if dask is not installed)."""
+    return dask is not None and isinstance(arr, dask.array.Array)
+
+
+def _dask_function_parameters(function_locals):
+    """Visualization function parameters (without dem) for computing on dask array blocks."""
+    if function_locals.get("out") is not None:
+        raise Exception("rvt.visualization.dask_map_overlap: Parameter out is not supported for dask array dem!")
+    if function_locals.get("slope") is not None or function_locals.get("aspect") is not None:
+        raise Exception("rvt.visualization.dask_map_overlap: Parameters slope and aspect are not supported for dask"
+                        " array dem!")
+    # buffer pool is not thread safe and out is allocated by dask
+    return {key: value for key, value in function_locals.items() if key not in ("dem", "out", "buffer_pool")}
+
+
+def dask_map_overlap(visualization_function,
+                     dem,
+                     function_parameters=None,
+                     overlap=None,
+                     out_nr_bands=None,
+                     out_keys=None,
+                     dtype=None
+                     ):
+    """
+    Lazily computes visualization function on dask array DEM. Each chunk is extended with overlap (halo) from
+    neighbouring chunks, visualization is computed on the extended chunk and halo is trimmed away (dask map_overlap).
+    Edges of the whole DEM are not padded, they are handled by visualization function the same way as on numpy
+    array. Result is the same as computing visualization on the whole DEM if overlap is large enough, chunks have to
+    be larger than overlap.
+
+    Parameters
+    ----------
+    visualization_function : Callable
+        Visualization function, needs to have parameter called dem and return 2D or 3D (bands, rows, cols) array, or
+        dictionary of 2D arrays.
+    dem : dask.array.Array
+        Input digital elevation model as 2D dask array.
+    function_parameters : dict
+        Visualization function parameters (without dem).
+    overlap : int
+        Number of pixels from neighbouring chunks, if None it is determined with visualization_overlap().
+    out_nr_bands : int
+        Number of bands if visualization function returns 3D array (bands, rows, cols), None for 2D.
+    out_keys : list(str)
+        Keys of arrays if visualization function returns dictionary, None if it returns array.
+    dtype : numpy.dtype
+        Output data type, if None library float dtype (rvt.engine.get_float_dtype()).
+
+    Returns
+    -------
+    visualization_out : dask.array.Array or dict
+        Lazy visualization of the whole DEM (dict of them if out_keys is not None), compute it with .compute() or
+        store it with dask.array.store().
+    """
+    if dask is None:
+        raise Exception("rvt.visualization.dask_map_overlap: dask is not installed (pip install dask)!")
+    if dem.ndim != 2:
+        raise Exception("rvt.visualization.dask_map_overlap: dem has to be 2D dask array!")
+    if function_parameters is None:
+        function_parameters = {}
+    if overlap is None:
+        overlap = visualization_overlap(visualization_function, function_parameters)
+    if dtype is None:
+        dtype = rvt.engine.get_float_dtype()
+    if out_keys is not None:
+        out_nr_bands = len(out_keys)
+
+    def compute_block(dem_block):
+        # block is copied because some functions change input dem
+        block_out = visualization_function(dem=np.array(dem_block, copy=True), **function_parameters)
+        if out_keys is not None:
+            block_out = np.stack([block_out[key] for key in out_keys])
+        return block_out.astype(dtype, copy=False)
+
+    depth = {0: overlap, 1: overlap}
+    dem_overlap = dask.array.overlap.overlap(dem, depth=depth, boundary="none")
+    if out_nr_bands is None:
+        visualization_out = dem_overlap.map_blocks(compute_block, dtype=dtype)
+    else:
+        visualization_out = dem_overlap.map_blocks(compute_block, dtype=dtype, new_axis=0,
+                                                   chunks=((out_nr_bands,),) + dem_overlap.chunks)
+        depth = {1: overlap, 2: overlap}
+    visualization_out = dask.array.overlap.trim_internal(visualization_out, depth, boundary="none")
+
+    if out_keys is not None:
+        return {key: visualization_out[i_key] for i_key, key in enumerate(out_keys)}
+    return visualization_out
@@ -13,7 +13,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/EarthObservation/RVT_py",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=("benchmarks", "benchmarks.*")),
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Programming Language :: Python :: 3",
@@ -29,5 +29,6 @@ setuptools.setup(
         'ArcGIS Pro': 'https://github.com/EarthObservation/rvt-arcgis-pro',
         "QGIS plugin": 'https://github.com/EarthObservation/rvt-qgis'''
     },
-    install_requires=['numpy', 'scipy', 'gdal', 'matplotlib']
+    install_requires=['numpy', 'scipy', 'gdal', 'matplotlib'],
+    extras_require={'numba': ['numba'], 'dask': ['dask[array]']}
 )
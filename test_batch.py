@@ -0,0 +1,42 @@
+from pathlib import Path
+import shutil
+import rvt.batch
+import rvt.default
+import numpy as np
+
+# pytest rvt.batch
+
+dem_path = Path(r"test_data\TM1_564_146.tif")
+
+
+def test_save_visualizations_batch(tmp_path) -> None:
+    input_dir_path = tmp_path / "dems"
+    input_dir_path.mkdir()
+    for dem_name in ("dem_1.tif", "dem_2.tif"):
+        shutil.copy(dem_path, input_dir_path / dem_name)
+    default = rvt.default.DefaultValues()
+    default.hs_compute = 1
+    default.slp_compute = 1
+    dem_metadata = rvt.default.get_raster_metadata(dem_path.as_posix())
+    dem_nbytes = rvt.batch.estimate_job_nbytes(rvt_default=default, x_size=dem_metadata["x_size"],
+                                               y_size=dem_metadata["y_size"])
+
+    # whole DEM doesn't fit into memory budget, it is computed tile by tile
+    jobs = rvt.batch.save_visualizations_dir(input_dir_path=input_dir_path, rvt_default=default,
+                                             output_dir_path=tmp_path / "out", memory_budget=dem_nbytes // 2,
+                                             nr_processes=2)
+    assert [job.dem_path.name for job in jobs] == ["dem_1.tif", "dem_2.tif"]
+    for job in jobs:
+        assert job.error is None
+        assert job.tiled
+        assert job.nbytes <= dem_nbytes // 2
+        assert job.compute_time > 0
+
+    # reference, whole DEM in memory
+    jobs = rvt.batch.save_visualizations_batch(dem_paths=[input_dir_path / "dem_1.tif"], rvt_default=default,
+                                               output_dir_path=tmp_path / "out_ref", nr_processes=1)
+    assert not jobs[0].tiled
+    hillshade_name = default.get_hillshade_file_name(dem_path="dem_1.tif")
+    hillshade_tiled_arr = rvt.default.get_raster_arr((tmp_path / "out" / hillshade_name).as_posix())["array"]
+    hillshade_arr = rvt.default.get_raster_arr((tmp_path / "out_ref" / hillshade_name).as_posix())["array"]
+    assert np.allclose(hillshade_tiled_arr, hillshade_arr, atol=1e-5, equal_nan=True)
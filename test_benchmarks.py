@@ -0,0 +1,31 @@
+import json
+import numpy as np
+from benchmarks import suite
+from benchmarks import synthetic_dem
+
+# pytest benchmarks
+
+
+def test_synthetic_dem() -> None:
+    dem_arr = synthetic_dem.synthetic_dem(512, void_fraction=0.2, seed=1)
+    assert dem_arr.shape == (512, 512)
+    assert dem_arr.dtype == np.float32
+    assert np.isclose(np.mean(dem_arr == synthetic_dem.NO_DATA), 0.2, atol=0.01)
+    # the same seed gives the same DEM
+    assert np.array_equal(dem_arr, synthetic_dem.synthetic_dem(512, void_fraction=0.2, seed=1))
+    assert not np.array_equal(dem_arr, synthetic_dem.synthetic_dem(512, void_fraction=0.2, seed=2))
+
+
+def test_compare_results(tmp_path) -> None:
+    result = {"type": "result", "case": "vis.slrm", "group": "vis", "size": 512, "void_fraction": 0., "error": None,
+              "wall_time_min": 1., "peak_rss": None}
+    baseline_path = tmp_path / "baseline.jsonl"
+    baseline_path.write_text(json.dumps({"type": "environment"}) + "\n" + json.dumps(result) + "\n")
+    current_path = tmp_path / "current.jsonl"
+    current_path.write_text(json.dumps(dict(result, wall_time_min=1.2)) + "\n" +
+                            json.dumps(dict(result, case="vis.mstp", wall_time_min=2.)) + "\n")
+    comparison = suite.compare_results(baseline_path, current_path, threshold=0.1)
+    assert len(comparison) == 1
+    assert np.isclose(comparison[0]["ratio"], 1.2)
+    assert comparison[0]["regression"]
+    assert not suite.compare_results(baseline_path, current_path, threshold=0.5)[0]["regression"]
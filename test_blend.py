@@ -0,0 +1,77 @@
+import numpy as np
+import rvt.blend
+import rvt.default
+
+# pytest rvt.blend
+
+rng = np.random.default_rng(seed=0)
+dem_arr = np.cumsum(rng.random((120, 150)) * 5, axis=0).astype(np.float32)
+
+
+def create_vat_combination() -> rvt.blend.BlenderCombination:
+    combination = rvt.blend.BlenderCombination()
+    combination.create_layer(vis_method="Sky-View Factor", normalization="Value", minimum=0.7, maximum=1,
+                             blend_mode="Multiply", opacity=25)
+    combination.create_layer(vis_method="Openness - Positive", normalization="Value", minimum=68, maximum=93,
+                             blend_mode="Overlay", opacity=50)
+    combination.create_layer(vis_method="Slope gradient", normalization="Value", minimum=0, maximum=50,
+                             blend_mode="Luminosity", opacity=50)
+    combination.create_layer(vis_method="Hillshade", normalization="Value", minimum=0, maximum=1,
+                             blend_mode="Normal", opacity=100)
+    return combination
+
+
+def test_execution_plan() -> None:
+    combination = create_vat_combination()
+    combination_2 = rvt.blend.BlenderCombination()
+    combination_2.create_layer(vis_method="Openness - Negative", normalization="Value", minimum=60, maximum=95)
+    combination_2.create_layer(vis_method="Slope gradient", normalization="Value", minimum=0, maximum=50)
+    execution_plan = rvt.blend.create_execution_plan(combinations=[combination, combination_2])
+    # sky-view factor, positive and negative openness share one horizon search, slope is computed once
+    assert sorted(execution_plan) == ["hillshade", "horizon_search", "slope"]
+    assert execution_plan["horizon_search"] == {"sky-view factor": "svf", "openness - positive": "opns",
+                                                "openness - negative": "neg_opns"}
+
+    # the same visualization in layers with different min and max (each layer normalizes shared array)
+    combination_3 = rvt.blend.BlenderCombination()
+    combination_3.create_layer(vis_method="Sky-View Factor", normalization="Value", minimum=0.9, maximum=1,
+                               blend_mode="Multiply", opacity=50)
+    combination_3.create_layer(vis_method="Slope gradient", normalization="Value", minimum=10, maximum=20)
+
+    default = rvt.default.DefaultValues()
+    default.svf_r_max = 10
+    combinations = rvt.blend.BlenderCombinations()
+    combinations.add_combination(combination_3, name="svf_narrow")
+    combinations.add_combination(combination, name="VAT")
+    combinations.add_combination(combination_2, name="neg_opns_slope")
+    rendered_images = combinations.render_all_combinations(dem_arr=dem_arr, dem_resolution=1, default=default)
+    assert len(rendered_images) == 3
+    for rendered_image, single_combination in zip(rendered_images, (combination_3, combination, combination_2)):
+        single_combination.add_dem_arr(dem_arr=dem_arr, dem_resolution=1)
+        assert np.allclose(rendered_image, single_combination.render_all_images(default=default), equal_nan=True)
+
+
+def test_vat_combined_horizon_images() -> None:
+    import VAT_combined
+
+    general_combination = create_vat_combination()
+    flat_combination = create_vat_combination()
+    general_default = rvt.default.DefaultValues()
+    general_default.svf_r_max = 10
+    flat_default = rvt.default.DefaultValues()
+    flat_default.svf_r_max = 5
+    # the same combination objects for two DEMs of different shape (e.g. sequential processing of DEMs)
+    for dem in (dem_arr, dem_arr[:100, 20:].copy() * 2):
+        combinations = VAT_combined.add_horizon_images(
+            combinations=[general_combination, flat_combination], defaults=[general_default, flat_default],
+            dem_arr=dem, dem_resolution=1
+        )
+        for combination, default in zip(combinations, (general_default, flat_default)):
+            combination.add_dem_arr(dem_arr=dem, dem_resolution=1)
+            single_combination = create_vat_combination()
+            single_combination.add_dem_arr(dem_arr=dem, dem_resolution=1)
+            assert np.allclose(combination.render_all_images(default=default),
+                               single_combination.render_all_images(default=default), equal_nan=True)
+    # images are added to copies
+    assert all(layer.image is None for layer in general_combination.layers + flat_combination.layers)
+    assert general_combination.dem_arr is None
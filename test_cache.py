@@ -0,0 +1,39 @@
+import numpy as np
+import rvt.cache
+
+# pytest rvt.cache
+
+rng = np.random.default_rng(seed=0)
+dem_arr = rng.random((50, 60)).astype(np.float32)
+
+
+def test_cache_eviction(tmp_path, monkeypatch) -> None:
+    cache = rvt.cache.VisualizationCache(cache_dir=tmp_path.as_posix(), max_nbytes=None)
+    keys = [cache.key(dem=dem_arr, visualization="test", parameters={"i": i}) for i in range(10)]
+    cache.put(keys[0], dem_arr)
+    entry_nbytes = cache.nbytes()
+    cache.max_nbytes = 5.5 * entry_nbytes
+
+    # cache directory is scanned only when cache is full
+    nr_scans = [0]
+    entries = cache._entries
+
+    def count_entries():
+        nr_scans[0] += 1
+        return entries()
+
+    monkeypatch.setattr(cache, "_entries", count_entries)
+    for i in range(1, 5):
+        cache.put(keys[i], dem_arr + i)
+    assert nr_scans[0] == 0
+    assert cache._nbytes == 5 * entry_nbytes
+    cache.put(keys[5], dem_arr + 5)  # full, least recently used are removed until cache is at most 90 % of max
+    assert nr_scans[0] == 1
+    assert cache._nbytes == 4 * entry_nbytes == cache.nbytes()
+    assert cache.get(keys[0]) is None and cache.get(keys[1]) is None
+    assert np.array_equal(cache.get(keys[5]), dem_arr + 5)
+
+    # source code is part of key
+    assert len(rvt.cache.get_source_hash()) == 40
+    monkeypatch.setattr(rvt.cache, "_source_hash", "changed")
+    assert cache.key(dem=dem_arr, visualization="test", parameters={"i": 0}) != keys[0]
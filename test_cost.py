@@ -0,0 +1,38 @@
+import rvt.cost
+import rvt.default
+
+# pytest rvt.cost
+
+
+def test_auto_tile_size() -> None:
+    default = rvt.default.DefaultValues()
+    default.tile_size = "auto"
+    visualization = rvt.default.RVTVisualization.SKY_VIEW_FACTOR
+    # small DEM and enough memory, whole DEM in one tile
+    tile_size_x, tile_size_y, n_jobs = rvt.cost.auto_tile_size(visualization, default, x_size=1000, y_size=800,
+                                                               memory_budget=10 ** 10, max_jobs=1)
+    assert (tile_size_x, tile_size_y, n_jobs) == (1000, 800, 1)
+    # DEM which fits into memory is saved without tiles, also if cost model chooses more jobs (row bands)
+    default.tile_memory_limit = 10 ** 10
+    default.tile_max_jobs = 4
+    assert default.get_tile_size(visualization, 1000, 800)[:2] == (1000, 800)
+    assert not default.use_tiles(visualization, 1000, 800)
+    # sky illumination is normalized by maximum of the whole DEM, it isn't split into row bands
+    assert rvt.cost.auto_tile_size(rvt.default.RVTVisualization.SKY_ILLUMINATION, default, x_size=1000, y_size=800,
+                                   memory_budget=10 ** 10, max_jobs=4)[2] == 1
+    assert rvt.cost.auto_tile_size(rvt.default.RVTVisualization.SKY_ILLUMINATION, default, x_size=50000,
+                                   y_size=40000, memory_budget=2 * 10 ** 9, max_jobs=4)[2] == 1
+
+    # large DEM, tile fits into memory budget
+    memory_budget = 2 * 10 ** 9
+    tile_size_x, tile_size_y, n_jobs = rvt.cost.auto_tile_size(visualization, default, x_size=50000, y_size=40000,
+                                                               memory_budget=memory_budget, max_jobs=4)
+    assert tile_size_x < 50000 and tile_size_y < 40000 and 1 <= n_jobs <= 4
+    assert rvt.cost.estimate_tile_cost(visualization, default, (tile_size_y, tile_size_x),
+                                       n_jobs=n_jobs)[0] <= memory_budget
+
+    # visualization with larger overlap (MSTP) needs more memory and compute for the same tile
+    mstp_nbytes, mstp_compute = rvt.cost.estimate_tile_cost(
+        rvt.default.RVTVisualization.MULTI_SCALE_TOPOGRAPHIC_POSITION, default, (2000, 2000))
+    hs_nbytes, hs_compute = rvt.cost.estimate_tile_cost(rvt.default.RVTVisualization.HILLSHADE, default, (2000, 2000))
+    assert mstp_nbytes > hs_nbytes and mstp_compute > hs_compute
@@ -0,0 +1,129 @@
+from pathlib import Path
+from osgeo import gdal
+import rvt.cache
+import rvt.default
+import numpy as np
+
+# pytest rvt.default.get_raster_arr
+
+dem_path = Path(r"test_data\TM1_564_146.tif")
+
+
+def test_get_raster_arr_window_data_type() -> None:
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    window = (10, 20, 50, 30)  # x_off, y_off, x_size, y_size
+    out = np.empty((30, 50), dtype=np.float64)
+    window_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix(), window=window, out=out)
+    assert window_arr_dict["array"] is out
+    assert np.array_equal(out, dem_arr_dict["array"][20:50, 10:60], equal_nan=True)
+    float32_arr = rvt.default.get_raster_arr(dem_path.as_posix(), data_type=np.float32)["array"]
+    assert float32_arr.dtype == np.float32
+    assert np.allclose(float32_arr, dem_arr_dict["array"], equal_nan=True)
+
+
+def test_get_raster_arr_mem_map(tmp_path) -> None:
+    uncompressed_dem_path = tmp_path / "TM1_564_146_uncompressed.tif"
+    gdal.Translate(uncompressed_dem_path.as_posix(), dem_path.as_posix(), creationOptions=["COMPRESS=NONE"])
+    dem_arr = rvt.default.get_raster_arr(dem_path.as_posix())["array"]
+    mem_map_arr = rvt.default.get_raster_arr(uncompressed_dem_path.as_posix(), mem_map=True)["array"]
+    assert isinstance(mem_map_arr, np.memmap)
+    assert np.array_equal(mem_map_arr, dem_arr, equal_nan=True)
+    window_arr = rvt.default.get_raster_arr(uncompressed_dem_path.as_posix(), window=(5, 7, 40, 60),
+                                            mem_map=True)["array"]
+    assert np.array_equal(window_arr, dem_arr[7:67, 5:45], equal_nan=True)
+
+
+def test_raster_cache(tmp_path) -> None:
+    rvt.default.clear_raster_cache()
+    dem_data_set = rvt.default.open_raster(dem_path.as_posix())
+    assert rvt.default.open_raster(dem_path.as_posix()) is dem_data_set
+    dem_metadata = rvt.default.get_raster_metadata(dem_path.as_posix())
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    assert (dem_metadata["y_size"], dem_metadata["x_size"]) == dem_arr_dict["array"].shape
+    assert dem_metadata["resolution"] == dem_arr_dict["resolution"]
+    assert rvt.default.get_raster_size(dem_path.as_posix()) == (dem_metadata["x_size"], dem_metadata["y_size"])
+
+    # overwritten raster is reopened
+    out_path = tmp_path / "TM1_564_146_cache.tif"
+    rvt.default.save_raster(dem_path.as_posix(), out_path.as_posix(), dem_arr_dict["array"][:50])
+    assert rvt.default.get_raster_metadata(out_path.as_posix())["y_size"] == 50
+    rvt.default.save_raster(dem_path.as_posix(), out_path.as_posix(), dem_arr_dict["array"][:60])
+    assert rvt.default.get_raster_arr(out_path.as_posix())["array"].shape[0] == 60
+    rvt.default.clear_raster_cache()
+
+    # cached data sets are closed at the end of saving, nested saving keeps them open
+    default = rvt.default.DefaultValues()
+    default.slp_compute = 1
+    with rvt.default._raster_cache_run():
+        dem_data_set = rvt.default.open_raster(dem_path.as_posix())
+        default.save_slope(dem_path.as_posix(), custom_dir=tmp_path.as_posix())
+        assert rvt.default.open_raster(dem_path.as_posix()) is dem_data_set
+    assert not rvt.default._raster_cache
+    default.save_visualizations(dem_path.as_posix(), custom_dir=tmp_path.as_posix())
+    assert not rvt.default._raster_cache
+
+
+def test_get_valid_footprint(tmp_path) -> None:
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    dem_arr = dem_arr_dict["array"].astype(np.float32)
+    dem_arr[:, :dem_arr.shape[1] // 2] = -9999
+    dem_arr[5, 5] = 100  # one valid pixel makes footprint pixel valid
+    dem_no_data_path = tmp_path / "TM1_564_146_no_data.tif"
+    rvt.default.save_raster(dem_path.as_posix(), dem_no_data_path.as_posix(), dem_arr, no_data=-9999)
+    footprint = rvt.default.get_valid_footprint(dem_no_data_path.as_posix(), max_size=50)
+    assert max(footprint["array"].shape) <= 50
+    assert footprint["array"][0, 0]
+    assert not footprint["array"][-1, 0]
+    assert footprint["array"][:, -1].all()
+    assert rvt.default.get_valid_footprint(dem_path.as_posix(), max_size=50)["array"].all()
+    # footprint covers the same area as raster (size not divisible by factor)
+    footprint = rvt.default.get_valid_footprint(dem_no_data_path.as_posix(), max_size=150)
+    dem_gt = rvt.default.get_raster_metadata(dem_no_data_path.as_posix())["geo_transform"]
+    footprint_gt = footprint["geo_transform"]
+    rows, cols = footprint["array"].shape
+    assert np.isclose(cols * footprint["factor_x"], dem_arr.shape[1])
+    assert np.isclose(rows * footprint["factor_y"], dem_arr.shape[0])
+    assert np.isclose(footprint_gt[0] + cols * footprint_gt[1], dem_gt[0] + dem_arr.shape[1] * dem_gt[1])
+    assert np.isclose(footprint_gt[3] + rows * footprint_gt[5], dem_gt[3] + dem_arr.shape[0] * dem_gt[5])
+
+
+def test_visualization_cache(tmp_path) -> None:
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    default = rvt.default.DefaultValues()
+    default.cache = rvt.cache.VisualizationCache(cache_dir=tmp_path.as_posix())
+    slope_arr = default.get_slope(dem_arr=dem_arr_dict["array"], resolution_x=1, resolution_y=1,
+                                  no_data=dem_arr_dict["no_data"])
+    assert len(default.cache._entries()) == 1
+    cached_slope_arr = default.get_slope(dem_arr=dem_arr_dict["array"], resolution_x=1, resolution_y=1,
+                                         no_data=dem_arr_dict["no_data"])
+    assert np.array_equal(cached_slope_arr, slope_arr, equal_nan=True)
+    assert len(default.cache._entries()) == 1
+    # changed parameter is not taken from cache
+    default.slp_output_units = "percent"
+    percent_slope_arr = default.get_slope(dem_arr=dem_arr_dict["array"], resolution_x=1, resolution_y=1,
+                                          no_data=dem_arr_dict["no_data"])
+    assert len(default.cache._entries()) == 2
+    assert not np.array_equal(percent_slope_arr, slope_arr, equal_nan=True)
+    # least recently used are removed
+    default.cache.max_nbytes = default.cache.nbytes() - 1
+    default.cache.evict()
+    assert len(default.cache._entries()) == 1
+
+
+def test_calculate_visualization_row_bands() -> None:
+    rng = np.random.default_rng(seed=0)
+    dem_arr = np.cumsum(rng.random((120, 150)) * 5, axis=0).astype(np.float32)
+    default = rvt.default.DefaultValues()
+    default.svf_r_max = 8
+    default.ld_max_rad = 8
+    default.sim_shadow_dist = 10
+    default.msrm_feature_max = 10
+    default.mstp_meso_scale = (4, 10, 2)
+    default.mstp_broad_scale = (10, 20, 2)
+    for visualization in rvt.default.RVTVisualization:
+        vis_arr = default.calculate_visualization(visualization=visualization, dem=dem_arr.copy(), resolution_x=1,
+                                                  resolution_y=1)[0]
+        # visualizations which can't be split into row bands (shadow, sky illumination) are computed on the whole DEM
+        bands_vis_arr = default.calculate_visualization(visualization=visualization, dem=dem_arr.copy(),
+                                                        resolution_x=1, resolution_y=1, n_jobs=3)[0]
+        assert np.allclose(bands_vis_arr, vis_arr, atol=1e-3, equal_nan=True), visualization
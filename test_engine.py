@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+import rvt.engine
+import rvt.vis
+
+# pytest rvt.engine
+
+rng = np.random.default_rng(seed=0)
+dem_arr = np.cumsum(rng.random((80, 90)) * 5, axis=0).astype(np.float32)
+dem_arr[30:35, 40:50] = np.nan
+pad = 6
+dem_pad_arr = np.pad(dem_arr, pad_width=pad, mode="edge")
+shifts = np.array([(0, 1), (-2, 3), (6, -6), (5, 0), (-1, -4)])
+distances = np.sqrt(np.sum(shifts.astype(np.float64) ** 2, axis=1))
+
+
+@pytest.mark.parametrize("engine", rvt.engine.available_engines("horizon_slope"))
+def test_horizon_slope(engine) -> None:
+    max_slope_ref, min_slope_ref = rvt.engine.get_kernel("horizon_slope")(dem_pad_arr, pad, shifts, distances,
+                                                                          compute_max=True, compute_min=True)
+    max_slope, min_slope = rvt.engine.get_kernel("horizon_slope", engine)(dem_pad_arr, pad, shifts, distances,
+                                                                          compute_max=True, compute_min=True)
+    assert max_slope.shape == dem_arr.shape
+    assert np.allclose(max_slope, max_slope_ref, atol=1e-6, equal_nan=True)
+    assert np.allclose(min_slope, min_slope_ref, atol=1e-6, equal_nan=True)
+    assert rvt.engine.get_kernel("horizon_slope", engine)(dem_pad_arr, pad, shifts, distances)[1] is None
+
+
+@pytest.mark.parametrize("engine", rvt.engine.available_engines("local_dominance"))
+def test_local_dominance(engine) -> None:
+    local_dom_ref = rvt.engine.get_kernel("local_dominance")(dem_pad_arr, pad, shifts, distances, distances + 1, 1.7)
+    local_dom = rvt.engine.get_kernel("local_dominance", engine)(dem_pad_arr, pad, shifts, distances, distances + 1,
+                                                                 1.7)
+    assert np.allclose(local_dom, local_dom_ref, atol=1e-4, equal_nan=True)
+    assert np.all(np.isnan(local_dom[np.isnan(dem_arr)]))
+
+
+@pytest.mark.parametrize("engine", rvt.engine.available_engines("max_decimation"))
+def test_max_decimation(engine) -> None:
+    dem_negative_arr = dem_arr - 100  # window maximums start with 0
+    for window_from, window_size in ((0, 2), (-1, 3)):
+        row_indices = np.arange(-window_from, dem_arr.shape[0], window_size)
+        col_indices = np.arange(-window_from, dem_arr.shape[1], window_size)
+        max_ref = np.zeros(dem_arr.shape, dtype=dem_arr.dtype)
+        for i in range(window_from, window_from + window_size):
+            for j in range(window_from, window_from + window_size):
+                max_ref = np.maximum(max_ref, np.roll(dem_negative_arr, (i, j), axis=(0, 1)))
+        max_out = rvt.engine.get_kernel("max_decimation", engine)(dem_negative_arr, row_indices, col_indices,
+                                                                  window_from, window_size)
+        assert max_out.dtype == dem_arr.dtype
+        assert np.array_equal(max_out, max_ref[row_indices][:, col_indices], equal_nan=True)
+
+
+def test_vis_engine() -> None:
+    svf_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, svf_r_max=pad)["svf"]
+    svf_auto_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, svf_r_max=pad, engine="auto")["svf"]
+    assert np.allclose(svf_auto_arr, svf_arr, atol=1e-6, equal_nan=True)
+
+
+def test_get_kernel_fallback() -> None:
+    with pytest.warns(UserWarning):
+        kernel = rvt.engine.get_kernel("horizon_slope", "not_an_engine")
+    assert kernel is rvt.engine.horizon_slope_numpy
+    with pytest.raises(Exception):
+        rvt.engine.get_kernel("not_a_kernel")
+
+
+def test_buffer_pool() -> None:
+    buffer_pool = rvt.engine.BufferPool()
+    dict_svf_opns_ref = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_opns=True, svf_r_max=pad)
+    dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_opns=True, svf_r_max=pad,
+                                            buffer_pool=buffer_pool)
+    assert np.array_equal(dict_svf_opns["svf"], dict_svf_opns_ref["svf"], equal_nan=True)
+    assert np.array_equal(dict_svf_opns["opns"], dict_svf_opns_ref["opns"], equal_nan=True)
+    # outputs released back to the pool are reused by the next call
+    buffer_pool.release(*dict_svf_opns.values())
+    nbytes = buffer_pool.nbytes
+    dict_svf_opns_next = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_opns=True, svf_r_max=pad,
+                                                 buffer_pool=buffer_pool)
+    assert any(dict_svf_opns_next["svf"] is arr for arr in dict_svf_opns.values())
+    assert np.array_equal(dict_svf_opns_next["svf"], dict_svf_opns_ref["svf"], equal_nan=True)
+    buffer_pool.release(*dict_svf_opns_next.values())
+    assert buffer_pool.nbytes == nbytes
+
+    local_dom_arr = rvt.vis.local_dominance(dem=dem_arr, min_rad=2, max_rad=5)
+    out = np.empty(dem_arr.shape, dtype=rvt.engine.get_float_dtype())
+    assert rvt.vis.local_dominance(dem=dem_arr, min_rad=2, max_rad=5, buffer_pool=buffer_pool, out=out) is out
+    assert np.array_equal(out, local_dom_arr, equal_nan=True)
+
+    # least recently used arrays are dropped when the pool is too big
+    buffer_pool.max_nbytes = dem_arr.nbytes
+    buffer_pool.release(buffer_pool.get(dem_arr.shape, dtype=np.float32))
+    assert buffer_pool.nbytes <= dem_arr.nbytes
+
+    # arrays which weren't allocated by the pool are not taken
+    buffer_pool.clear()
+    buffer_pool.release(np.empty(dem_arr.shape, dtype=np.float32), dict_svf_opns_ref["svf"])
+    assert buffer_pool.nbytes == 0
+    pool_arr = buffer_pool.get(dem_arr.shape, dtype=np.float32)
+    buffer_pool.release(pool_arr, pool_arr[1:], pool_arr)
+    assert buffer_pool.nbytes == pool_arr.nbytes
+
+
+def test_float_dtype() -> None:
+    assert rvt.engine.get_float_dtype() == np.float32
+    svf_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, svf_r_max=pad)["svf"]
+    assert svf_arr.dtype == np.float32
+    rvt.engine.set_float_dtype(np.float64)
+    try:
+        svf_float64_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, svf_r_max=pad)["svf"]
+        assert svf_float64_arr.dtype == np.float64
+        assert rvt.vis.local_dominance(dem=dem_arr, min_rad=2, max_rad=5).dtype == np.float64
+        assert rvt.vis.mean_filter(dem=dem_arr.astype(np.float64), kernel_radius=3).dtype == np.float64
+        # scalars of functions from horizon angles don't lose precision
+        horizon_arr = rvt.vis.horizon_angles(dem=dem_arr, resolution=1, svf_r_max=pad, data_type=np.float32)
+        opns_arr = rvt.vis.opns_from_horizon(horizon_arr)
+        assert opns_arr.dtype == np.float64
+        assert np.allclose(opns_arr, np.rad2deg(0.5 * np.pi - horizon_arr.astype(np.float64).mean(axis=0)),
+                           rtol=0, atol=1e-10, equal_nan=True)
+    finally:
+        rvt.engine.set_float_dtype(np.float32)
+    assert np.allclose(svf_arr, svf_float64_arr, atol=1e-5, equal_nan=True)
+    with pytest.raises(Exception):
+        rvt.engine.set_float_dtype(np.int32)
@@ -0,0 +1,38 @@
+import json
+import numpy as np
+import rvt.profiling
+import rvt.vis
+
+# pytest rvt.profiling
+
+rng = np.random.default_rng(seed=0)
+dem_arr = np.cumsum(rng.random((120, 150)) * 5, axis=0).astype(np.float32)
+
+
+def test_profiling(tmp_path) -> None:
+    assert rvt.profiling.get_profiler() is None
+    profile_path = tmp_path / "profile.jsonl"
+    profiler = rvt.profiling.enable(out_path=profile_path.as_posix(), track_memory=True)
+    with rvt.profiling.labels(visualization="slp", tile=(0, 100)):
+        with rvt.profiling.stage("compute", npixels=dem_arr.size):
+            rvt.vis.slope_aspect(dem=dem_arr.copy(), resolution_x=1, resolution_y=1, no_data=-9999)
+    assert rvt.profiling.disable() is profiler
+    assert profiler.labels == {"visualization": None, "tile": None}
+
+    # nan stage is nested in compute stage
+    assert [record["stage"] for record in profiler.records] == ["nan", "compute"]
+    nan_record, compute_record = profiler.records
+    assert nan_record["visualization"] == "slp" and nan_record["tile"] == [0, 100]
+    assert nan_record["npixels"] == dem_arr.size
+    assert np.isclose(compute_record["self_time"], compute_record["time"] - nan_record["time"])
+    assert compute_record["peak_memory"] >= dem_arr.nbytes
+    with open(profile_path) as profile_file:
+        assert [json.loads(line) for line in profile_file] == profiler.records
+    summary = profiler.summary()
+    assert [(stage_summary["visualization"], stage_summary["stage"]) for stage_summary in summary] == \
+           [("slp", "compute"), ("slp", "nan")]
+    assert "compute" in profiler.summary_table()
+
+    # disabled, nothing is recorded
+    rvt.vis.slope_aspect(dem=dem_arr.copy(), resolution_x=1, resolution_y=1, no_data=-9999)
+    assert len(profiler.records) == 2
@@ -0,0 +1,29 @@
+import rvt.progress
+
+# pytest rvt.progress
+
+
+def test_progress() -> None:
+    assert rvt.progress.get_nr_tiles(x_size=250, y_size=100, tile_size_x=100, tile_size_y=100) == 3
+    progress_infos = []
+    progress = rvt.progress.Progress(nr_tiles=3, callback=progress_infos.append, name="slope")
+    progress.add_read(1000)
+    progress.add_written(400)
+    progress.tile_done(window=(0, 0, 100, 100))
+    progress.add_read(1000)
+    progress.tile_done(window=(100, 0, 100, 100), skipped=True)
+    progress_info = progress.tile_done(window=(200, 0, 50, 100))
+
+    assert [info["tile_index"] for info in progress_infos] == [0, 1, 2]
+    assert progress_infos[-1] is progress_info
+    assert progress_infos[1]["skipped"] and not progress_infos[2]["skipped"]
+    assert progress_info["window"] == (200, 0, 50, 100)
+    assert progress_info["bytes_read"] == 2000 and progress_info["bytes_written"] == 400
+    assert progress_infos[0]["eta"] > 0
+    assert progress_info["eta"] == 0
+    assert progress_info["tiles_per_s"] > 0
+    assert rvt.progress.format_progress(progress_info).startswith("slope: Finished tile 3 of 3")
+
+    # without callback progress is only counted
+    progress = rvt.progress.Progress(nr_tiles=1)
+    assert progress.tile_done()["tile_index"] == 0
@@ -1,4 +1,7 @@
 from pathlib import Path
+from osgeo import gdal
+import pytest
+import rvt.profiling
 import rvt.tile
 import rvt.vis
 import rvt.default
@@ -124,3 +127,180 @@ def test_multi_hillshade_tile_by_tile() -> None:
         nr_directions=nr_directions
     )
     assert np.array_equal(multi_hillshade_tile_by_tile_arr, multi_hillshade_arr, equal_nan=True)
+
+
+def test_hillshade_tile_by_tile_cog() -> None:
+    out_hillshade_path = Path(r"test_data\TM1_564_146_test_tile_hillshade_cog.tif")
+    function_parameters = {"resolution_x": None, "resolution_y": None, "no_data": None}
+    rvt.tile.save_visualization_tile_by_tile(
+        visualization_function=rvt.vis.hillshade,
+        function_parameters=function_parameters,
+        dem_path=dem_path,
+        overlap=1,
+        tile_size_x=128,
+        tile_size_y=128,
+        out_raster_path=out_hillshade_path,
+        out_raster_e_type=6,
+        out_raster_nr_of_bands=1,
+        cog=True
+    )
+    hillshade_arr = rvt.default.get_raster_arr(out_hillshade_path.as_posix())["array"]
+    dem_metadata = rvt.default.get_raster_metadata(dem_path.as_posix())
+    overview_levels = rvt.tile._get_overview_levels(dem_metadata["x_size"], dem_metadata["y_size"], 128, 128)
+    band = rvt.default.open_raster(out_hillshade_path.as_posix()).GetRasterBand(1)
+    assert band.GetOverviewCount() == len(overview_levels)
+    for i_overview, factor in enumerate(overview_levels):
+        overview_arr = band.GetOverview(i_overview).ReadAsArray()
+        assert np.allclose(overview_arr, rvt.tile._downsample_average(hillshade_arr, factor), equal_nan=True)
+
+
+def test_slope_8bit_tile_by_tile_cog(tmp_path) -> None:
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    dem_arr = dem_arr_dict["array"].astype(np.float32)
+    dem_arr[:301, :255] = -9999  # no_data edge goes through tiles and overview blocks
+    dem_no_data_path = tmp_path / "TM1_564_146_no_data.tif"
+    rvt.default.save_raster(dem_path.as_posix(), dem_no_data_path.as_posix(), dem_arr, no_data=-9999)
+    default = rvt.default.DefaultValues()
+    default.tile_size = (128, 128)
+    default.cog = True
+    rvt.tile.save_rvt_visualization_tile_by_tile(
+        rvt_visualization=rvt.default.RVTVisualization.SLOPE,
+        rvt_default=default,
+        dem_path=dem_no_data_path,
+        output_dir_path=tmp_path,
+        save_float=False,
+        save_8bit=True
+    )
+    out_slope_8bit_path = default.get_visualization_path(rvt.default.RVTVisualization.SLOPE, dem_no_data_path,
+                                                         tmp_path, path_8bit=True)
+    slope_8bit_arr = rvt.default.get_raster_arr(out_slope_8bit_path.as_posix())["array"]
+    band = rvt.default.open_raster(out_slope_8bit_path.as_posix()).GetRasterBand(1)
+    assert band.GetOverviewCount() == 1
+    overview_arr = band.GetOverview(0).ReadAsArray()
+    # overview is average of valid pixels, no_data (255) is not averaged
+    slope_8bit_blocks = np.where(slope_8bit_arr == 255, np.nan, slope_8bit_arr).reshape(500, 2, 500, 2)
+    with np.errstate(invalid="ignore"):
+        expected_overview_arr = np.nansum(slope_8bit_blocks, axis=(1, 3)) / \
+                                np.sum(~np.isnan(slope_8bit_blocks), axis=(1, 3))
+    expected_overview_arr[np.isnan(expected_overview_arr)] = 255
+    assert np.allclose(overview_arr, expected_overview_arr, atol=0.5)
+    assert np.all(overview_arr[:150, :127] == 255)
+
+
+def test_svf_tile_by_tile_streaming() -> None:
+    out_svf_path = Path(r"test_data\TM1_564_146_test_tile_svf_streaming.tif")
+    svf_r_max = 30  # overlap larger than part of tile size, overlap rows are reused from several previous rows
+    function_parameters = {"resolution": None, "no_data": None, "svf_r_max": svf_r_max}
+    rvt.tile.save_visualization_tile_by_tile(
+        visualization_function=rvt.vis.sky_view_factor,
+        function_parameters=function_parameters,
+        dem_path=dem_path,
+        overlap=svf_r_max,
+        tile_size_x=tile_size_x,
+        tile_size_y=50,
+        out_raster_path=out_svf_path,
+        out_raster_e_type=6,
+        out_raster_nr_of_bands=1,
+        out_visualization_dict_key="svf",
+        streaming=True
+    )
+    svf_tile_by_tile_arr = rvt.default.get_raster_arr(out_svf_path.as_posix())["array"]
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    svf_arr = rvt.vis.sky_view_factor(
+        dem=dem_arr_dict["array"],
+        resolution=dem_arr_dict["resolution"][0],
+        no_data=dem_arr_dict["no_data"],
+        svf_r_max=svf_r_max
+    )["svf"]
+    assert np.array_equal(svf_tile_by_tile_arr, svf_arr, equal_nan=True)
+
+
+def test_svf_tile_by_tile_skip_no_data(tmp_path) -> None:
+    dem_arr_dict = rvt.default.get_raster_arr(dem_path.as_posix())
+    dem_arr = dem_arr_dict["array"].astype(np.float32)
+    dem_arr[:2 * tile_size_y, :tile_size_x] = -9999  # 2 no_data tiles
+    dem_arr[2 * tile_size_y + 10, 10] = -9999
+    dem_no_data_path = tmp_path / "TM1_564_146_no_data.tif"
+    rvt.default.save_raster(dem_path.as_posix(), dem_no_data_path.as_posix(), dem_arr, no_data=-9999)
+    computed_tiles = []
+    progress_infos = []
+
+    def sky_view_factor(dem, **kwargs):
+        computed_tiles.append(dem.shape)
+        return rvt.vis.sky_view_factor(dem=dem, **kwargs)
+
+    out_svf_path = tmp_path / "TM1_564_146_test_tile_svf_no_data.tif"
+    svf_r_max = 10
+    rvt.tile.save_visualization_tile_by_tile(
+        visualization_function=sky_view_factor,
+        function_parameters={"resolution": None, "no_data": None, "svf_r_max": svf_r_max},
+        dem_path=dem_no_data_path,
+        overlap=svf_r_max,
+        tile_size_x=tile_size_x,
+        tile_size_y=tile_size_y,
+        out_raster_path=out_svf_path,
+        out_raster_e_type=6,
+        out_raster_nr_of_bands=1,
+        out_visualization_dict_key="svf",
+        skip_no_data=True,
+        progress_callback=progress_infos.append
+    )
+    nr_tiles = int(np.ceil(dem_arr.shape[0] / tile_size_y) * np.ceil(dem_arr.shape[1] / tile_size_x))
+    assert len(computed_tiles) == nr_tiles - 2
+    assert [progress_info["tile_index"] for progress_info in progress_infos] == list(range(nr_tiles))
+    assert progress_infos[0]["window"] == (0, 0, tile_size_x, tile_size_y) and progress_infos[0]["skipped"]
+    assert sum(progress_info["skipped"] for progress_info in progress_infos) == 2
+    assert progress_infos[-1]["eta"] == 0
+    assert progress_infos[-1]["bytes_written"] == dem_arr.size * 4
+    svf_tile_by_tile_arr = rvt.default.get_raster_arr(out_svf_path.as_posix())["array"]
+    svf_arr = rvt.vis.sky_view_factor(
+        dem=dem_arr,
+        resolution=dem_arr_dict["resolution"][0],
+        no_data=-9999,
+        svf_r_max=svf_r_max
+    )["svf"]
+    assert np.array_equal(svf_tile_by_tile_arr, svf_arr, equal_nan=True)
+
+
+def test_write_no_data_tile() -> None:
+    # no_data tile is written with no_data value of band in its data type
+    for e_type, no_data, expected_no_data in ((gdal.GDT_Int16, -32768, -32768), (gdal.GDT_UInt16, None, 0),
+                                              (gdal.GDT_Byte, None, rvt.tile._NO_DATA_8BIT),
+                                              (gdal.GDT_Float32, -9999, -9999), (gdal.GDT_Float32, None, np.nan)):
+        out_ds = gdal.GetDriverByName("MEM").Create("", 120, 80, 2, e_type)
+        if no_data is not None:
+            out_ds.GetRasterBand(1).SetNoDataValue(no_data)
+        rvt.tile._write_no_data_tile(out_ds=out_ds, x=20, y=10, cols=100, rows=70)
+        out_arr = out_ds.ReadAsArray()
+        assert out_arr.dtype == rvt.tile._get_band_no_data(out_ds.GetRasterBand(1))[0]
+        assert np.array_equal(out_arr[:, 10:, 20:], np.full((2, 70, 100), expected_no_data, dtype=out_arr.dtype),
+                              equal_nan=True)
+
+
+def test_tile_by_tile_profiling_labels(tmp_path) -> None:
+    profiler = rvt.profiling.enable()
+
+    def failing_slope_aspect(dem, **kwargs):
+        raise ValueError("failing_slope_aspect")
+
+    try:
+        with pytest.raises(ValueError):
+            rvt.tile.save_visualization_tile_by_tile(
+                visualization_function=failing_slope_aspect,
+                function_parameters={},
+                dem_path=dem_path,
+                overlap=1,
+                tile_size_x=tile_size_x,
+                tile_size_y=tile_size_y,
+                out_raster_path=tmp_path / "TM1_564_146_test_tile_failing.tif"
+            )
+        assert profiler.labels == {"visualization": None, "tile": None}
+        # generator closed before the last tile
+        tiles = rvt.tile._iterate_tiles(dem_ds=rvt.default.open_raster(dem_path.as_posix()), overlap=1,
+                                        tile_size_x=tile_size_x, tile_size_y=tile_size_y)
+        next(tiles)
+        assert profiler.labels["tile"] == (0, 0)
+        tiles.close()
+        assert profiler.labels["tile"] is None
+    finally:
+        rvt.profiling.disable()
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+import rvt.vis
+
+# pytest rvt.vis
+
+rng = np.random.default_rng(seed=0)
+dem_arr = np.cumsum(rng.random((120, 150)) * 5, axis=0).astype(np.float32)
+dem_arr[40:45, 60:70] = np.nan
+
+
+def test_multi_hillshade() -> None:
+    nr_directions = 8
+    multi_hillshade_arr = rvt.vis.multi_hillshade(dem=dem_arr, resolution_x=1, resolution_y=1,
+                                                  nr_directions=nr_directions, sun_elevation=35)
+    assert multi_hillshade_arr.shape == (nr_directions,) + dem_arr.shape
+    assert multi_hillshade_arr.dtype == np.float32
+    for i_direction in range(nr_directions):
+        hillshade_arr = rvt.vis.hillshade(dem=dem_arr, resolution_x=1, resolution_y=1,
+                                          sun_azimuth=(360 / nr_directions) * i_direction, sun_elevation=35)
+        assert np.allclose(multi_hillshade_arr[i_direction], hillshade_arr, atol=1e-6, equal_nan=True)
+
+
+def test_hillshade_batch_elevations() -> None:
+    out = np.empty((2,) + dem_arr.shape, dtype=np.float32)
+    hillshades_arr = rvt.vis.hillshade_batch(dem=dem_arr, resolution_x=1, resolution_y=1, sun_azimuth=(315, 90),
+                                             sun_elevation=(35, 60), out=out)
+    assert hillshades_arr is out
+    hillshade_arr = rvt.vis.hillshade(dem=dem_arr, resolution_x=1, resolution_y=1, sun_azimuth=90, sun_elevation=60)
+    assert np.allclose(hillshades_arr[1], hillshade_arr, atol=1e-6, equal_nan=True)
+
+
+def test_slope_aspect_nan_edges() -> None:
+    # reference derivatives with np.roll based NaN filling
+    dem_pad = np.pad(dem_arr, pad_width=1, mode="edge")
+    dzdx = ((rvt.vis.roll_fill_nans(dem_pad, 1, axis=1) - rvt.vis.roll_fill_nans(dem_pad, -1, axis=1)) / 2)[1:-1, 1:-1]
+    dzdy = ((rvt.vis.roll_fill_nans(dem_pad, -1, axis=0) - rvt.vis.roll_fill_nans(dem_pad, 1, axis=0)) / 2)[1:-1, 1:-1]
+    dzdy[dzdy == 0] = 10e-9
+    slope_arr = np.arctan(np.sqrt(dzdx ** 2 + dzdy ** 2))
+    aspect_arr = np.arctan2(dzdx, dzdy)
+    slope_arr[np.isnan(dem_arr)] = np.nan
+    aspect_arr[np.isnan(dem_arr)] = np.nan
+
+    dict_slp_asp = rvt.vis.slope_aspect(dem=dem_arr, resolution_x=1, resolution_y=1, output_units="radian")
+    assert dict_slp_asp["slope"].dtype == np.float32
+    assert np.allclose(dict_slp_asp["slope"], slope_arr, atol=1e-6, equal_nan=True)
+    assert np.allclose(dict_slp_asp["aspect"], aspect_arr, atol=1e-6, equal_nan=True)
+
+
+def test_byte_scale_no_data() -> None:
+    data_arr = np.array([dem_arr, dem_arr * 2])
+    data_arr[:, 0, 0] = -9999
+    data_copy_arr = data_arr.copy()
+    out = np.empty(data_arr.shape, dtype=np.uint8)
+    byte_arr = rvt.vis.byte_scale(data=data_arr, no_data=-9999, out=out)
+    assert byte_arr is out
+    assert np.array_equal(data_arr, data_copy_arr, equal_nan=True)  # input is not changed
+    assert np.all(byte_arr[:, 0, 0] == 255)
+    assert np.all(byte_arr[np.isnan(data_arr)] == 255)
+    # each band is scaled with its own min and max
+    assert np.array_equal(byte_arr[0], byte_arr[1])
+    assert byte_arr[0][~np.isnan(dem_arr)].min() == 0
+
+
+def test_msrm() -> None:
+    # reference, mean of differences of all consecutive filtered surfaces
+    i, n, scaling_factor = 0, 4, 2  # feature_min=1, feature_max=20, resolution=1
+    lpf_surfaces = [rvt.vis.mean_filter(dem=dem_arr, kernel_radius=ndx ** scaling_factor) for ndx in range(i, n + 1)]
+    msrm_arr = np.mean([lpf_surfaces[k] - lpf_surfaces[k + 1] for k in range(n - i)], axis=0)
+
+    msrm_out = rvt.vis.msrm(dem=dem_arr, resolution=1, feature_min=1, feature_max=20, scaling_factor=scaling_factor)
+    assert np.allclose(msrm_out, msrm_arr, atol=1e-4, equal_nan=True)
+
+
+def test_neg_opns() -> None:
+    neg_opns_arr = rvt.vis.sky_view_factor(dem=-dem_arr, resolution=1, compute_svf=False, compute_opns=True)["opns"]
+    dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=True, compute_opns=True,
+                                            compute_neg_opns=True)
+    assert np.allclose(dict_svf_opns["neg_opns"], neg_opns_arr, atol=1e-4, equal_nan=True)
+    opns_arr = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=False, compute_opns=True)["opns"]
+    assert np.array_equal(dict_svf_opns["opns"], opns_arr, equal_nan=True)
+
+
+def test_sky_view_factor_multi_radius() -> None:
+    list_dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=True, compute_opns=True,
+                                                 svf_r_max=[10, 20, 20], svf_noise=[0, 0, 3])
+    assert len(list_dict_svf_opns) == 3
+    for dict_svf_opns, svf_r_max, svf_noise in zip(list_dict_svf_opns, (10, 20, 20), (0, 0, 3)):
+        dict_ref = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=True, compute_opns=True,
+                                           svf_r_max=svf_r_max, svf_noise=svf_noise)
+        assert np.array_equal(dict_svf_opns["svf"], dict_ref["svf"], equal_nan=True)
+        assert np.array_equal(dict_svf_opns["opns"], dict_ref["opns"], equal_nan=True)
+
+
+def test_horizon_angles() -> None:
+    dict_svf_asvf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=True, compute_asvf=True,
+                                                 compute_opns=True, asvf_dir=200, asvf_level=2)
+    horizon_arr = rvt.vis.horizon_angles(dem=dem_arr, resolution=1, data_type=np.float32)
+    assert horizon_arr.shape == (16,) + dem_arr.shape
+    assert np.allclose(rvt.vis.svf_from_horizon(horizon_arr), dict_svf_asvf_opns["svf"], atol=1e-5, equal_nan=True)
+    assert np.allclose(rvt.vis.asvf_from_horizon(horizon_arr, asvf_dir=200, asvf_level=2), dict_svf_asvf_opns["asvf"],
+                       atol=1e-5, equal_nan=True)
+    assert np.allclose(rvt.vis.opns_from_horizon(horizon_arr), dict_svf_asvf_opns["opns"], atol=1e-3, equal_nan=True)
+    # quantized horizon angles
+    horizon_8bit_arr = rvt.vis.horizon_angles(dem=dem_arr, resolution=1, data_type=np.uint8)
+    assert np.all(horizon_8bit_arr[:, np.isnan(dem_arr)] == 255)
+    assert np.allclose(rvt.vis.svf_from_horizon(horizon_8bit_arr), dict_svf_asvf_opns["svf"], atol=0.01,
+                       equal_nan=True)
+    # horizon in the direction of the sun (azimuth 0 is the first direction)
+    shadow_arr = rvt.vis.shadow_from_horizon(horizon_arr, sun_azimuth=0, sun_elevation=10)
+    assert np.array_equal(shadow_arr == 0, horizon_arr[0] >= np.deg2rad(10))
+
+
+def test_compute_in_row_bands() -> None:
+    function_parameters = {"resolution": 1, "compute_svf": True, "compute_opns": True, "svf_r_max": 8}
+    dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, **function_parameters)
+    dict_bands_svf_opns = rvt.vis.compute_in_row_bands(rvt.vis.sky_view_factor, dem=dem_arr,
+                                                       function_parameters=function_parameters, n_jobs=3)
+    assert np.array_equal(dict_bands_svf_opns["svf"], dict_svf_opns["svf"], equal_nan=True)
+    assert np.array_equal(dict_bands_svf_opns["opns"], dict_svf_opns["opns"], equal_nan=True)
+
+    slrm_arr = rvt.vis.slrm(dem=dem_arr, radius_cell=15)
+    bands_slrm_arr = rvt.vis.compute_in_row_bands(rvt.vis.slrm, dem=dem_arr, function_parameters={"radius_cell": 15},
+                                                  n_jobs=4)
+    assert rvt.vis.visualization_overlap(rvt.vis.slrm, {"radius_cell": 15}) == 15
+    assert np.allclose(bands_slrm_arr, slrm_arr, atol=1e-3, equal_nan=True)
+
+
+def test_dask_map_overlap() -> None:
+    dask_array = pytest.importorskip("dask.array")
+    dem_dask = dask_array.from_array(dem_arr, chunks=(50, 60))
+    dict_svf_opns = rvt.vis.sky_view_factor(dem=dem_arr, resolution=1, compute_svf=True, compute_opns=True,
+                                            svf_r_max=8)
+    dict_dask_svf_opns = rvt.vis.sky_view_factor(dem=dem_dask, resolution=1, compute_svf=True, compute_opns=True,
+                                                 svf_r_max=8)
+    assert np.array_equal(dict_dask_svf_opns["svf"].compute(), dict_svf_opns["svf"], equal_nan=True)
+    assert np.array_equal(dict_dask_svf_opns["opns"].compute(), dict_svf_opns["opns"], equal_nan=True)
+
+    multi_hillshade_arr = rvt.vis.multi_hillshade(dem=dem_arr, resolution_x=1, resolution_y=1, nr_directions=4)
+    dask_multi_hillshade_arr = rvt.vis.multi_hillshade(dem=dem_dask, resolution_x=1, resolution_y=1, nr_directions=4)
+    assert dask_multi_hillshade_arr.shape == multi_hillshade_arr.shape
+    assert np.allclose(dask_multi_hillshade_arr.compute(), multi_hillshade_arr, atol=1e-6, equal_nan=True)
+
+
+def test_max_elevation_deviation_shared_integral_images() -> None:
+    dict_integral_images = rvt.vis.padded_integral_images(dem=dem_arr, pad_width=40, mode="symmetric",
+                                                          compute_squared=True)
+    for minimum_radius, maximum_radius, step in ((3, 21, 2), (23, 40, 9)):
+        dev_arr = rvt.vis.max_elevation_deviation(dem=dem_arr, minimum_radius=minimum_radius,
+                                                  maximum_radius=maximum_radius, step=step)
+        shared_dev_arr = rvt.vis.max_elevation_deviation(dem=dem_arr, minimum_radius=minimum_radius,
+                                                         maximum_radius=maximum_radius, step=step,
+                                                         dict_integral_images=dict_integral_images)
+        assert np.allclose(shared_dev_arr, dev_arr, atol=1e-4, equal_nan=True)
+    # reference, DEV with np.roll on padded DEM
+    dem_pad = np.pad(dem_arr, (22, 21), mode="symmetric")
+    idx_nan_dem_pad = np.isnan(dem_pad)
+    dem_pad[idx_nan_dem_pad] = 0
+    dev_arr = rvt.vis.topographic_dev(dem_pad, rvt.vis.integral_image(~idx_nan_dem_pad, np.int64),
+                                      rvt.vis.integral_image(dem_pad), rvt.vis.integral_image(dem_pad ** 2), 21)
+    dev_arr = dev_arr[21:-22, 21:-22]
+    shared_dev_arr = rvt.vis.max_elevation_deviation(dem=dem_arr, minimum_radius=21, maximum_radius=21, step=1,
+                                                     dict_integral_images=dict_integral_images)
+    assert np.allclose(shared_dev_arr[~np.isnan(dem_arr)], dev_arr[~np.isnan(dem_arr)], atol=1e-3)